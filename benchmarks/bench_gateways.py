@@ -0,0 +1,251 @@
+"""gatewayの負荷試験.
+
+代替サーバ(benchmarks.fake_syosetu)を別プロセスで起動し、
+ApiGatewayManagerのgatewayで登録数ごとの更新チェックを1回実行する。
+処理時間・スループット・リクエスト数・メモリ使用量を表示する。
+
+    python -m benchmarks.bench_gateways [--sizes 1000,10000,50000]
+        [--sites naro,naro18,naro_blog] [--latency 0.05] [--error-rate 0.01]
+        [--padding 0] [--option format=yaml] [--memory]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+from typing import Any, Dict, List
+
+from aiohttp import web
+from ruamel.yaml import YAML
+
+from benchmarks.fake_syosetu import BASE_TIME, FakeSyosetu, ncode_for, userid_for
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+from narocheckerbot.feed_cache import FeedCache
+from narocheckerbot.tracked_work import TrackedWork
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+# サイト別のAPIのパス
+API_PATHS = {
+    "naro": "/novelapi/api/",
+    "naro18": "/novel18api/api/",
+    "naro_blog": "/writerblog/",
+}
+
+
+def run_server(port: int, options: Dict[str, Any]) -> None:
+    """代替サーバを起動(子プロセスで実行).
+
+    Args:
+        port (int): 待ち受けポート
+        options (Dict[str, Any]): FakeSyosetuの引数
+    """
+    server = FakeSyosetu(**options)
+    web.run_app(server.create_app(), host="127.0.0.1", port=port, print=None)
+
+
+def free_port() -> int:
+    """空いているポートを取得.
+
+    Returns:
+        int: ポート番号
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_stats(base: str) -> Dict[str, int]:
+    """代替サーバの処理件数を取得.
+
+    Args:
+        base (str): サーバのURL
+
+    Returns:
+        Dict[str, int]: 処理件数
+    """
+    with urllib.request.urlopen(base + "/_stats") as r:
+        return json.load(r)
+
+
+def wait_server(base: str, timeout: float = 10.0) -> None:
+    """代替サーバの起動を待つ.
+
+    Args:
+        base (str): サーバのURL
+        timeout (float, optional): 待ち時間の上限(秒). Defaults to 10.0.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            server_stats(base)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def create_urls(site: str, size: int) -> List[TrackedWork]:
+    """登録情報を生成.
+
+    Args:
+        site (str): サポートサイト
+        size (int): 登録数
+
+    Returns:
+        List[TrackedWork]: 登録情報リスト
+    """
+    id_for = userid_for if site == "naro_blog" else ncode_for
+    return [TrackedWork(id_for(i), BASE_TIME.timestamp()) for i in range(size)]
+
+
+def parse_options(values: List[str]) -> Dict[str, Any]:
+    """key=value形式のgateway設定を解析.
+
+    Args:
+        values (List[str]): key=valueのリスト
+
+    Returns:
+        Dict[str, Any]: 設定(値はYAMLとして解釈)
+    """
+    options: Dict[str, Any] = {}
+    for value in values:
+        key, _, raw = value.partition("=")
+        options[key] = YAML(typ="safe").load(raw)
+    return options
+
+
+async def bench(
+    base: str, site: str, size: int, options: Dict[str, Any], memory: bool
+) -> Dict[str, Any]:
+    """1サイト・1登録数の更新チェックを計測.
+
+    Args:
+        base (str): 代替サーバのURL
+        site (str): サポートサイト
+        size (int): 登録数
+        options (Dict[str, Any]): gatewayの設定
+        memory (bool): tracemallocでメモリ使用量を計測するか
+
+    Returns:
+        Dict[str, Any]: 計測結果
+    """
+    manager = ApiGatewayManager()
+    # 再試行の待ち時間で計測がぶれないよう短くする
+    manager.scheduler.base_delay = 0.01
+    manager.scheduler.max_delay = 0.1
+    gateway = manager.get_gateway(site)
+    gateway.configure({**options, "api_url": base + API_PATHS[site]})
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if site == "naro_blog":
+            gateway.feed_cache = FeedCache(tmpdir + "/feed_cache.json")
+
+        urls = create_urls(site, size)
+        await manager.open()
+        try:
+            before = server_stats(base)
+            if memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            results = await gateway.exec(urls)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if memory else 0
+            if memory:
+                tracemalloc.stop()
+            after = server_stats(base)
+        finally:
+            await manager.close()
+
+    return {
+        "site": site,
+        "size": size,
+        "seconds": elapsed,
+        "works_per_sec": size / elapsed if elapsed > 0 else 0.0,
+        "requests": after["requests"] - before["requests"],
+        "errors": after["errors"] - before["errors"],
+        "messages": sum(1 for message in results if message),
+        "retries": manager.scheduler.retries,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--sites", default="naro,naro18,naro_blog")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--update-ratio", type=float, default=0.1)
+    parser.add_argument(
+        "--option",
+        action="append",
+        default=[],
+        help="gatewayの設定(key=value, 複数指定可)",
+    )
+    parser.add_argument(
+        "--memory", action="store_true", help="tracemallocでメモリ使用量を計測"
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    sites = args.sites.split(",")
+    options = parse_options(args.option)
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = multiprocessing.Process(
+        target=run_server,
+        args=(
+            port,
+            {
+                "latency": args.latency,
+                "error_rate": args.error_rate,
+                "padding": args.padding,
+                "update_ratio": args.update_ratio,
+                "works": max(sizes),
+            },
+        ),
+        daemon=True,
+    )
+    server.start()
+    try:
+        wait_server(base)
+        print(
+            f"latency={args.latency}s error_rate={args.error_rate} "
+            + f"padding={args.padding} options={options}"
+        )
+        print(
+            f"{'site':>10} {'size':>7} {'seconds':>9} {'works/s':>10} "
+            + f"{'requests':>9} {'errors':>7} {'retries':>8} {'updates':>8}"
+            + (f" {'peak MB':>8}" if args.memory else "")
+        )
+        for site in sites:
+            for size in sizes:
+                r = asyncio.run(bench(base, site, size, options, args.memory))
+                print(
+                    f"{r['site']:>10} {r['size']:>7} {r['seconds']:>9.3f} "
+                    + f"{r['works_per_sec']:>10.1f} {r['requests']:>9} "
+                    + f"{r['errors']:>7} {r['retries']:>8} {r['messages']:>8}"
+                    + (f" {r['peak_mb']:>8.1f}" if args.memory else "")
+                )
+        if resource is not None:
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"max RSS: {maxrss:.1f} MB")
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""APIレスポンス解析のマイクロベンチマーク.
+
+500件(APIのlim上限)をまとめて取得した場合のレスポンスを生成し、
+YAML解析とJSON(gzip)解析の処理時間を比較する。
+
+    python -m benchmarks.bench_parse [--rows 500] [--number 20]
+"""
+
+import argparse
+import gzip
+import json
+import timeit
+from datetime import datetime, timedelta
+from io import StringIO
+from typing import Any, Dict, List
+
+from ruamel.yaml import YAML
+
+from narocheckerbot import response_parser
+
+
+def create_rows(rows: int) -> List[Dict[str, Any]]:
+    """of=n-t-glで返ってくる形式の小説データを生成.
+
+    Args:
+        rows (int): 件数
+
+    Returns:
+        List[Dict[str, Any]]: APIレスポンス相当のデータ
+    """
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    novels: List[Dict[str, Any]] = [{"allcount": rows}]
+    for i in range(rows):
+        novels.append(
+            {
+                "title": f"異世界に転生したので{i}番目のスキルで成り上がります",
+                "ncode": f"N{i:04d}AB",
+                "general_lastup": f"{base + timedelta(minutes=i):%Y-%m-%d %H:%M:%S}",
+            }
+        )
+    return novels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    novels = create_rows(args.rows)
+
+    stream = StringIO()
+    YAML().dump(novels, stream)
+    yaml_body = stream.getvalue().encode("utf-8")
+    json_body = json.dumps(novels, ensure_ascii=False).encode("utf-8")
+    json_gzip_body = gzip.compress(json_body, compresslevel=5)
+
+    cases = {
+        "yaml": lambda: response_parser.parse_yaml(yaml_body),
+        "json(stdlib)": lambda: json.loads(json_body),
+        "json+gzip": lambda: response_parser.parse_json(json_gzip_body),
+    }
+
+    print(
+        f"rows={args.rows} yaml={len(yaml_body)}B "
+        + f"json={len(json_body)}B json+gzip={len(json_gzip_body)}B "
+        + f"loads={response_parser._json_loads.__module__}"
+    )
+    for name, func in cases.items():
+        elapsed = min(timeit.repeat(func, number=args.number, repeat=3))
+        print(f"{name:>14}: {elapsed / args.number * 1000:8.3f} ms/response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""負荷試験用の小説家になろうAPIの代替サーバ.
+
+novelapi, novel18api, writerblog(Atom)の応答を模擬する。
+応答遅延・エラー発生率・レスポンスの大きさを指定できる。
+
+    python -m benchmarks.fake_syosetu [--port 8080] [--latency 0.05] [--error-rate 0]
+
+gatewayの接続先は各サイトのoptionsのapi_urlで切り替える。
+
+    naro:      http://127.0.0.1:8080/novelapi/api/
+    naro18:    http://127.0.0.1:8080/novel18api/api/
+    naro_blog: http://127.0.0.1:8080/writerblog/
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import zlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from io import StringIO
+from typing import Any, Dict, List
+
+from aiohttp import web
+from ruamel.yaml import YAML
+
+# 登録作品の最終更新日の基準(これより新しければ更新ありとなる)
+BASE_TIME = datetime(2024, 1, 1, 0, 0, 0)
+
+JST = timezone(timedelta(hours=9))
+
+
+def ncode_for(i: int) -> str:
+    """i番目の作品のncodeを生成.
+
+    Args:
+        i (int): 番号
+
+    Returns:
+        str: ncode
+    """
+    return f"n{i:06d}x"
+
+
+def userid_for(i: int) -> str:
+    """i番目のユーザIDを生成.
+
+    Args:
+        i (int): 番号
+
+    Returns:
+        str: ユーザID
+    """
+    return str(100000 + i)
+
+
+class FakeSyosetu:
+    """APIの代替サーバ.
+
+    作品ごとの更新有無はIDのCRC32で決めるため、同じ条件なら毎回同じ結果になる。
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        padding: int = 0,
+        update_ratio: float = 0.1,
+        entries: int = 10,
+        site_updates: int = 300,
+        works: int = 50000,
+        seed: int = 0,
+    ) -> None:
+        """初期化.
+
+        Args:
+            latency (float, optional): 応答までの遅延(秒). Defaults to 0.0.
+            error_rate (float, optional): 503を返す確率. Defaults to 0.0.
+            padding (int, optional): タイトル・本文に加える文字数. Defaults to 0.
+            update_ratio (float, optional): 更新ありとする作品の割合. Defaults to 0.1.
+            entries (int, optional): Atomフィードのエントリ数. Defaults to 10.
+            site_updates (int, optional): 期間指定の問い合わせで返す作品数. Defaults to 300.
+            works (int, optional): 期間指定で返す作品を選ぶ範囲. Defaults to 50000.
+            seed (int, optional): エラー発生の乱数シード. Defaults to 0.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.padding = padding
+        self.update_ratio = update_ratio
+        self.entries = entries
+        self.site_updates = site_updates
+        self.works = works
+        self._random = random.Random(seed)
+
+        # 処理件数
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "not_modified": 0}
+
+    def create_app(self) -> web.Application:
+        """aiohttpのアプリケーションを作成.
+
+        Returns:
+            web.Application: アプリケーション
+        """
+        app = web.Application()
+        app.router.add_get("/novelapi/api/", self.novelapi)
+        app.router.add_get("/novel18api/api/", self.novelapi)
+        app.router.add_get("/writerblog/{userid}.Atom", self.writerblog)
+        app.router.add_get("/_stats", self.handle_stats)
+        return app
+
+    def lastup(self, id: str) -> datetime:
+        """作品の最終更新日.
+
+        Args:
+            id (str): ncodeまたはユーザID
+
+        Returns:
+            datetime: 最終更新日(JST, 更新なしの作品はBASE_TIME)
+        """
+        crc = zlib.crc32(id.lower().encode("utf-8"))
+        if crc % 10000 < self.update_ratio * 10000:
+            return BASE_TIME + timedelta(days=1, seconds=crc % 86400)
+        return BASE_TIME
+
+    async def _prepare(self) -> bool:
+        """遅延とエラーの模擬.
+
+        Returns:
+            bool: エラーを返す場合はTrue
+        """
+        self.stats["requests"] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self._random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return True
+        return False
+
+    def _novel(self, ncode: str) -> Dict[str, Any]:
+        return {
+            "title": f"テスト小説{ncode}" + "あ" * self.padding,
+            "ncode": ncode.upper(),
+            "general_lastup": f"{self.lastup(ncode):%Y-%m-%d %H:%M:%S}",
+        }
+
+    async def novelapi(self, request: web.Request) -> web.Response:
+        """novelapi / novel18api."""
+        if await self._prepare():
+            return web.Response(status=503)
+
+        query = request.query
+        lim = int(query.get("lim", 20))
+        if "ncode" in query:
+            ncodes = [ncode for ncode in query["ncode"].split("-") if ncode]
+            novels = [self._novel(ncode) for ncode in ncodes[:lim]]
+            allcount = len(ncodes)
+        else:
+            # lastup指定: 期間内に更新された作品を新しい順に返す
+            start = int(query.get("st", 1))
+            picked = random.Random(query.get("lastup", "")).sample(
+                range(self.works), min(self.site_updates, self.works)
+            )
+            updated = sorted(
+                (self._novel(ncode_for(i)) for i in picked),
+                key=lambda novel: novel["general_lastup"],
+                reverse=True,
+            )
+            novels = updated[start - 1 : start - 1 + lim]
+            allcount = len(updated)
+
+        result: List[Any] = [{"allcount": allcount}, *novels]
+        if query.get("out") == "json":
+            body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            stream = StringIO()
+            YAML().dump(result, stream)
+            body = stream.getvalue().encode("utf-8")
+            content_type = "text/plain"
+        if "gzip" in query:
+            body = gzip.compress(body, compresslevel=int(query["gzip"]))
+            content_type = "application/x-gzip"
+        return web.Response(body=body, content_type=content_type)
+
+    async def writerblog(self, request: web.Request) -> web.Response:
+        """writerblog(Atomフィード)."""
+        if await self._prepare():
+            return web.Response(status=503)
+
+        userid = request.match_info["userid"]
+        updated = self.lastup(userid).replace(tzinfo=JST)
+        modified = format_datetime(updated.astimezone(timezone.utc), usegmt=True)
+        etag = '"' + hashlib.md5(f"{userid}{updated}".encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304)
+
+        items = []
+        for i in range(self.entries):
+            entry_updated = (updated - timedelta(days=i)).isoformat()
+            items.append(
+                "<entry>"
+                + f"<title>活動報告{i}</title>"
+                + f'<link rel="alternate" href="https://example.com/{userid}/{i}/"/>'
+                + f"<id>tag:example.com,2024:{userid}/{i}</id>"
+                + f"<updated>{entry_updated}</updated>"
+                + f"<summary>{'い' * self.padding}</summary>"
+                + "</entry>"
+            )
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            + '<feed xmlns="http://www.w3.org/2005/Atom">'
+            + f"<title>{userid}の活動報告</title>"
+            + f"<id>tag:example.com,2024:{userid}</id>"
+            + f"<updated>{updated.isoformat()}</updated>"
+            + "".join(items)
+            + "</feed>"
+        )
+        return web.Response(
+            text=body,
+            content_type="application/atom+xml",
+            headers={"ETag": etag, "Last-Modified": modified},
+        )
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """処理件数を返す."""
+        return web.json_response(self.stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--update-ratio", type=float, default=0.1)
+    parser.add_argument("--entries", type=int, default=10)
+    parser.add_argument("--site-updates", type=int, default=300)
+    args = parser.parse_args()
+
+    server = FakeSyosetu(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        padding=args.padding,
+        update_ratio=args.update_ratio,
+        entries=args.entries,
+        site_updates=args.site_updates,
+    )
+    web.run_app(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""記録した通信を再生して更新チェックを計測.
+
+settings.httpのmodeをrecordにして記録したカセットを使い、
+config.yamlの登録作品について1回分の更新チェックをネットワークに接続せずに再現する。
+処理時間・メトリクスを表示する(--profileでcProfileの結果も表示)。
+登録情報・検証情報のキャッシュは書き込まない。
+
+    python -m benchmarks.replay_cycle [--cassette narocheckerbot/cassette.jsonl.gz]
+        [--speed 0] [--sites naro,naro18,naro_blog] [--profile 30]
+
+slotsやpoll_floorで一部の作品のみチェックした回の記録は、記録されていない
+リクエストが発生するため再現できない(CassetteMissErrorになる)。
+"""
+
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+from narocheckerbot.config_manager import ConfigManager
+from narocheckerbot.feed_cache import FeedCache
+from narocheckerbot.metrics import metrics
+
+
+async def replay(cassette: str, speed: float, sites: List[str]) -> List[Dict[str, Any]]:
+    """カセットを再生して更新チェックを1回実行.
+
+    Args:
+        cassette (str): カセットのパス
+        speed (float): 再生速度(0の場合は記録した所要時間を待たない)
+        sites (List[str]): サポートサイト
+
+    Returns:
+        List[Dict[str, Any]]: サイトごとの計測結果
+    """
+    config_manager = ConfigManager()
+    manager = ApiGatewayManager()
+    manager.configure({"mode": "replay", "cassette": cassette, "speed": speed})
+
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        await manager.open()
+        try:
+            for site in sites:
+                if site not in config_manager.support_sites:
+                    continue
+                config = config_manager.get_config(site)
+                gateway = manager.get_gateway(site)
+                gateway.configure(config.options)
+                if site == "naro_blog":
+                    gateway.feed_cache = FeedCache(tmpdir + "/feed_cache.json")
+
+                start = time.perf_counter()
+                results = await gateway.check(config.urls)
+                elapsed = time.perf_counter() - start
+                rows.append(
+                    {
+                        "site": site,
+                        "size": len(config.urls),
+                        "seconds": elapsed,
+                        "messages": sum(len(messages) for messages in results),
+                    }
+                )
+        finally:
+            await manager.close()
+            # 書き込みを要求していないため、登録情報は保存されない
+            await config_manager.close()
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cassette",
+        default=os.path.join("narocheckerbot", "cassette.jsonl.gz"),
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0.0,
+        help="再生速度(1で記録時と同じ待ち時間, 0で待たない)",
+    )
+    parser.add_argument("--sites", default="naro,naro18,naro_blog")
+    parser.add_argument(
+        "--profile", type=int, default=0, help="cProfileの結果を上位N件表示"
+    )
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+    rows = asyncio.run(replay(args.cassette, args.speed, args.sites.split(",")))
+    if profiler is not None:
+        profiler.disable()
+
+    print("site       size   seconds  messages")
+    for row in rows:
+        print(
+            f"{row['site']:<9} {row['size']:>6} {row['seconds']:>9.3f}"
+            f" {row['messages']:>9}"
+        )
+    print()
+    print("\n".join(metrics.summary()))
+    if profiler is not None:
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,56 @@
 # -*- coding: utf-8 -*-
 """Bot起動モジュール."""
 
+import hashlib
+import json
 import os
 from datetime import datetime
 from logging import DEBUG, FileHandler, Formatter, Logger, StreamHandler, getLogger
 from pathlib import Path
+from typing import Any, Dict
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
+from narocheckerbot.atomic_file import atomic_write
+
+# 前回同期したコマンド定義のハッシュの保存先
+COMMAND_HASH_FILE = Path(__file__).parent / "narocheckerbot" / "command_hash.json"
+
+
+def command_hash(tree: app_commands.CommandTree) -> str:
+    """コマンド定義のハッシュを算出.
+
+    Args:
+        tree (app_commands.CommandTree): コマンドツリー
+
+    Returns:
+        str: 登録されている全コマンドの定義のSHA-256
+    """
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda command: (command.get("type", 1), command["name"]),
+    )
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_command_hash(path: Path) -> Dict[str, Any]:
+    """前回同期したコマンド定義のハッシュを読み込む.
+
+    Args:
+        path (Path): 保存先
+
+    Returns:
+        Dict[str, Any]: application_idとhash(読み込めない場合は空)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as stream:
+            return dict(json.load(stream))
+    except (OSError, ValueError):
+        return {}
+
 
 class NaroBot(commands.Bot):
     """Botクラス.
@@ -29,7 +71,28 @@ class NaroBot(commands.Bot):
 
     async def setup_hook(self):
         await self.load_extension("narocheckerbot.naro")
+        await self.sync_commands()
+
+    async def sync_commands(self) -> None:
+        """コマンド定義が前回の同期から変わっている場合のみ同期する.
+
+        グローバルコマンドの同期はレート制限が厳しいため、起動のたびには行わない。
+        環境変数NAROBOT_FORCE_SYNCを指定すると常に同期する。
+        """
+        current = {
+            "application_id": self.application_id,
+            "hash": command_hash(self.tree),
+        }
+        if (
+            not os.environ.get("NAROBOT_FORCE_SYNC")
+            and load_command_hash(COMMAND_HASH_FILE) == current
+        ):
+            self.logger.info("コマンド定義に変更がないため、同期を省略します")
+            return
+
         await self.tree.sync()
+        atomic_write(str(COMMAND_HASH_FILE), json.dumps(current), encoding="utf-8")
+        self.logger.info("コマンドを同期しました")
 
     async def on_ready(self):
         """起動完了時に呼び出される処理."""
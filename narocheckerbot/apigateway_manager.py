@@ -1,8 +1,8 @@
-from typing import Dict
+from typing import Any, Dict, Optional, cast
 
-from narocheckerbot.naro18_api_gateway import Naro18ApiGateway
-from narocheckerbot.naro_api_gateway import NaroApiGateway
-from narocheckerbot.naro_blog_api_gateway import NaroBlogApiGateway
+import aiohttp
+
+from narocheckerbot.retry_scheduler import RetryScheduler
 from narocheckerbot.webapi_gateway import WebApiGateway
 
 
@@ -10,9 +10,40 @@ class ApiGatewayManager:
     def __init__(self) -> None:
         # サポートサイトの種類
         self._support = ["naro", "naro18", "naro_blog"]
+        # サーキットブレーカーはホスト単位のため全gatewayで共有する
+        self.scheduler = RetryScheduler()
+        # 生成済みのgateway(起動を速くするため、使用するサイトの分だけget_gatewayで生成する)
         self.support_sites: Dict[str, WebApiGateway] = {}
-        for support_site in self._support:
-            self.support_sites[support_site] = self.factory_config(support_site)
+
+        # 全gatewayで共有するHTTPセッション
+        self.session: Optional[aiohttp.ClientSession] = None
+        # 接続先ホストごとの同時接続数(api.syosetu.comは全サイト共通)
+        self.limit_per_host = 20
+        # DNS解決結果のキャッシュ時間(秒)
+        self.dns_cache_ttl = 600
+        # keep-aliveで接続を保持する時間(秒)
+        self.keepalive_timeout = 60
+
+        # 通信の記録・再生(settings.httpで指定, 既定は通常の通信)
+        self.mode: Optional[str] = None
+        self.cassette = "cassette.jsonl.gz"
+        self.speed = 1.0
+
+    def configure(self, options: Dict[str, Any]) -> None:
+        """通信の設定を反映.
+
+        Args:
+            options (Dict[str, Any]): config.yamlのsettings.http
+
+        Raises:
+            ValueError: 対応していないmodeを指定
+        """
+        mode = options.get("mode")
+        if mode not in (None, "record", "replay"):
+            raise ValueError(f"http.modeはrecordまたはreplayを指定してください: {mode}")
+        self.mode = mode
+        self.cassette = str(options.get("cassette", self.cassette))
+        self.speed = float(options.get("speed", self.speed))
 
     def factory_config(self, site: str) -> WebApiGateway:
         """API生成用のfactory関数.
@@ -26,24 +57,82 @@ class ApiGatewayManager:
         Returns:
             WebApiGateway: apigateway
         """
+        # feedparserなどの読み込みに時間がかかるため、モジュールは使用時に読み込む
         if site == "naro":
+            from narocheckerbot.naro_api_gateway import NaroApiGateway
+
             return NaroApiGateway()
         if site == "naro18":
+            from narocheckerbot.naro18_api_gateway import Naro18ApiGateway
+
             return Naro18ApiGateway()
         if site == "naro_blog":
+            from narocheckerbot.naro_blog_api_gateway import NaroBlogApiGateway
+
             return NaroBlogApiGateway()
         else:
             raise KeyError("サポート外")
 
     def get_gateway(self, site: str) -> WebApiGateway:
-        """サイト別のAPIを取得
+        """サイト別のAPIを取得(初回は生成する)
 
         Args:
             site (str): サポートサイト
 
+        Raises:
+            KeyError: 対象外のサイトを指定
+
         Returns:
             WebApiGateway: apigateway
         """
-        return self.support_sites[site]
+        gateway = self.support_sites.get(site)
+        if gateway is None:
+            gateway = self.factory_config(site)
+            gateway.scheduler = self.scheduler
+            if self.session is not None:
+                gateway.set_session(self.session)
+            self.support_sites[site] = gateway
+        return gateway
+
+    async def open(self) -> None:
+        """共有セッションを開始し、各gatewayに設定する.
+
+        イベントループ上で生成する必要があるため、cog_loadから呼び出す。
+        """
+        if self.session is None or self.session.closed:
+            if self.mode == "replay":
+                from narocheckerbot.cassette import ReplaySession
+
+                # gatewayからは通常のセッションと同じように扱う
+                self.session = cast(
+                    aiohttp.ClientSession, ReplaySession(self.cassette, self.speed)
+                )
+            else:
+                connector = aiohttp.TCPConnector(
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    keepalive_timeout=self.keepalive_timeout,
+                )
+                self.session = aiohttp.ClientSession(connector=connector)
+                if self.mode == "record":
+                    from narocheckerbot.cassette import RecordingSession
+
+                    self.session = cast(
+                        aiohttp.ClientSession,
+                        RecordingSession(self.session, self.cassette),
+                    )
+
+        for gateway in self.support_sites.values():
+            gateway.set_session(self.session)
+
+    async def close(self) -> None:
+        """共有セッションを終了する."""
+        for gateway in self.support_sites.values():
+            gateway.set_session(None)
+            await gateway.close()
+
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
 
     pass
@@ -0,0 +1,40 @@
+import os
+import stat
+import tempfile
+from typing import Optional
+
+
+def atomic_write(path: str, text: str, encoding: Optional[str] = None) -> None:
+    """一時ファイルに書き込んでから置き換える.
+
+    書き込み途中で停止しても、元のファイルか新しいファイルのどちらかが残る。
+
+    Args:
+        path (str): 書き込み先
+        text (str): 書き込む内容
+        encoding (Optional[str], optional): 文字コード(省略時はopenの既定値).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmpfile = tempfile.mkstemp(
+        dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as stream:
+            stream.write(text)
+            stream.flush()
+            os.fsync(stream.fileno())
+        # mkstempは0600で作成するため、元のファイルの権限を引き継ぐ
+        if os.path.exists(path):
+            os.chmod(tmpfile, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmpfile, path)
+    except BaseException:
+        os.unlink(tmpfile)
+        raise
+
+    # リネーム結果をディレクトリに反映(Windowsではディレクトリを開けないため行わない)
+    if os.name == "posix":
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,271 @@
+"""HTTP通信の記録・再生.
+
+記録モードでは各gatewayのリクエストとレスポンス(URL, ステータス, ヘッダ, ボディ, 所要時間)を
+カセット(gzip圧縮したJSON Lines)に追記する。再生モードではカセットからレスポンスを返し、
+本番の更新チェックをネットワークに接続せずに再現する。
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import time
+from collections import deque
+from logging import getLogger
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+# 実行時刻によって変わるため、再生時の照合では無視するクエリ
+VOLATILE_PARAMS = ("lastup",)
+
+# ボディは展開後の状態で記録するため、転送に関するヘッダは記録しない
+TRANSPORT_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class CassetteMissError(LookupError):
+    """カセットに記録されていないリクエストを再生しようとした."""
+
+    pass
+
+
+def request_key(url: str) -> str:
+    """再生時にリクエストを照合するためのキー.
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: 実行時刻によって変わるクエリを除いたURL
+    """
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in VOLATILE_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class RecordedContent:
+    """記録したボディを読み出す(aiohttpのStreamReaderの代わり)."""
+
+    def __init__(self, body: bytes) -> None:
+        """初期化.
+
+        Args:
+            body (bytes): レスポンスボディ
+        """
+        self._body = body
+
+    async def iter_chunked(self, n: int) -> AsyncIterator[bytes]:
+        """n バイトずつ読み出す.
+
+        Args:
+            n (int): 読み出す単位(バイト)
+
+        Yields:
+            bytes: ボディの一部
+        """
+        for i in range(0, len(self._body), n):
+            yield self._body[i : i + n]
+
+
+class RecordedResponse:
+    """記録したレスポンス(aiohttpのClientResponseと同じ使い方ができる)."""
+
+    def __init__(
+        self, url: str, status: int, headers: List[Tuple[str, str]], body: bytes
+    ) -> None:
+        """初期化.
+
+        Args:
+            url (str): URL
+            status (int): ステータスコード
+            headers (List[Tuple[str, str]]): レスポンスヘッダ
+            body (bytes): レスポンスボディ
+        """
+        self.url = URL(url)
+        self.status = status
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self.content = RecordedContent(body)
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        """エラーのステータスであれば例外を送出する.
+
+        Raises:
+            aiohttp.ClientResponseError: ステータスが400以上
+        """
+        if self.status >= 400:
+            request_info = aiohttp.RequestInfo(
+                self.url, "GET", CIMultiDictProxy(CIMultiDict()), self.url
+            )
+            raise aiohttp.ClientResponseError(
+                request_info, (), status=self.status, headers=self.headers
+            )
+
+    async def read(self) -> bytes:
+        """ボディを読み出す.
+
+        Returns:
+            bytes: レスポンスボディ
+        """
+        return self._body
+
+
+class _ResponseContext:
+    """session.get()の戻り値(async withで使用する)."""
+
+    def __init__(self, open: Any) -> None:
+        self._open = open
+
+    async def __aenter__(self) -> RecordedResponse:
+        return await self._open()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+
+class RecordingSession:
+    """通信をカセットに記録するセッション.
+
+    ボディを読み切ってから記録するため、逐次解析の場合もボディ全体をメモリに保持する。
+    途中で停止してもそれまでの記録を再生できるよう、1件ごとにgzipのメンバーとして書き込む。
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, path: str) -> None:
+        """初期化.
+
+        Args:
+            session (aiohttp.ClientSession): 実際に通信するセッション
+            path (str): カセットのパス(既存のカセットには追記する)
+        """
+        self.logger = getLogger("narocheckerlog.cassette")
+        self._session = session
+        self._stream = open(path, "ab")
+        self.logger.info(f"Record: {path}")
+
+    @property
+    def closed(self) -> bool:
+        return self._session.closed
+
+    def get(self, url: str, **kwargs: Any) -> _ResponseContext:
+        async def open() -> RecordedResponse:
+            start = time.monotonic()
+            entry: Dict[str, Any] = {"url": url, "started": time.time()}
+            try:
+                async with self._session.get(url, **kwargs) as r:
+                    body = await r.read()
+                    entry["status"] = r.status
+                    entry["headers"] = [
+                        (k, v)
+                        for k, v in r.headers.items()
+                        if k.lower() not in TRANSPORT_HEADERS
+                    ]
+                    entry["body"] = base64.b64encode(body).decode("ascii")
+                    return RecordedResponse(url, r.status, entry["headers"], body)
+            except asyncio.TimeoutError:
+                entry["error"] = "timeout"
+                raise
+            except aiohttp.ClientError as e:
+                entry["error"] = "connection"
+                entry["message"] = str(e)
+                raise
+            except BaseException as e:
+                # キャンセル等も記録する(再生時は接続エラーとして扱う)
+                entry["error"] = "exception"
+                entry["message"] = repr(e)
+                raise
+            finally:
+                entry["elapsed"] = time.monotonic() - start
+                self._write(entry)
+
+        return _ResponseContext(open)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        """1件をgzipのメンバーとして追記する.
+
+        Args:
+            entry (Dict[str, Any]): 記録内容
+        """
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        self._stream.write(gzip.compress(line.encode("utf-8")))
+        self._stream.flush()
+
+    async def close(self) -> None:
+        """セッションとカセットを閉じる."""
+        await self._session.close()
+        self._stream.close()
+
+
+class ReplaySession:
+    """カセットからレスポンスを返すセッション.
+
+    同じURLへのリクエストは記録した順に返す(再試行も記録どおりに再現する)。
+    """
+
+    def __init__(self, path: str, speed: float = 1.0) -> None:
+        """初期化.
+
+        Args:
+            path (str): カセットのパス
+            speed (float, optional): 再生速度(記録した所要時間をこの値で割って待つ,
+                0の場合は待たない). Defaults to 1.0.
+        """
+        self.logger = getLogger("narocheckerlog.cassette")
+        self.speed = speed
+        self.closed = False
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as stream:
+            try:
+                for line in stream:
+                    entry = json.loads(line)
+                    self._entries.setdefault(request_key(entry["url"]), deque()).append(
+                        entry
+                    )
+            except (EOFError, ValueError):
+                # 記録中に停止した場合、書きかけの1件は捨てる
+                self.logger.warning(f"Replay: {path} の末尾が壊れています")
+        self.logger.info(f"Replay: {path} ({self.remaining()}件)")
+
+    def remaining(self) -> int:
+        """未再生のレスポンス数.
+
+        Returns:
+            int: 件数
+        """
+        return sum(len(entries) for entries in self._entries.values())
+
+    def _next(self, url: str) -> Optional[Dict[str, Any]]:
+        entries = self._entries.get(request_key(url))
+        if not entries:
+            return None
+        return entries.popleft()
+
+    def get(self, url: str, **kwargs: Any) -> _ResponseContext:
+        async def open() -> RecordedResponse:
+            entry = self._next(url)
+            if entry is None:
+                raise CassetteMissError(f"カセットに記録されていません: {url}")
+            if self.speed > 0:
+                await asyncio.sleep(float(entry["elapsed"]) / self.speed)
+
+            error = entry.get("error")
+            if error == "timeout":
+                raise asyncio.TimeoutError()
+            if error is not None:
+                raise aiohttp.ClientConnectionError(entry.get("message", ""))
+            return RecordedResponse(
+                url,
+                int(entry["status"]),
+                [(k, v) for k, v in entry["headers"]],
+                base64.b64decode(entry["body"]),
+            )
+
+        return _ResponseContext(open)
+
+    async def close(self) -> None:
+        """再生を終える."""
+        self.closed = True
+        if self.remaining():
+            self.logger.info(f"Replay: {self.remaining()}件が未再生です")
@@ -0,0 +1,134 @@
+import bisect
+import hashlib
+import sqlite3
+import time
+from logging import getLogger
+from typing import Iterable, List, Optional, Tuple
+
+from narocheckerbot.tracked_work import TrackedWork
+
+
+def _hash(key: str) -> int:
+    """リング上の位置を算出.
+
+    Args:
+        key (str): キー
+
+    Returns:
+        int: 位置(64bit)
+    """
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """コンシステントハッシュ.
+
+    ワーカーの増減で担当が変わるのは、増減したワーカーの分だけになる。
+    """
+
+    def __init__(self, members: Iterable[str], replicas: int = 64) -> None:
+        """初期化.
+
+        Args:
+            members (Iterable[str]): ワーカー名
+            replicas (int, optional): 1ワーカーあたりの仮想ノード数. Defaults to 64.
+        """
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in members
+            for i in range(replicas)
+        )
+        self._keys = [key for key, _ in points]
+        self._members = [member for _, member in points]
+
+    def owner(self, id: str) -> Optional[str]:
+        """IDを担当するワーカー.
+
+        Args:
+            id (str): ID
+
+        Returns:
+            Optional[str]: ワーカー名(ワーカーがいなければNone)
+        """
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(id)) % len(self._keys)
+        return self._members[i]
+
+
+class Cluster:
+    """複数プロセスで登録作品を分担するための参加情報.
+
+    各プロセスは共有のSQLiteに定期的に生存通知(heartbeat)を書き込み、
+    ttl秒以内に生存通知のあるプロセスでコンシステントハッシュを構成する。
+    """
+
+    def __init__(self, path: str, name: str, ttl: float = 180.0) -> None:
+        """初期化.
+
+        Args:
+            path (str): データベースファイルのパス
+            name (str): このプロセスのワーカー名(プロセスごとに一意)
+            ttl (float, optional): 生存通知の有効期間(秒). Defaults to 180.0.
+        """
+        self._logger = getLogger("narocheckerlog.cluster")
+        self.name = name
+        self.ttl = ttl
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS worker"
+                + " (name TEXT PRIMARY KEY, heartbeat REAL NOT NULL)"
+            )
+
+        self._members: Tuple[str, ...] = ()
+        self._ring = HashRing(())
+
+    def heartbeat(self) -> None:
+        """生存通知を書き込む."""
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO worker (name, heartbeat) VALUES (?, ?)"
+                + " ON CONFLICT (name) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.name, time.time()),
+            )
+
+    def members(self) -> List[str]:
+        """生存しているワーカー名.
+
+        Returns:
+            List[str]: ワーカー名(自身を含む)
+        """
+        rows = self._conn.execute(
+            "SELECT name FROM worker WHERE heartbeat >= ?", (time.time() - self.ttl,)
+        ).fetchall()
+        return sorted({name for (name,) in rows} | {self.name})
+
+    def owned(self, urls: List[TrackedWork]) -> List[TrackedWork]:
+        """このプロセスが担当する登録情報を選ぶ.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+
+        Returns:
+            List[TrackedWork]: 担当する登録情報リスト
+        """
+        members = tuple(self.members())
+        if members != self._members:
+            self._logger.info(f"Members: {', '.join(members)}")
+            self._members = members
+            self._ring = HashRing(members)
+        if len(members) == 1:
+            return urls
+        return [url for url in urls if self._ring.owner(url.id) == self.name]
+
+    def leave(self) -> None:
+        """参加を取り消す(担当は残りのワーカーに移る)."""
+        with self._conn:
+            self._conn.execute("DELETE FROM worker WHERE name = ?", (self.name,))
+
+    def close(self) -> None:
+        """データベースを閉じる."""
+        self._conn.close()
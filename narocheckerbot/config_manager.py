@@ -1,25 +1,49 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 
 from ruamel.yaml import YAML
 
+from narocheckerbot.metrics import metrics
 from narocheckerbot.naro_blog_configuration import NaroBlogConfigration
 from narocheckerbot.naro_configuration import NaroConfigration
+from narocheckerbot.state_store import SqliteStateStore, StateStore, YamlStateStore
 
 
 class ConfigManager:
     """_summary_."""
 
-    def __init__(self) -> None:
-        """初期化."""
+    def __init__(self, configfile: Optional[str] = None) -> None:
+        """初期化.
+
+        Args:
+            configfile (Optional[str], optional): config.yamlのパス(省略時はパッケージ内).
+        """
         self._logger = getLogger("narocheckerlog.config")
-        self._configfile = os.path.dirname(os.path.abspath(__file__)) + "/config.yaml"
+        self._configfile = configfile or (
+            os.path.dirname(os.path.abspath(__file__)) + "/config.yaml"
+        )
 
         with open(self._configfile, "r") as stream:
             yaml = YAML()
             self._yaml_data = yaml.load(stream)
 
+        # サイトをまたいだ設定(省略可)
+        self.settings: Dict[str, Any] = dict(self._yaml_data.get("settings") or {})
+        self._store = self.factory_store(dict(self.settings.get("state") or {}))
+
+        # 書き込み要求をまとめるための待ち時間(秒)
+        self.write_delay = float(self.settings.get("write_delay", 2.0))
+        self._dirty = False
+        self._writer: Optional[asyncio.Task[None]] = None
+        # 書き込みはイベントループ外の専用スレッドで順番に行う
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # 書き込み中の処理(flushは完了を待ってから戻る)
+        self._lock = asyncio.Lock()
+        self._writing: Optional[asyncio.Future[None]] = None
+
         # サポートサイトの種類
         self._support = ["naro", "naro18", "naro_blog"]
         self.support_sites: Dict[str, Any] = {}
@@ -44,20 +68,118 @@ class ConfigManager:
         Returns:
             NaroConfigration: 生成したconfig
         """
+        config: Union[NaroConfigration, NaroBlogConfigration]
         if site == "naro":
-            return NaroConfigration(self._yaml_data[site])
-        if site == "naro18":
-            return NaroConfigration(self._yaml_data[site])
-        if site == "naro_blog":
-            return NaroBlogConfigration(self._yaml_data[site])
+            config = NaroConfigration(self._yaml_data[site])
+        elif site == "naro18":
+            config = NaroConfigration(self._yaml_data[site])
+        elif site == "naro_blog":
+            config = NaroBlogConfigration(self._yaml_data[site])
         else:
             raise KeyError("サポート外")
 
+        config.urls = self._store.load_accounts(site, config)
+        # 登録情報はconfig.urlsで保持するため、読み込んだYAMLの登録情報は解放する
+        # (config.yamlに保存する場合は保存時に作り直す)
+        self._yaml_data[site]["account"] = []
+        return config
+
+    def factory_store(self, state: Dict[str, Any]) -> StateStore:
+        """登録情報の保存先生成用のfactory関数.
+
+        Args:
+            state (Dict[str, Any]): settingsのstate
+
+        Raises:
+            KeyError: 対象外の保存先を指定
+
+        Returns:
+            StateStore: 保存先
+        """
+        backend = state.get("backend", "yaml")
+        if backend == "yaml":
+            return YamlStateStore(self._configfile)
+        if backend == "sqlite":
+            path = os.path.join(
+                os.path.dirname(self._configfile), state.get("path", "state.db")
+            )
+            return SqliteStateStore(path)
+        else:
+            raise KeyError("サポート外")
+
+    @property
+    def shared_state(self) -> bool:
+        """登録情報の保存先を複数のプロセスで共有できるか."""
+        return self._store.shared
+
+    def reload_accounts(self) -> None:
+        """保存先から登録情報を読み込み直す(他のプロセスの変更を反映する).
+
+        未書き込みの変更は失われるため、flushしてから呼び出すこと。
+        """
+        for site, config in self.support_sites.items():
+            config.urls = self._store.load_accounts(site, config)
+
     def write_yaml(self):
-        """設定ファイルへの書き込み."""
-        with open(self._configfile, "w") as stream:
-            yaml = YAML()
-            yaml.dump(data=self._yaml_data, stream=stream)
+        """設定ファイル(登録情報の保存先)への書き込み."""
+        with metrics.timer("write_seconds"):
+            self._store.save(self._yaml_data, self.support_sites)
+
+    def request_write(self) -> None:
+        """書き込みを要求する.
+
+        write_delay秒の間に発生した要求は1回の書き込みにまとめる。
+        イベントループ上から呼び出すこと。
+        """
+        self._dirty = True
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_later())
+
+    async def _write_later(self) -> None:
+        """要求がなくなるまで遅延書き込みを行う."""
+        while self._dirty:
+            await asyncio.sleep(self.write_delay)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """未書き込みの変更があれば書き込む.
+
+        書き込み中の処理があれば、その完了も待つ(戻った時点で保存先に反映済み)。
+        """
+        async with self._lock:
+            await self._wait_written()
+            if not self._dirty:
+                return
+
+            # 書き込み中の変更は次回の書き込みに含める
+            self._dirty = False
+            loop = asyncio.get_running_loop()
+            self._writing = loop.run_in_executor(self._executor, self.write_yaml)
+            await self._wait_written()
+
+    async def _wait_written(self) -> None:
+        """書き込み中であれば完了を待つ(失敗した場合は次回書き込み直す).
+
+        待っている間にキャンセルされても書き込みは止めず、次回のflushで完了を待つ。
+        """
+        writing = self._writing
+        if writing is None:
+            return
+
+        await asyncio.wait([writing])
+        self._writing = None
+        error = writing.exception()
+        if error is not None:
+            self._dirty = True
+            self._logger.error("設定ファイルの書き込みに失敗しました", exc_info=error)
+
+    async def close(self) -> None:
+        """未書き込みの変更を書き込み、登録情報の保存先を閉じる."""
+        if self._writer is not None:
+            self._writer.cancel()
+        await self.flush()
+        self._executor.shutdown()
+        self._store.close()
 
     def get_config(self, site: str) -> Union[NaroConfigration, NaroBlogConfigration]:
         """サイト別の設定を取得
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from functools import partial
+from logging import getLogger
+from typing import Any, Dict, Optional
+
+from narocheckerbot.atomic_file import atomic_write
+
+
+class FeedCache:
+    """フィードの検証情報(ETag, Last-Modified, ハッシュ)をユーザ別に保持する.
+
+    検証情報は取得時点のlastupdatedと組で保存し、config.yamlの値と
+    一致する場合のみ利用する。config.yamlの書き込み前に停止した場合でも
+    更新を取りこぼさないようにするため。
+    """
+
+    def __init__(self, path: str) -> None:
+        """初期化.
+
+        Args:
+            path (str): キャッシュファイルのパス
+        """
+        self._logger = getLogger("narocheckerlog.feed_cache")
+        self._path = path
+        self._dirty = False
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # 非同期の書き込みを呼び出し順に行う
+        self._lock = asyncio.Lock()
+
+        try:
+            with open(self._path, "r", encoding="utf-8") as stream:
+                self._entries = json.load(stream)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            self._logger.exception("キャッシュが読み込めないため破棄します")
+
+    def get(self, id: str, lastupdated: float) -> Optional[Dict[str, Any]]:
+        """検証情報を取得.
+
+        Args:
+            id (str): ユーザID
+            lastupdated (float): config.yamlに記録されている最終更新日(UNIX時間)
+
+        Returns:
+            Optional[Dict[str, Any]]: 検証情報(無い、または古い場合はNone)
+        """
+        entry = self._entries.get(id)
+        if entry is None or entry.get("lastupdated") != lastupdated:
+            return None
+        return entry
+
+    def set(
+        self,
+        id: str,
+        lastupdated: float,
+        etag: Optional[str],
+        modified: Optional[str],
+        digest: str,
+    ) -> None:
+        """検証情報を登録.
+
+        Args:
+            id (str): ユーザID
+            lastupdated (float): 取得結果を反映した後の最終更新日(UNIX時間)
+            etag (Optional[str]): ETagヘッダ
+            modified (Optional[str]): Last-Modifiedヘッダ
+            digest (str): レスポンスボディのハッシュ
+        """
+        entry: Dict[str, Any] = {"lastupdated": lastupdated, "digest": digest}
+        if etag:
+            entry["etag"] = etag
+        if modified:
+            entry["modified"] = modified
+
+        if self._entries.get(id) != entry:
+            self._entries[id] = entry
+            self._dirty = True
+
+    def save(self) -> None:
+        """変更があればファイルへ書き込む."""
+        if not self._dirty:
+            return
+
+        atomic_write(self._path, json.dumps(self._entries), encoding="utf-8")
+        self._dirty = False
+
+    async def save_async(self) -> None:
+        """変更があればファイルへ書き込む(イベントループを止めない).
+
+        内容はイベントループ上で確定し、fsyncを伴う書き込みはスレッドで行う。
+        書き込み中の変更は次回の保存で書き込む。
+        """
+        if not self._dirty:
+            return
+
+        data = json.dumps(self._entries)
+        self._dirty = False
+        async with self._lock:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, partial(atomic_write, self._path, data, encoding="utf-8")
+                )
+            except BaseException:
+                self._dirty = True
+                raise
@@ -0,0 +1,189 @@
+import re
+import zlib
+from typing import Any, List, Optional, Sequence
+
+from narocheckerbot.response_parser import GZIP_MAGIC, _json_loads
+
+# 文字列の外で構造を表す文字
+_STRUCTURE = re.compile(rb'[\[\]{}"]')
+
+# 一度に展開する上限(バイト, 圧縮率が高いデータでも展開後の大きさを抑える)
+DECOMPRESS_LIMIT = 65536
+
+
+class JsonArrayStream:
+    """トップレベルが配列のJSONを、受信した分から要素ごとに解析する.
+
+    レスポンス全体を読み込んでから解析すると、ボディと解析結果の両方を
+    保持することになるため、要素(作品)ごとに解析して必要なキーだけを残す。
+    gzip圧縮されていれば逐次展開する。
+    """
+
+    def __init__(self, keys: Optional[Sequence[str]] = None) -> None:
+        """初期化.
+
+        Args:
+            keys (Optional[Sequence[str]], optional): 要素(オブジェクト)に残すキー(省略時はすべて).
+        """
+        self._keys = keys
+        self._decompressor: Optional[Any] = None
+        self._head = b""
+        self._started = False
+
+        # 未解析のデータ, 走査位置, 解析中の要素の開始位置
+        self._buffer = b""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self.finished = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        """受信したデータを解析.
+
+        Args:
+            data (bytes): 受信データ(gzip圧縮可)
+
+        Raises:
+            ValueError: 配列でない, 不正なJSON, 不正なgzip
+
+        Returns:
+            List[Any]: このデータで完結した要素
+        """
+        if not self._started:
+            # 圧縮の有無を先頭2バイトで判定する
+            self._head += data
+            if len(self._head) < len(GZIP_MAGIC):
+                return []
+            data, self._head = self._head, b""
+            if data[:2] == GZIP_MAGIC:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._started = True
+
+        if self._decompressor is None:
+            return self._scan(data)
+
+        items: List[Any] = []
+        while data:
+            try:
+                decompressed = self._decompressor.decompress(data, DECOMPRESS_LIMIT)
+            except zlib.error as e:
+                raise ValueError(f"gzipの展開に失敗しました: {e}") from e
+            items.extend(self._scan(decompressed))
+            data = self._decompressor.unconsumed_tail
+        return items
+
+    def close(self) -> List[Any]:
+        """受信の終了.
+
+        Raises:
+            ValueError: 配列が閉じていない, 不正なgzip
+
+        Returns:
+            List[Any]: 残りのデータで完結した要素
+        """
+        items: List[Any] = []
+        if not self._started:
+            data, self._head = self._head, b""
+            self._started = True
+            items = self._scan(data)
+        elif self._decompressor is not None:
+            try:
+                items = self._scan(self._decompressor.flush())
+            except zlib.error as e:
+                raise ValueError(f"gzipの展開に失敗しました: {e}") from e
+        if not self.finished:
+            raise ValueError("JSONの配列が途中で終わっています")
+        return items
+
+    def _scan(self, data: bytes) -> List[Any]:
+        """構造を表す文字をたどり、閉じた要素を解析する.
+
+        Args:
+            data (bytes): 展開後のデータ
+
+        Raises:
+            ValueError: 配列でない, 不正なJSON
+
+        Returns:
+            List[Any]: 完結した要素
+        """
+        items: List[Any] = []
+        buffer = self._buffer + data
+        pos = self._pos
+        while not self.finished:
+            if self._in_string:
+                end = buffer.find(b'"', pos)
+                if end < 0:
+                    pos = len(buffer)
+                    break
+                # 直前のバックスラッシュが奇数個ならエスケープされた引用符
+                escape = end
+                while escape > 0 and buffer[escape - 1] == 0x5C:
+                    escape -= 1
+                if (end - escape) % 2 == 0:
+                    self._in_string = False
+                pos = end + 1
+                continue
+
+            match = _STRUCTURE.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            c = buffer[match.start()]
+            pos = match.end()
+            if c == 0x22:  # "
+                self._in_string = True
+            elif c in b"[{":
+                if self._depth == 0 and c != 0x5B:
+                    raise ValueError("JSONの配列ではありません")
+                self._depth += 1
+                if self._depth == 2:
+                    self._start = match.start()
+            else:
+                self._depth -= 1
+                if self._depth == 1:
+                    items.append(self._element(buffer[self._start : pos]))
+                    self._start = -1
+                elif self._depth == 0:
+                    self.finished = True
+
+        # 解析済みのデータを捨てる(解析中の要素は残す)
+        cut = pos if self._start < 0 else self._start
+        self._buffer = buffer[cut:]
+        self._pos = pos - cut
+        if self._start >= 0:
+            self._start -= cut
+        return items
+
+    def _element(self, raw: bytes) -> Any:
+        """要素を解析し、必要なキーだけを残す.
+
+        Args:
+            raw (bytes): 要素のJSON
+
+        Returns:
+            Any: 解析結果
+        """
+        value = _json_loads(raw)
+        if self._keys is not None and isinstance(value, dict):
+            return {key: value[key] for key in self._keys if key in value}
+        return value
+
+
+async def read_array(chunks: Any, keys: Optional[Sequence[str]] = None) -> List[Any]:
+    """非同期に受信するJSON配列を要素ごとに解析して集める.
+
+    Args:
+        chunks (Any): bytesを返す非同期イテレータ(aiohttpのr.content.iter_chunked()など)
+        keys (Optional[Sequence[str]], optional): 要素に残すキー(省略時はすべて).
+
+    Returns:
+        List[Any]: 解析結果
+    """
+    stream = JsonArrayStream(keys)
+    items: List[Any] = []
+    async for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    items.extend(stream.close())
+    return items
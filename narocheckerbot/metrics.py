@@ -0,0 +1,228 @@
+import bisect
+import time
+from contextlib import contextmanager
+from logging import getLogger
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# 所要時間(秒)のヒストグラムの区切り
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# メトリクス名の接頭辞
+PREFIX = "narochecker_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """所要時間の分布を区切りごとの件数で保持する."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        """初期化.
+
+        Args:
+            buckets (Tuple[float, ...], optional): 区切り(昇順)
+        """
+        self.buckets = buckets
+        # 最後の要素は区切りを超えたもの(+Inf)
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """値を記録.
+
+        Args:
+            value (float): 記録する値
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """区切りの上限から分位数を推定.
+
+        Args:
+            q (float): 分位(0.95など)
+
+        Returns:
+            float: 推定値(記録がない場合は0, 最大の区切りを超える場合はinf)
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        total = 0
+        for i, count in enumerate(self.counts):
+            total += count
+            if total >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    """カウンタとヒストグラムを保持するレジストリ.
+
+    /reloadでcogを読み込み直しても値が残るよう、モジュール変数metricsを共有して使う。
+    """
+
+    def __init__(self) -> None:
+        """初期化."""
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """カウンタを加算.
+
+        Args:
+            name (str): メトリクス名
+            value (float, optional): 加算する値. Defaults to 1.
+            labels (str): ラベル
+        """
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """ヒストグラムに値を記録.
+
+        Args:
+            name (str): メトリクス名
+            value (float): 記録する値
+            labels (str): ラベル
+        """
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """ブロックの所要時間をヒストグラムに記録する.
+
+        例外で抜けた場合も記録する。
+
+        Args:
+            name (str): メトリクス名
+            labels (str): ラベル
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式に変換.
+
+        Returns:
+            str: メトリクス
+        """
+        lines: List[str] = []
+        for name, counters in sorted(self.counters.items()):
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            for key, value in counters.items():
+                lines.append(f"{PREFIX}{name}{_format_labels(key)} {value}")
+        for name, histograms in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for key, histogram in histograms.items():
+                total = 0
+                for bound, count in zip(
+                    histogram.buckets + (float("inf"),), histogram.counts
+                ):
+                    total += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(
+                        f"{PREFIX}{name}_bucket"
+                        + f"{_format_labels(key + (('le', le),))} {total}"
+                    )
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(
+                    f"{PREFIX}{name}_count{_format_labels(key)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """人が読むための要約(/stats用).
+
+        Returns:
+            List[str]: 1系列1行の要約
+        """
+        lines: List[str] = []
+        for name, counters in sorted(self.counters.items()):
+            for key, value in counters.items():
+                lines.append(f"{name}{_format_labels(key)}: {value:g}")
+        for name, histograms in sorted(self.histograms.items()):
+            for key, histogram in histograms.items():
+                average = histogram.sum / histogram.count if histogram.count else 0.0
+                lines.append(
+                    f"{name}{_format_labels(key)}: {histogram.count}回"
+                    + f" 平均{average:.2f}s p95<={histogram.quantile(0.95):g}s"
+                )
+        return lines
+
+    pass
+
+
+def _format_labels(key: Labels) -> str:
+    """ラベルをPrometheusの形式に変換.
+
+    Args:
+        key (Labels): ラベル
+
+    Returns:
+        str: {name="value",...}の形式(ラベルが無ければ空文字)
+    """
+    if not key:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+# 共有のレジストリ
+metrics = Metrics()
+
+
+class MetricsServer:
+    """メトリクスをPrometheus形式で公開するHTTPサーバ."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1") -> None:
+        """初期化.
+
+        Args:
+            port (int): 待ち受けポート
+            host (str, optional): 待ち受けアドレス. Defaults to "127.0.0.1".
+        """
+        self.logger = getLogger("narocheckerlog.metrics")
+        self.port = port
+        self.host = host
+        self._runner: Optional["web.AppRunner"] = None
+
+    async def start(self) -> None:
+        """サーバを起動."""
+        # 使用しない場合に読み込みの時間がかからないよう、起動時に読み込む
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.logger.info(f"Metrics: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """サーバを停止."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        return web.Response(
+            text=metrics.render(), content_type="text/plain", charset="utf-8"
+        )
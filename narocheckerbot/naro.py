@@ -1,14 +1,29 @@
 import asyncio
-from datetime import datetime, timedelta
+import io
+import itertools
+import time
 from logging import getLogger
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
 
 import discord
 from discord import Interaction, app_commands
 from discord.errors import HTTPException
 from discord.ext import commands, tasks
 
-from narocheckerbot.apigateway_manager import ApiGatewayManager
-from narocheckerbot.config_manager import ConfigManager
+from narocheckerbot.metrics import MetricsServer, metrics
+from narocheckerbot.notifier import (
+    MESSAGE_LIMIT,
+    pack_embeds_counted,
+    pack_text_counted,
+)
+from narocheckerbot.tracked_work import TrackedWork
+from narocheckerbot.watchlist_io import export_ids, parse_ids
+from narocheckerbot.worker import Worker
+
+# /importで読み込むファイルの上限(バイト)
+IMPORT_FILE_LIMIT = 1024 * 1024
+# /importで進捗を更新する間隔(件数)
+IMPORT_STEP = 500
 
 
 class NaroChecker(commands.Cog):
@@ -29,86 +44,212 @@ class NaroChecker(commands.Cog):
         self.logger = getLogger("narocheckerlog.bot")
 
         # TODO: ConfigとApiConfigのFactoryを作成。サイトごとにセット管理できるようにする。
-        self.config_manager = ConfigManager()
-        self.gateway_manager = ApiGatewayManager()
-        self.checker.start()
+        # 更新チェックはWorkerで行い、通知は送信キューを経由してdeliverで送付する
+        self.worker = Worker()
+        self.config_manager = self.worker.config_manager
+        self.gateway_manager = self.worker.gateway_manager
+        self.poll_schedulers = self.worker.poll_schedulers
+        self.outbox = self.worker.outbox
+        self.checker.change_interval(
+            seconds=self.worker.check_interval / self.worker.slots
+        )
+        # メトリクスのHTTP公開(metrics_portを設定した場合のみ)
+        self.metrics_server: Optional[MetricsServer] = None
+        port = self.config_manager.settings.get("metrics_port")
+        if port is not None:
+            self.metrics_server = MetricsServer(
+                int(port),
+                str(self.config_manager.settings.get("metrics_host", "127.0.0.1")),
+            )
+        # settings.cluster.checkがfalseの場合は送付のみ行う
+        if self.worker.join:
+            self.checker.start()
+        self.deliver.start()
+
+    async def cog_load(self):
+        """cog読み込み処理."""
+        await self.worker.open()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
 
     async def cog_unload(self):
         """cog終了処理."""
         self.checker.cancel()
-
-    async def send_message(self, channel_id: int, message: str) -> None:
+        self.deliver.cancel()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.worker.close()
+
+    async def send_message(
+        self,
+        channel_id: int,
+        message: Optional[str],
+        embeds: Sequence[discord.Embed] = (),
+    ) -> bool:
         """指定ちゃんねるにメッセージ送付.
 
         Args:
-            message (str): 送付メッセージ
+            channel_id (int): 送付先チャンネルID
+            message (Optional[str]): 送付メッセージ
+            embeds (Sequence[discord.Embed], optional): 送付するembed
+
+        Returns:
+            bool: 送付できた場合はTrue
         """
         try:
             channel = self.bot.get_channel(channel_id)
             if isinstance(channel, discord.TextChannel):
-                await channel.send(message)
+                with metrics.timer("send_seconds"):
+                    if embeds:
+                        await channel.send(message, embeds=list(embeds))
+                    else:
+                        await channel.send(message)
+                metrics.inc("messages_sent_total")
                 # レートリミット対策
                 await asyncio.sleep(1)
+                return True
             else:
                 self.logger.error("書き込みチャンネルが見つかりません")
         except discord.errors.Forbidden:
             self.logger.error("書き込み権限がありません。")
-        pass
+        metrics.inc("send_failures_total")
+        return False
+
+    async def send_updates(
+        self, channel_id: int, messages: List[str], notify: str
+    ) -> int:
+        """更新メッセージを通知方式に従って送付.
+
+        送付に失敗した時点で中断する。
+
+        Args:
+            channel_id (int): 送付先チャンネルID
+            messages (List[str]): 更新メッセージリスト
+            notify (str): 通知方式(single: 1件ずつ, text: 改行でまとめる, embed: embedにまとめる)
+
+        Returns:
+            int: 送付できた件数(先頭からの更新メッセージの件数)
+        """
+        sent = 0
+        try:
+            if notify == "text":
+                for text, count in pack_text_counted(messages):
+                    if not await self.send_message(channel_id, text):
+                        break
+                    sent += count
+            elif notify == "embed":
+                for descriptions, count in pack_embeds_counted(messages):
+                    embeds = [
+                        discord.Embed(description=description)
+                        for description in descriptions
+                    ]
+                    if not await self.send_message(channel_id, None, embeds=embeds):
+                        break
+                    sent += count
+            else:
+                for message in messages:
+                    if not await self.send_message(channel_id, message):
+                        break
+                    sent += 1
+        except HTTPException:
+            self.logger.exception("通知の送付に失敗しました。再送します。")
+        return sent
+
+    @tasks.loop(seconds=10)
+    async def deliver(self) -> None:
+        """送信キューの通知を送付する."""
+        await self.deliver_pending()
+
+    async def deliver_pending(self) -> None:
+        """送信キューの通知を送付し、送付できたものから削除する.
+
+        送付できなかった通知のみ再送待ちにする。
+        """
+        items = await self.outbox.pending_async()
+
+        # 送付先と通知方式が同じ通知をまとめて送る
+        for (site, channel_id), group in itertools.groupby(
+            items, key=lambda item: (item.site, item.channel_id)
+        ):
+            group = list(group)
+            try:
+                notify = self.config_manager.get_config(site).options.get(
+                    "notify", "single"
+                )
+            except KeyError:
+                notify = "single"
+
+            sent = await self.send_updates(
+                channel_id, [item.message for item in group], notify
+            )
+            await self.outbox.ack_async(group[:sent])
+            if sent < len(group):
+                await self.outbox.retry_later_async(group[sent:])
+
+    @deliver.before_loop
+    async def before_deliver(self):
+        """送付開始前に実施."""
+        await self.bot.wait_until_ready()
 
     @tasks.loop(seconds=3600)
     async def checker(self) -> None:
         """定期的に実行する処理."""
-        await self.naro_update_check()
+        await self.naro_update_check(self.worker.next_slot())
 
-    async def naro_update_check(self) -> None:
-        """更新チェックメイン処理."""
-        self.logger.info("Check: Start")
+    async def naro_update_check(self, slot: Optional[int] = None) -> None:
+        """更新チェックメイン処理.
 
+        Args:
+            slot (Optional[int], optional): チェックするスロット番号.
+                Noneの場合はすべての作品をチェックする.
+        """
+        self.logger.info(f"Check: Start (slot: {slot}/{self.worker.slots})")
+        await self.worker.prepare()
+
+        # サイトごとに並行してチェックする(エラーは各サイト内で処理)
         self._support = ["naro", "naro18", "naro_blog"]
-        for support_site in self._support:
-            try:
-                channel_id = self.config_manager.get_config(support_site).channel_id
-                try:
-                    updated = False
-                    urls = self.config_manager.get_config(support_site).urls
-
-                    results = await self.gateway_manager.get_gateway(support_site).exec(
-                        urls
-                    )
-
-                    if results:
-                        for message in results:
-                            if message:
-                                updated = True
-                                await self.send_message(channel_id, message)
-
-                    if updated:
-                        # TODO: 更新に失敗したら書き込まれない。
-                        self.config_manager.write_yaml()
-                except HTTPException:
-                    message = "レートリミットが発生しました。更新通知が正常に届かない可能性があります"
-                    self.logger.exception(message)
-                    # レートリミット発生中のため長めの待ち時間を設定
-                    await asyncio.sleep(3)
-                    await self.send_message(channel_id, message)
-                except AttributeError:
-                    message = (
-                        "要素参照エラーが発生しました。エラーログを確認してください。"
-                    )
-                    self.logger.exception(message)
-                    await self.send_message(channel_id, message)
-                except Exception:
-                    message = (
-                        "処理中に問題が発生しました。エラーログを確認してください。"
-                    )
-                    self.logger.exception(message)
-                    await self.send_message(channel_id, message)
-            except KeyError:
-                "見つからなければ何もしない"
-                self.logger.error(f"{support_site} is not found.")
+        with metrics.timer("cycle_seconds"):
+            async with asyncio.TaskGroup() as tg:
+                for support_site in self._support:
+                    tg.create_task(self.site_update_check(support_site, slot))
 
         self.logger.info("Check: Finish")
 
+    async def site_update_check(
+        self, support_site: str, slot: Optional[int] = None
+    ) -> None:
+        """サイト別の更新チェック.
+
+        Args:
+            support_site (str): サポートサイト
+            slot (Optional[int], optional): チェックするスロット番号.
+        """
+        try:
+            config = self.config_manager.get_config(support_site)
+            channel_id = config.channel_id
+            try:
+                await self.worker.site_update_check(support_site, slot)
+            except HTTPException:
+                message = "レートリミットが発生しました。更新通知が正常に届かない可能性があります"
+                self.logger.exception(message)
+                # レートリミット発生中のため長めの待ち時間を設定
+                await asyncio.sleep(3)
+                await self.send_message(channel_id, message)
+            except AttributeError:
+                message = "要素参照エラーが発生しました。エラーログを確認してください。"
+                self.logger.exception(message)
+                await self.send_message(channel_id, message)
+            except Exception:
+                message = "処理中に問題が発生しました。エラーログを確認してください。"
+                self.logger.exception(message)
+                await self.send_message(channel_id, message)
+        except KeyError:
+            "見つからなければ何もしない"
+            self.logger.error(f"{support_site} is not found.")
+        except Exception:
+            # エラー通知自体に失敗しても他サイトのチェックは止めない
+            self.logger.exception(f"{support_site}: エラー通知に失敗しました")
+
     @checker.before_loop
     async def before_checker(self):
         """更新チェック開始前に実施."""
@@ -118,17 +259,9 @@ class NaroChecker(commands.Cog):
         # 定期チェック開始まで時間がかかる場合があるため、起動直後にもチェックを実施
         await self.naro_update_check()
 
-        # 更新の反映に最大5分かかるということで、予備で+2分設定。
-        dt_now = datetime.now()
-        dt2 = dt_now.replace(minute=7, second=0)
-
-        if dt2 > dt_now:
-            td = dt2 - dt_now
-        else:
-            td = dt2 - dt_now + timedelta(hours=1)
-
-        self.logger.info(f"Wait time : {td.total_seconds()}")
-        await asyncio.sleep(td.total_seconds())
+        wait = self.worker.next_delay()
+        self.logger.info(f"Wait time : {wait}")
+        await asyncio.sleep(wait)
 
     @app_commands.command()
     @app_commands.default_permissions()
@@ -149,15 +282,15 @@ class NaroChecker(commands.Cog):
             return
 
         # 本チェック(登録できるか確認)
-        url = {"lastupdated": datetime.now(), "ncode": ncode}
+        url = TrackedWork(ncode, time.time())
         (new_lastup, title) = await self.gateway_manager.get_gateway("naro").request(
             url
         )
 
         if len(title) > 0:
-            url["lastupdated"] = new_lastup
+            url.lastupdated = new_lastup
             config.add(url)
-            self.config_manager.write_yaml()
+            self.config_manager.request_write()
 
             self.logger.info(f"Add Success: {ncode}")
             await interaction.followup.send(f"{ncode}:{title}を追加しました")
@@ -179,13 +312,212 @@ class NaroChecker(commands.Cog):
         config = self.config_manager.get_config("naro")
         removed_value = config.delete(ncode)
         if removed_value:
-            self.config_manager.write_yaml()
+            self.config_manager.request_write()
             self.logger.info(f"Delete Success: {ncode}")
             await interaction.response.send_message(f"{ncode}を削除しました")
         else:
             self.logger.error(f"Delete Failed: {ncode}")
             await interaction.response.send_message("登録していない ncode です。")
 
+    @app_commands.command()
+    @app_commands.default_permissions()
+    async def subscribe(
+        self,
+        interaction: Interaction,
+        id: str,
+        site: Literal["naro", "naro18", "naro_blog"] = "naro",
+    ) -> None:
+        """このチャンネルに作品の更新を通知します(Bot管理者のみ実行可能).
+
+        Args:
+            interaction (Interaction): インタラクション情報
+            id (str): ncodeまたはユーザID
+            site (str): サポートサイト
+        """
+        await interaction.response.defer()
+
+        try:
+            config = self.config_manager.get_config(site)
+        except KeyError:
+            await interaction.followup.send(f"{site}は設定されていません。")
+            return
+
+        ids = parse_ids(site, id)
+        if not ids or interaction.channel_id is None:
+            await interaction.followup.send(f"{id}は正しい形式ではありません。")
+            return
+        id = ids[0]
+        channel_id = interaction.channel_id
+
+        # 登録済みの作品は通知先を追加するだけで、取得は既存の登録情報で行う
+        url = config.get(id)
+        if url is not None:
+            if config.subscribe(url, channel_id):
+                self.config_manager.request_write()
+                await interaction.followup.send(f"{id}の通知先に追加しました")
+            else:
+                await interaction.followup.send(f"{id}はすでに通知しています.")
+            return
+
+        found = await self.gateway_manager.get_gateway(site).lookup([id])
+        if id not in found:
+            self.logger.error(f"Subscribe Failed: {id}")
+            await interaction.followup.send(
+                f"登録に失敗しました。{id}が正しいものか確認してください。"
+            )
+            return
+
+        (lastupdated, title) = found[id]
+        config.add(TrackedWork(id, lastupdated, [channel_id]))
+        self.config_manager.request_write()
+        self.logger.info(f"Subscribe Success: {id} {channel_id}")
+        await interaction.followup.send(f"{id}:{title}を追加しました")
+
+    @app_commands.command()
+    @app_commands.default_permissions()
+    async def unsubscribe(
+        self,
+        interaction: Interaction,
+        id: str,
+        site: Literal["naro", "naro18", "naro_blog"] = "naro",
+    ) -> None:
+        """このチャンネルへの作品の更新通知を解除します(Bot管理者のみ実行可能).
+
+        通知先がなくなった作品はチェックも解除します。
+
+        Args:
+            interaction (Interaction): インタラクション情報
+            id (str): ncodeまたはユーザID
+            site (str): サポートサイト
+        """
+        try:
+            config = self.config_manager.get_config(site)
+        except KeyError:
+            await interaction.response.send_message(f"{site}は設定されていません。")
+            return
+
+        ids = parse_ids(site, id)
+        channel_id = interaction.channel_id
+        if ids and channel_id is not None and config.unsubscribe(ids[0], channel_id):
+            self.config_manager.request_write()
+            self.logger.info(f"Unsubscribe Success: {ids[0]} {channel_id}")
+            await interaction.response.send_message(f"{ids[0]}の通知を解除しました")
+        else:
+            await interaction.response.send_message(
+                "このチャンネルに通知していない作品です。"
+            )
+
+    @app_commands.command(name="import")
+    @app_commands.default_permissions()
+    async def import_(
+        self,
+        interaction: Interaction,
+        site: Literal["naro", "naro18", "naro_blog"] = "naro",
+        ids: Optional[str] = None,
+        file: Optional[discord.Attachment] = None,
+    ) -> None:
+        """チェックする作品の一括追加コマンドです(Bot管理者のみ実行可能).
+
+        Args:
+            interaction (Interaction): インタラクション情報
+            site (str): サポートサイト
+            ids (Optional[str]): ncodeまたはユーザID(空白・改行・カンマ区切り)
+            file (Optional[discord.Attachment]): IDを記載したテキストファイル
+        """
+        await interaction.response.defer()
+
+        try:
+            config = self.config_manager.get_config(site)
+        except KeyError:
+            await interaction.followup.send(f"{site}は設定されていません。")
+            return
+
+        text = ids or ""
+        if file is not None:
+            if file.size > IMPORT_FILE_LIMIT:
+                await interaction.followup.send("ファイルが大きすぎます(上限1MB)。")
+                return
+            text += "\n" + (await file.read()).decode("utf-8-sig", errors="replace")
+
+        candidates = parse_ids(site, text)
+        new_ids = [id for id in candidates if not config.is_exist(id)]
+        if not new_ids:
+            await interaction.followup.send(
+                f"追加できるIDがありません(登録済み: {len(candidates)}件)"
+            )
+            return
+
+        # 件数が多い場合に応答がないまま待たせないよう、確認の進捗を表示する
+        gateway = self.gateway_manager.get_gateway(site)
+        progress = await interaction.followup.send(
+            f"確認中: 0/{len(new_ids)}", wait=True
+        )
+        found: Dict[str, Tuple[float, str]] = {}
+        for i in range(0, len(new_ids), IMPORT_STEP):
+            found.update(await gateway.lookup(new_ids[i : i + IMPORT_STEP]))
+            await progress.edit(
+                content=f"確認中: {min(i + IMPORT_STEP, len(new_ids))}/{len(new_ids)}"
+            )
+
+        added = config.add_many(
+            TrackedWork(id, found[id][0]) for id in new_ids if id in found
+        )
+        if added:
+            self.config_manager.request_write()
+
+        invalid = [id for id in new_ids if id not in found]
+        self.logger.info(f"Import: {site} added={len(added)} invalid={len(invalid)}")
+        message = (
+            f"{len(added)}件を追加しました"
+            + f"(登録済み: {len(candidates) - len(new_ids)}件,"
+            + f" 確認できなかったもの: {len(invalid)}件)"
+        )
+        if invalid:
+            message += "\n" + " ".join(invalid)
+        if len(message) > MESSAGE_LIMIT:
+            message = message[: MESSAGE_LIMIT - 1] + "…"
+        await progress.edit(content=message)
+
+    @app_commands.command()
+    @app_commands.default_permissions()
+    async def export(
+        self,
+        interaction: Interaction,
+        site: Literal["naro", "naro18", "naro_blog"] = "naro",
+    ) -> None:
+        """チェックしている作品の一覧をファイルで出力します(Bot管理者のみ実行可能).
+
+        Args:
+            interaction (Interaction): インタラクション情報
+            site (str): サポートサイト
+        """
+        try:
+            config = self.config_manager.get_config(site)
+        except KeyError:
+            await interaction.response.send_message(f"{site}は設定されていません。")
+            return
+
+        data = export_ids(config.urls).encode("utf-8")
+        await interaction.response.send_message(
+            f"{site}: {len(config.urls)}件",
+            file=discord.File(io.BytesIO(data), filename=f"{site}.txt"),
+        )
+
+    @app_commands.command()
+    @app_commands.default_permissions()
+    async def stats(self, interaction: Interaction) -> None:
+        """動作状況の統計を表示します(Bot管理者のみ実行可能).
+
+        Args:
+            interaction (Interaction): インタラクション情報
+        """
+        lines = metrics.summary()
+        lines.append(f"送信待ち: {await self.outbox.count_async()}件")
+        message = "\n".join(lines)
+        if len(message) > MESSAGE_LIMIT - 8:
+            message = message[: MESSAGE_LIMIT - 9] + "…"
+        await interaction.response.send_message(f"```\n{message}\n```")
+
     @app_commands.command()
     @app_commands.default_permissions()
     async def reload(self, interaction: Interaction):
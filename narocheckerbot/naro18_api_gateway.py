@@ -1,48 +1,23 @@
-import asyncio
-from datetime import datetime
 from logging import getLogger
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any
 
-import aiohttp
-from ruamel.yaml import YAML
+from narocheckerbot.naro_api_gateway import NaroApiGateway
 
-from narocheckerbot.webapi_gateway import WebApiGateway
 
-
-class Naro18ApiGateway(WebApiGateway):
+class Naro18ApiGateway(NaroApiGateway):
     """小説の更新確認を行う."""
 
     def __init__(self) -> None:
         """初期化."""
+        super().__init__()
         self.logger = getLogger("narocheckerlog.naro18api")
-        self.sem = asyncio.Semaphore(10)
-
-        # 抽象化のための情報
-        self.id = "ncode"
+        self.api_url = "https://api.syosetu.com/novel18api/api/"
+        self.site = "naro18"
 
         pass
 
-    async def exec(self, urls: Optional[List[Dict[str, Any]]]) -> List[str]:
-        """チェック処理本体.
-
-        Args:
-            urls (Optional[List[Dict[str, Any]]]): ncodeと最終更新日を記載した辞書データ リスト
-
-        Returns:
-            List[str]: 更新メッセージリスト
-        """
-        if urls is None:
-            self.logger.info("Check: Url is None.")
-            results = [""]
-        else:
-            promises = [self._check_update(url) for url in urls]
-            results = await asyncio.gather(*promises)
-
-            self.logger.info("Check: Success")
-        return results
-
-    def create_query(self, id: Any) -> str:
-        """APIに与えるURLを作成
+    def create_page(self, id: Any) -> str:
+        """小説ページのURLを作成
 
         Args:
             id (Any): ncode
@@ -50,82 +25,6 @@ class Naro18ApiGateway(WebApiGateway):
         Returns:
             str: URL
         """
-        return f"https://api.syosetu.com/novel18api/api/?ncode={id}&of=t-gl"
-
-    async def _check_update(self, url: Dict[str, Any]) -> str:
-        """更新チェック走査.
-
-        Args:
-            url (Dict[str, Any]): ncodeと最終更新日を記載した辞書データ
-
-        Returns:
-            str: 更新メッセージ
-        """
-        message = ""
-        async with self.sem:
-            (lastupdated, title) = await self.request(url)
-
-        # 更新があれば
-        if len(title) > 0:
-            self.logger.info(f"Check Success: {url[self.id]}")
-            if url["lastupdated"] != lastupdated:
-                url["lastupdated"] = lastupdated
-
-                page = f"https://novel18.syosetu.com/{url[self.id]}/"
-                message = f"[更新] {title} {page}"
-                self.logger.info(f"Update: {url[self.id]} {title}")
-        else:
-            message = f"Check Failed: {url[self.id]}"
-            self.logger.error(message)
-
-        return message
-
-    async def request(self, url: Dict[str, Any]) -> Tuple[datetime, str]:
-        """URLチェック.
-
-        Args:
-            url (Dict[str, Any]): ncodeと最終更新日を記載した辞書データ
-
-        Returns:
-            Tuple[datetime, str]: 最終更新日, タイトル
-        """
-        try:
-            async with aiohttp.ClientSession() as session:
-                ncode = url[self.id]
-                self.logger.info(f"Check: {ncode}")
-                address = self.create_query(ncode)
-                # Todo : 存在チェックは可能?
-
-                cnt = 0
-                while cnt < 5:
-                    # 関数化
-                    try:
-                        async with session.get(address) as r:
-                            yaml = YAML()
-                            result = yaml.load(await r.text())
-                            if len(result) == 2:
-                                return (result[1]["general_lastup"], result[1]["title"])
-                            elif len(result) < 2:
-                                self.logger.error(f"Not Found: {ncode} {cnt}")
-                                break
-                            else:
-                                self.logger.error(f"Lots of candidates: {ncode} {cnt}")
-                                break
-                    except TypeError:
-                        self.logger.error(f"Retry check: {ncode} {cnt}")
-                        cnt = cnt + 1
-                        await asyncio.sleep(60)
-                    except IndexError:
-                        self.logger.error(f"IndexError check: {ncode} {cnt}")
-                        cnt = cnt + 1
-                        await asyncio.sleep(60)
-                    except OSError:
-                        self.logger.exception(f"Timeout Semaphore: {ncode} {cnt}")
-                        break
-                if cnt >= 5:
-                    self.logger.info(f"Timeout check: {ncode}")
-        except TypeError as e:
-            self.logger.exception(f"Error check: {e}")
-        return (datetime.now(), "")
+        return f"https://novel18.syosetu.com/{id}/"
 
     pass
@@ -1,32 +1,78 @@
 import asyncio
-from datetime import datetime
+import itertools
+import time
 from logging import getLogger
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import aiohttp
-from ruamel.yaml import YAML
 
+from narocheckerbot.json_stream import read_array
+from narocheckerbot.response_parser import parse_json, parse_lastup, parse_yaml
+from narocheckerbot.retry_scheduler import (
+    RETRYABLE_ERRORS,
+    CircuitOpenError,
+    NotFoundError,
+    raise_for_status,
+)
+from narocheckerbot.tracked_work import TrackedWork
 from narocheckerbot.webapi_gateway import WebApiGateway
 
+# レスポンスの要素のうち使用する項目(件数, ncode, タイトル, 最終更新日)
+KEYS = ("allcount", "ncode", "title", "general_lastup")
+
 
 class NaroApiGateway(WebApiGateway):
     """小説の更新確認を行う."""
 
     def __init__(self) -> None:
         """初期化."""
+        super().__init__()
         self.logger = getLogger("narocheckerlog.naroapi")
         self.sem = asyncio.Semaphore(10)
 
         # 抽象化のための情報
         self.id = "ncode"
+        self.api_url = "https://api.syosetu.com/novelapi/api/"
+        self.site = "naro"
+
+        # 1リクエストでまとめて問い合わせるncodeの数(APIのlim上限は500)
+        self.batch_size = 500
+        # レスポンス形式("json"はgzip圧縮で取得, "yaml"は従来形式)
+        self.format = "json"
+        # JSON形式を逐次解析する際の読み込み単位(バイト)
+        self.chunk_size = 65536
+        # チェック方式("full"は全作品を問い合わせ, "diff"は前回以降の更新作品のみ取得)
+        self.check_mode = "full"
+        # diffでも一定間隔ごとに全作品を問い合わせて整合性を確認する(秒)
+        self.full_check_interval = 86400.0
+        # APIへの反映遅れを考慮して問い合わせ期間をさかのぼる秒数
+        self.diff_margin = 600.0
+
+        # 作品ごとの前回チェック時刻, 前回全件チェック時刻(UNIX時間)
+        self._checked: Dict[str, float] = {}
+        self._verified: Dict[str, float] = {}
 
         pass
 
-    async def exec(self, urls: Optional[List[Dict[str, Any]]]) -> List[str]:
+    def configure(self, options: Dict[str, Any]) -> None:
+        """サイト別設定を反映.
+
+        Args:
+            options (Dict[str, Any]): config.yamlのoptions
+        """
+        self.batch_size = int(options.get("batch_size", self.batch_size))
+        self.format = str(options.get("format", self.format))
+        self.api_url = str(options.get("api_url", self.api_url))
+        self.check_mode = str(options.get("check_mode", self.check_mode))
+        self.full_check_interval = float(
+            options.get("full_check_interval", self.full_check_interval)
+        )
+
+    async def exec(self, urls: Optional[List[TrackedWork]]) -> List[str]:
         """チェック処理本体.
 
         Args:
-            urls (Optional[List[Dict[str, Any]]]): ncodeと最終更新日を記載した辞書データ リスト
+            urls (Optional[List[TrackedWork]]): 登録情報リスト
 
         Returns:
             List[str]: 更新メッセージリスト
@@ -35,97 +81,360 @@ class NaroApiGateway(WebApiGateway):
             self.logger.info("Check: Url is None.")
             results = [""]
         else:
-            promises = [self._check_update(url) for url in urls]
-            results = await asyncio.gather(*promises)
-
+            results = await self._check_all(urls)
             self.logger.info("Check: Success")
         return results
 
+    async def check(
+        self, urls: List[TrackedWork], failed: Optional[Set[str]] = None
+    ) -> List[List[str]]:
+        """登録情報ごとに更新チェック.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+            failed (Optional[Set[str]], optional): 取得に失敗したIDを追加する集合.
+
+        Returns:
+            List[List[str]]: urlsと同じ順の、作品ごとの更新メッセージリスト
+        """
+        start = time.time()
+        results = await self._check_all(urls)
+        if failed is not None:
+            # 今回の問い合わせで確認できなかった作品は取得に失敗したものとする
+            failed.update(
+                url.id for url in urls if self._checked.get(url.id.lower(), 0.0) < start
+            )
+        self.logger.info("Check: Success")
+        return [[message] if message else [] for message in results]
+
+    async def _check_all(self, urls: List[TrackedWork]) -> List[str]:
+        """設定されたチェック方式で更新チェック.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+
+        Returns:
+            List[str]: urlsと同じ順の更新メッセージリスト(更新なしは空文字)
+        """
+        if self.check_mode == "diff":
+            return await self._check_diff(urls)
+        return await self._check_full(urls)
+
+    async def _check_full(self, urls: List[TrackedWork]) -> List[str]:
+        """全作品をncode指定で問い合わせて更新チェック.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+
+        Returns:
+            List[str]: 更新メッセージリスト
+        """
+        promises = [
+            self._check_batch(urls[i : i + self.batch_size])
+            for i in range(0, len(urls), self.batch_size)
+        ]
+        return list(itertools.chain.from_iterable(await asyncio.gather(*promises)))
+
+    async def _check_diff(self, urls: List[TrackedWork]) -> List[str]:
+        """前回チェック以降に更新された作品を取得し、登録作品と突き合わせて更新チェック.
+
+        前回チェック時刻が不明な作品、full_check_intervalを過ぎた作品、
+        更新作品の一覧を取得しきれなかった場合はncode指定で問い合わせる。
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+
+        Returns:
+            List[str]: 更新メッセージリスト
+        """
+        now = time.time()
+        results = [""] * len(urls)
+        full: List[int] = []
+        diff: List[int] = []
+        for i, url in enumerate(urls):
+            verified = self._verified.get(url.id.lower())
+            if verified is None or now - verified >= self.full_check_interval:
+                full.append(i)
+            else:
+                diff.append(i)
+
+        if diff:
+            since = min(self._checked[urls[i].id.lower()] for i in diff)
+            novels = await self.request_updated(int(since - self.diff_margin), int(now))
+            if novels is None:
+                full.extend(diff)
+            else:
+                for i in diff:
+                    ncode = urls[i].id.lower()
+                    novel = novels.get(ncode)
+                    if novel is not None:
+                        results[i] = self._check_update(urls[i], novel)
+                    self._checked[ncode] = now
+
+        if full:
+            full.sort()
+            for i, message in zip(
+                full, await self._check_full([urls[i] for i in full])
+            ):
+                results[i] = message
+        return results
+
     def create_query(self, id: Any) -> str:
         """APIに与えるURLを作成
 
+        Args:
+            id (Any): ncode(複数指定する場合はハイフン区切り)
+
+        Returns:
+            str: URL
+        """
+        return (
+            self.api_url
+            + f"?ncode={id}&of=n-t-gl&lim={self.batch_size}"
+            + self.create_format_query()
+        )
+
+    def create_updated_query(self, since: int, until: int, start: int) -> str:
+        """指定期間に更新された作品を新しい順に取得するURLを作成
+
+        Args:
+            since (int): 期間の開始(UNIX時間)
+            until (int): 期間の終了(UNIX時間)
+            start (int): 取得開始位置(1始まり)
+
+        Returns:
+            str: URL
+        """
+        return (
+            self.api_url
+            + f"?lastup={since}-{until}&order=new&of=n-t-gl&lim=500&st={start}"
+            + self.create_format_query()
+        )
+
+    def create_format_query(self) -> str:
+        """レスポンス形式を指定するクエリを作成
+
+        Returns:
+            str: クエリ文字列
+        """
+        if self.format == "json":
+            return "&out=json&gzip=5"
+        return ""
+
+    def create_page(self, id: Any) -> str:
+        """小説ページのURLを作成
+
         Args:
             id (Any): ncode
 
         Returns:
             str: URL
         """
-        return f"https://api.syosetu.com/novelapi/api/?ncode={id}&of=t-gl"
+        return f"https://ncode.syosetu.com/{id}/"
+
+    async def _check_batch(self, urls: List[TrackedWork]) -> List[str]:
+        """複数の小説をまとめて更新チェック.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+
+        Returns:
+            List[str]: 更新メッセージリスト
+        """
+        novels = await self.request_batch([url.id for url in urls])
+
+        now = time.time()
+        for ncode in novels:
+            self._checked[ncode] = now
+            self._verified[ncode] = now
+
+        return [self._check_update(url, novels.get(url.id.lower())) for url in urls]
 
-    async def _check_update(self, url: Dict[str, Any]) -> str:
+    def _check_update(
+        self, url: TrackedWork, novel: Optional[Tuple[float, str]]
+    ) -> str:
         """更新チェック走査.
 
         Args:
-            url (Dict[str, Any]): ncodeと最終更新日を記載した辞書データ
+            url (TrackedWork): 登録情報
+            novel (Optional[Tuple[float, str]]): 最終更新日(UNIX時間), タイトル(取得できなければNone)
 
         Returns:
             str: 更新メッセージ
         """
         message = ""
-        async with self.sem:
-            (lastupdated, title) = await self.request(url)
 
         # 更新があれば
-        if len(title) > 0:
-            self.logger.info(f"Check Success: {url[self.id]}")
-            if url["lastupdated"] != lastupdated:
-                url["lastupdated"] = lastupdated
+        if novel is not None:
+            (lastupdated, title) = novel
+            self.logger.info(f"Check Success: {url.id}")
+            if url.lastupdated != lastupdated:
+                url.lastupdated = lastupdated
 
-                page = f"https://ncode.syosetu.com/{url[self.id]}/"
+                page = self.create_page(url.id)
                 message = f"[更新] {title} {page}"
-                self.logger.info(f"Update: {url[self.id]} {title}")
+                self.logger.info(f"Update: {url.id} {title}")
         else:
-            message = f"Check Failed: {url[self.id]}"
+            message = f"Check Failed: {url.id}"
             self.logger.error(message)
 
         return message
 
-    async def request(self, url: Dict[str, Any]) -> Tuple[datetime, str]:
+    async def request(self, url: TrackedWork) -> Tuple[float, str]:
         """URLチェック.
 
         Args:
-            url (Dict[str, Any]): ncodeと最終更新日を記載した辞書データ
+            url (TrackedWork): 登録情報
 
         Returns:
-            Tuple[datetime, str]: 最終更新日, タイトル
+            Tuple[float, str]: 最終更新日(UNIX時間), タイトル
         """
+        novels = await self.request_batch([url.id])
+        return novels.get(url.id.lower(), (time.time(), ""))
+
+    async def lookup(self, ids: List[str]) -> Dict[str, Tuple[float, str]]:
+        """登録前の確認としてncodeの最終更新日とタイトルをまとめて取得.
+
+        Args:
+            ids (List[str]): ncodeリスト
+
+        Returns:
+            Dict[str, Tuple[float, str]]: 存在した小文字のncodeをキーとした最終更新日(UNIX時間), タイトル
+        """
+        promises = [
+            self.request_batch(ids[i : i + self.batch_size])
+            for i in range(0, len(ids), self.batch_size)
+        ]
+        novels: Dict[str, Tuple[float, str]] = {}
+        for batch in await asyncio.gather(*promises):
+            novels.update(batch)
+        return novels
+
+    async def request_batch(self, ncodes: List[str]) -> Dict[str, Tuple[float, str]]:
+        """複数のncodeをまとめて問い合わせる.
+
+        Args:
+            ncodes (List[str]): ncodeリスト(batch_size件以下)
+
+        Returns:
+            Dict[str, Tuple[float, str]]: 小文字のncodeをキーとした最終更新日(UNIX時間), タイトル
+        """
+        novels: Dict[str, Tuple[float, str]] = {}
+        ncode = "-".join(ncodes)
+        address = self.create_query(ncode)
+
+        async def fetch() -> List[Any]:
+            self.logger.info(f"Check: {ncode}")
+            async with self.get_session().get(address) as r:
+                raise_for_status(r)
+                result = await self.read(r)
+                # 先頭要素は件数(allcount)なので読み飛ばす
+                return result[1:]
+
         try:
-            async with aiohttp.ClientSession() as session:
-                ncode = url[self.id]
-                self.logger.info(f"Check: {ncode}")
-                address = self.create_query(ncode)
-                # Todo : 存在チェックは可能?
-
-                cnt = 0
-                while cnt < 5:
-                    # 関数化
-                    try:
-                        async with session.get(address) as r:
-                            yaml = YAML()
-                            result = yaml.load(await r.text())
-                            if len(result) == 2:
-                                return (result[1]["general_lastup"], result[1]["title"])
-                            elif len(result) < 2:
-                                self.logger.error(f"Not Found: {ncode} {cnt}")
-                                break
-                            else:
-                                self.logger.error(f"Lots of candidates: {ncode} {cnt}")
-                                break
-                    except TypeError:
-                        self.logger.error(f"Retry check: {ncode} {cnt}")
-                        cnt = cnt + 1
-                        await asyncio.sleep(60)
-                    except IndexError:
-                        self.logger.error(f"IndexError check: {ncode} {cnt}")
-                        cnt = cnt + 1
-                        await asyncio.sleep(60)
-                    except OSError:
-                        self.logger.exception(f"Timeout Semaphore: {ncode} {cnt}")
-                        break
-                if cnt >= 5:
-                    self.logger.info(f"Timeout check: {ncode}")
-        except TypeError as e:
-            self.logger.exception(f"Error check: {e}")
-        return (datetime.now(), "")
+            for novel in await self.scheduler.run(
+                address, self.sem, fetch, site=self.site
+            ):
+                novels[str(novel["ncode"]).lower()] = (
+                    parse_lastup(novel["general_lastup"]).timestamp(),
+                    novel["title"],
+                )
+        except CircuitOpenError:
+            self.logger.error(f"Circuit open: {ncode}")
+        except NotFoundError as e:
+            # 存在しないncodeとして扱う(下記でNot Foundを記録する)
+            self.logger.error(f"Not Found: {ncode} {e}")
+        except RETRYABLE_ERRORS as e:
+            self.logger.error(f"Timeout check: {ncode} {e!r}")
+
+        for code in ncodes:
+            if str(code).lower() not in novels:
+                self.logger.error(f"Not Found: {code}")
+        return novels
+
+    async def request_updated(
+        self, since: int, until: int
+    ) -> Optional[Dict[str, Tuple[float, str]]]:
+        """指定期間に更新された作品をまとめて取得する.
+
+        APIで取得できる件数(開始位置2000件まで)を超えた場合は
+        取りこぼしが出るため、取得失敗として扱う。
+
+        Args:
+            since (int): 期間の開始(UNIX時間)
+            until (int): 期間の終了(UNIX時間)
+
+        Returns:
+            Optional[Dict[str, Tuple[float, str]]]: 小文字のncodeをキーとした最終更新日(UNIX時間), タイトル
+                (取得できなければNone)
+        """
+        novels: Dict[str, Tuple[float, str]] = {}
+        start = 1
+        while True:
+            address = self.create_updated_query(since, until, start)
+
+            async def fetch() -> List[Any]:
+                self.logger.info(f"Check: updated {since}-{until} from {start}")
+                async with self.get_session().get(address) as r:
+                    raise_for_status(r)
+                    return await self.read(r)
+
+            try:
+                result = await self.scheduler.run(
+                    address, self.sem, fetch, site=self.site
+                )
+            except CircuitOpenError:
+                self.logger.error(f"Circuit open: updated {since}-{until}")
+                return None
+            except NotFoundError as e:
+                self.logger.error(f"Not Found: updated {since}-{until} {e}")
+                return None
+            except RETRYABLE_ERRORS as e:
+                self.logger.error(f"Timeout check: updated {since}-{until} {e!r}")
+                return None
+
+            # 先頭要素は件数(allcount)
+            allcount = int(result[0]["allcount"])
+            for novel in result[1:]:
+                novels[str(novel["ncode"]).lower()] = (
+                    parse_lastup(novel["general_lastup"]).timestamp(),
+                    novel["title"],
+                )
+
+            if len(novels) >= allcount or len(result) <= 1:
+                return novels
+            start += 500
+            if start > 2000:
+                self.logger.warning(f"Too many updates: {allcount}")
+                return None
+
+    async def read(self, r: aiohttp.ClientResponse) -> List[Any]:
+        """レスポンスを受信しながら解析.
+
+        JSON形式は受信した分から作品ごとに解析し、使用する項目だけを残す。
+        YAML形式は全体を受信してから解析する。
+
+        Args:
+            r (aiohttp.ClientResponse): レスポンス
+
+        Returns:
+            List[Any]: 解析結果
+        """
+        if self.format == "json":
+            return await read_array(r.content.iter_chunked(self.chunk_size), KEYS)
+        return self.parse(await r.read())
+
+    def parse(self, body: bytes) -> List[Any]:
+        """レスポンスを設定された形式で解析.
+
+        Args:
+            body (bytes): レスポンスボディ
+
+        Returns:
+            List[Any]: 解析結果
+        """
+        if self.format == "json":
+            return parse_json(body)
+        return parse_yaml(body)
 
     pass
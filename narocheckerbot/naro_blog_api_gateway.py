@@ -1,33 +1,175 @@
 import asyncio
+import hashlib
 import itertools
-from datetime import datetime
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from email.utils import parsedate
+from functools import partial
 from logging import getLogger
 from time import mktime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
 
 import feedparser
 
+from narocheckerbot.feed_cache import FeedCache
+from narocheckerbot.retry_scheduler import (
+    CircuitOpenError,
+    NotFoundError,
+    raise_for_status,
+)
+from narocheckerbot.tracked_work import TrackedWork
 from narocheckerbot.webapi_gateway import WebApiGateway
 
 
+def parse_feed(body: bytes, headers: Dict[str, str]) -> feedparser.FeedParserDict:
+    """取得済みのAtomフィードを解析.
+
+    feedparserにURLを渡した場合と同様に、Last-Modifiedヘッダを
+    フィードの最終更新日(updated)として扱う。
+
+    Args:
+        body (bytes): レスポンスボディ
+        headers (Dict[str, str]): 小文字のヘッダ名をキーとしたレスポンスヘッダ
+
+    Returns:
+        feedparser.FeedParserDict: 解析結果
+    """
+    d = feedparser.parse(body, response_headers=headers)
+
+    modified = headers.get("last-modified")
+    modified_parsed = parsedate(modified) if modified else None
+    if modified and modified_parsed:
+        d["modified"] = modified
+        d["modified_parsed"] = modified_parsed
+    elif "updated" in d.feed:
+        d["modified"] = d.feed["updated"]
+        d["modified_parsed"] = d.feed["updated_parsed"]
+    return d
+
+
+class FeedUpdate(NamedTuple):
+    """フィードの解析結果のうち通知に必要な部分.
+
+    別プロセスで解析した場合に受け渡す量を抑えるため、解析結果全体は返さない。
+    """
+
+    # 解析エラーの内容(正常な場合はNone)
+    error: Optional[str]
+    # フィードの最終更新日(ログ出力用)
+    updated: str
+    # 更新があった場合の新しい最終更新日(UNIX時間, 更新がなければNone)
+    lastupdated: Optional[float]
+    # 前回更新以降のエントリの更新メッセージ
+    messages: List[str]
+
+
+def extract_updates(
+    body: bytes, headers: Dict[str, str], lastupdated: float
+) -> FeedUpdate:
+    """フィードを解析し、前回更新以降のエントリを取り出す.
+
+    プロセスプールで実行できるよう、モジュールレベルの関数としている。
+
+    Args:
+        body (bytes): レスポンスボディ
+        headers (Dict[str, str]): 小文字のヘッダ名をキーとしたレスポンスヘッダ
+        lastupdated (float): 前回の最終更新日(UNIX時間)
+
+    Returns:
+        FeedUpdate: 解析結果
+    """
+    d = parse_feed(body, headers)
+    if d.bozo == 1:
+        return FeedUpdate(str(d.bozo_exception), "", None, [])
+
+    # 前回から更新されているか確認
+    last_updated = mktime(d["updated_parsed"]) + 3600 * 9
+    if last_updated <= lastupdated:
+        return FeedUpdate(None, d["updated"], None, [])
+
+    msgs: List[str] = []
+    for entries in reversed(d["entries"]):
+        update = mktime(entries.updated_parsed) + 3600 * 9
+
+        # 前回更新以降の内容を出力
+        if update > lastupdated:
+            msgs.append(
+                f"{entries['title']} " + f"{entries['updated']} " + f"{entries['link']}"
+            )
+    return FeedUpdate(None, d["updated"], last_updated, msgs)
+
+
 class NaroBlogApiGateway(WebApiGateway):
     """小説の更新確認を行う."""
 
     def __init__(self) -> None:
         """初期化."""
+        super().__init__()
         self.logger = getLogger("narocheckerlog.naro_blog_api")
         self.sem = asyncio.Semaphore(10)
 
         # 抽象化のための情報
         self.id = "userid"
+        self.api_url = "https://api.syosetu.com/writerblog/"
+        self.site = "naro_blog"
+
+        # 条件付きGET(ETag / Last-Modified)で未更新のフィードを読み飛ばす
+        self.conditional_get = True
+        # フィード解析に使うプロセス数(0の場合はスレッドで解析する)
+        self.parse_workers = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.feed_cache = FeedCache(
+            os.path.dirname(os.path.abspath(__file__)) + "/feed_cache.json"
+        )
 
         pass
 
-    async def exec(self, urls: Optional[List[Dict[str, Any]]]) -> List[str]:
+    def configure(self, options: Dict[str, Any]) -> None:
+        """サイト別設定を反映.
+
+        Args:
+            options (Dict[str, Any]): config.yamlのoptions
+        """
+        self.conditional_get = bool(
+            options.get("conditional_get", self.conditional_get)
+        )
+        self.api_url = str(options.get("api_url", self.api_url))
+        self.parse_workers = int(options.get("parse_workers", self.parse_workers))
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """フィード解析に使うexecutorを取得.
+
+        Returns:
+            Optional[ProcessPoolExecutor]: プロセスプール(スレッドで解析する場合はNone)
+        """
+        if self.parse_workers <= 0:
+            return None
+        if self._pool is None:
+            # イベントループのスレッドを引き継がないようspawnで起動する
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def close(self) -> None:
+        """プロセスプールを終了する.
+
+        プロセスの終了待ちでイベントループを止めないよう、別スレッドで待つ。
+        """
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, partial(pool.shutdown, wait=True, cancel_futures=True)
+            )
+
+    async def exec(self, urls: Optional[List[TrackedWork]]) -> List[str]:
         """チェック処理本体.
 
         Args:
-            urls (Optional[List[Dict[str, Any]]]): ncodeと最終更新日を記載した辞書データ リスト
+            urls (Optional[List[TrackedWork]]): 登録情報リスト
 
         Returns:
             List[str]: 更新メッセージリスト
@@ -36,13 +178,31 @@ class NaroBlogApiGateway(WebApiGateway):
             self.logger.info("Check: Url is None.")
             results = [""]
         else:
-            promises = [self._check_update(url) for url in urls]
-            results = await asyncio.gather(*promises)
-            results = list(itertools.chain.from_iterable(results))
-
-            self.logger.info("Check: Success")
+            results = list(itertools.chain.from_iterable(await self.check(urls)))
         return results
 
+    async def check(
+        self, urls: List[TrackedWork], failed: Optional[Set[str]] = None
+    ) -> List[List[str]]:
+        """登録情報ごとに更新チェック.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+            failed (Optional[Set[str]], optional): 取得に失敗したIDを追加する集合.
+
+        Returns:
+            List[List[str]]: urlsと同じ順の、ユーザごとの更新メッセージリスト
+        """
+        if failed is None:
+            failed = set()
+        results = await asyncio.gather(
+            *[self._check_update(url, failed) for url in urls]
+        )
+        await self.feed_cache.save_async()
+
+        self.logger.info("Check: Success")
+        return list(results)
+
     def create_query(self, id: Any) -> str:
         """APIに与えるURLを作成
 
@@ -52,87 +212,177 @@ class NaroBlogApiGateway(WebApiGateway):
         Returns:
             str: URL
         """
-        return f"https://api.syosetu.com/writerblog/{id}.Atom"
+        return f"{self.api_url}{id}.Atom"
+
+    async def lookup(self, ids: List[str]) -> Dict[str, Tuple[float, str]]:
+        """登録前の確認としてユーザの最終更新日とブログ名をまとめて取得.
+
+        Args:
+            ids (List[str]): ユーザIDリスト
+
+        Returns:
+            Dict[str, Tuple[float, str]]: 存在したユーザIDをキーとした最終更新日(UNIX時間), ブログ名
+        """
+        results = await asyncio.gather(*[self._lookup_user(id) for id in ids])
+        return {id: result for id, result in zip(ids, results) if result is not None}
+
+    async def _lookup_user(self, userid: str) -> Optional[Tuple[float, str]]:
+        """ユーザのフィードを取得して最終更新日とブログ名を返す.
+
+        Args:
+            userid (str): ユーザID
+
+        Returns:
+            Optional[Tuple[float, str]]: 最終更新日(UNIX時間), ブログ名(取得できなければNone)
+        """
+        address = self.create_query(userid)
+
+        async def fetch() -> Tuple[bytes, Dict[str, str]]:
+            self.logger.info(f"Lookup: {userid}")
+            async with self.get_session().get(address) as r:
+                raise_for_status(r)
+                headers = {k.lower(): v for k, v in r.headers.items()}
+                return (await r.read(), headers)
 
-    async def _check_update(self, url: Dict[str, Any]) -> List[str]:
+        try:
+            (body, headers) = await self.scheduler.run(
+                address, self.sem, fetch, site=self.site
+            )
+            loop = asyncio.get_running_loop()
+            d = await loop.run_in_executor(None, parse_feed, body, headers)
+            if d.bozo == 1 or "updated_parsed" not in d:
+                self.logger.error(f"Not Found: {userid}")
+                return None
+
+            last_updated = mktime(d["updated_parsed"]) + 3600 * 9
+            return (last_updated, d.feed.get("title", ""))
+        except CircuitOpenError:
+            self.logger.error(f"Circuit open: {userid}")
+        except NotFoundError:
+            self.logger.error(f"Not Found: {userid}")
+        except Exception:
+            self.logger.exception(f"Lookup failed: {userid}")
+        return None
+
+    async def _check_update(self, url: TrackedWork, failed: Set[str]) -> List[str]:
         """更新チェック走査.
 
         Args:
-            url (Dict[str, Any]): ncodeと最終更新日を記載した辞書データ
+            url (TrackedWork): 登録情報
+            failed (Set[str]): 取得に失敗したIDを追加する集合
 
         Returns:
             str: 更新メッセージ
         """
 
-        msgs = await self.request(url)
+        msgs = await self.request(url, failed)
 
-        # 更新があれば
-        if len(msgs) > 0:
-            self.logger.info(f"Check Success: {url[self.id]}")
+        if url.id in failed:
+            self.logger.error(f"Check Failed: {url.id}")
         else:
-            self.logger.error(f"Check Failed: {url[self.id]}")
+            self.logger.info(f"Check Success: {url.id}")
 
         return msgs
 
-    async def request(self, url: Dict[str, Any]) -> List[str]:
+    async def request(
+        self, url: TrackedWork, failed: Optional[Set[str]] = None
+    ) -> List[str]:
         """URLチェック.
 
         Args:
-            url (Dict[str, Any]): ncodeと最終更新日を記載した辞書データ
+            url (TrackedWork): 登録情報
+            failed (Optional[Set[str]], optional): 取得に失敗した場合にIDを追加する集合.
 
         Returns:
             Tuple[datetime, str]: 最終更新日, タイトル(タイトルが空文字の場合は未更新とみなす)
         """
         msgs: List[str] = []
+        if failed is None:
+            failed = set()
 
         try:
-            userid = url[self.id]
-            self.logger.info(f"Check: {userid}")
+            userid = url.id
             address = self.create_query(userid)
 
-            d = feedparser.parse(address)
+            cache = None
+            request_headers: Dict[str, str] = {}
+            if self.conditional_get:
+                cache = self.feed_cache.get(userid, url.lastupdated)
+            if cache is not None:
+                if "etag" in cache:
+                    request_headers["If-None-Match"] = cache["etag"]
+                if "modified" in cache:
+                    request_headers["If-Modified-Since"] = cache["modified"]
 
-            if d.bozo == 1:
-                self.logger.error("Error: RSSの取得に失敗しました。")
-                self.logger.error(d.bozo_exception)
+            async def fetch() -> Tuple[int, bytes, Dict[str, str]]:
+                self.logger.info(f"Check: {userid}")
+                async with self.get_session().get(
+                    address, headers=request_headers
+                ) as r:
+                    if r.status == 304:
+                        return (r.status, b"", {})
+                    raise_for_status(r)
+                    headers = {k.lower(): v for k, v in r.headers.items()}
+                    return (r.status, await r.read(), headers)
 
-                ret = str(d.bozo_exception)
-                # await self.sendmessage(address + " の取得に失敗しました。" + ret)
+            (status, body, headers) = await self.scheduler.run(
+                address, self.sem, fetch, site=self.site
+            )
+            if status == 304:
+                self.logger.info(f"最終更新: {userid} 更新はありません(304)")
                 return msgs
 
-            # 前回から更新されているか確認
-            last_call = datetime.fromisoformat(url["lastupdated"])
-            last_updated = datetime.fromtimestamp(
-                mktime(d["updated_parsed"]) + 3600 * 9
+            digest = hashlib.sha256(body).hexdigest()
+            if cache is not None and cache["digest"] == digest:
+                self.logger.info(f"最終更新: {userid} 更新はありません(内容一致)")
+                return msgs
+
+            # 解析はCPU負荷が高いため、イベントループを止めないよう別スレッド
+            # (parse_workersを指定した場合は別プロセス)で実施
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_executor(),
+                extract_updates,
+                body,
+                headers,
+                url.lastupdated,
             )
 
-            if last_updated > last_call:
-                self.logger.info(f"最終更新: {d['updated']} 更新があります")
-                # 最終更新日時の更新
-                url["lastupdated"] = last_updated.isoformat()
-                for entries in reversed(d["entries"]):
-                    update = datetime.fromtimestamp(
-                        mktime(entries.updated_parsed) + 3600 * 9
-                    )
-
-                    # 前回更新以降の内容を出力
-                    if update > last_call:
-                        message = (
-                            f"{entries['title']} "
-                            + f"{entries['updated']} "
-                            + f"{entries['link']}"
-                        )
-                        # await self.sendmessage(message)
-                        # self.logger.info(message)
-                        msgs.append(message)
+            if result.error is not None:
+                self.logger.error("Error: RSSの取得に失敗しました。")
+                self.logger.error(result.error)
+                failed.add(url.id)
+                return msgs
 
+            if result.lastupdated is not None:
+                self.logger.info(f"最終更新: {result.updated} 更新があります")
+                # 最終更新日時の更新
+                url.lastupdated = result.lastupdated
+                msgs.extend(result.messages)
             else:
-                self.logger.info(f"最終更新: {d['updated']} 更新はありません")
+                self.logger.info(f"最終更新: {result.updated} 更新はありません")
+
+            self.feed_cache.set(
+                userid,
+                url.lastupdated,
+                headers.get("etag"),
+                headers.get("last-modified"),
+                digest,
+            )
             self.logger.info("checker success.")
+        except CircuitOpenError:
+            self.logger.error(f"Circuit open: {url.id}")
+            failed.add(url.id)
+        except NotFoundError:
+            # 退会等でフィードがなくなったユーザ(他のユーザのチェックは止めない)
+            self.logger.error(f"Not Found: {url.id}")
+            failed.add(url.id)
         except AttributeError as e:
             message = "要素参照エラーが発生しました。エラーログを確認してください。"
             self.logger.exception(e)
+            failed.add(url.id)
         except Exception as e:
             message = "処理中に問題が発生しました。エラーログを確認してください。"
             self.logger.exception(e)
+            failed.add(url.id)
         return msgs
@@ -1,4 +1,4 @@
-from typing import Any, Dict
+from typing import Any
 
 from narocheckerbot.novel_configration import NovelConfigration
 
@@ -10,33 +10,25 @@ class NaroConfigration(NovelConfigration):
         NovelConfigration (_type_): 基底クラス
     """
 
+    # 登録情報のIDを表すキー
+    id_key = "ncode"
+
     def __init__(self, urls: Any) -> None:
         # TODO: データが正しいかどうかの確認
         super().__init__(urls)
 
-    def add(self, url: Dict[str, Any]):
-        """_summary_
-
-        Args:
-            url (Dict[str, Any]): 追加したいデータ
-        """
-        self.urls.append(url)
+    def key(self, id: str) -> str:
+        """索引のキー.
 
-    def delete(self, id: str) -> bool:
-        """指定したncodeに対応する小説を削除する。
+        ncodeは大文字小文字を区別しないため、小文字に揃える。
 
         Args:
             id (str): ncode
 
         Returns:
-            bool: 削除を実行した場合はTrue, 見つからなければFalse
+            str: 小文字のncode
         """
-        for index, url in enumerate(self.urls):
-            if url["ncode"] == id:
-                self.urls.pop(index)
-                return True
-
-        return False
+        return str(id).lower()
 
     def is_exist_account(self, ncode: str) -> bool:
         """リスト登録済みかの確認.
@@ -47,10 +39,6 @@ class NaroConfigration(NovelConfigration):
         Returns:
             bool: 登録済みならTrue, そうでなければFalse
         """
-        for url in self.urls:
-            if url["ncode"] == ncode:
-                return True
-
-        return False
+        return self.is_exist(ncode)
 
     pass
@@ -0,0 +1,152 @@
+from typing import List, Tuple
+
+# Discordの上限値
+MESSAGE_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_TOTAL_LIMIT = 6000
+EMBEDS_PER_MESSAGE = 10
+
+
+def _truncate(line: str, limit: int) -> str:
+    """上限を超える行を切り詰める.
+
+    Args:
+        line (str): 1行分のメッセージ
+        limit (int): 上限文字数
+
+    Returns:
+        str: 切り詰めた行
+    """
+    if len(line) <= limit:
+        return line
+    return line[: limit - 1] + "…"
+
+
+def pack_text(messages: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """複数の更新メッセージを上限文字数以内の改行区切りメッセージにまとめる.
+
+    Args:
+        messages (List[str]): 更新メッセージリスト
+        limit (int, optional): 1メッセージの上限文字数. Defaults to MESSAGE_LIMIT.
+
+    Returns:
+        List[str]: 送信するメッセージリスト
+    """
+    return [text for text, _ in pack_text_counted(messages, limit)]
+
+
+def pack_text_counted(
+    messages: List[str], limit: int = MESSAGE_LIMIT
+) -> List[Tuple[str, int]]:
+    """pack_textと同じようにまとめ、それぞれに含まれる更新メッセージの件数を返す.
+
+    Args:
+        messages (List[str]): 更新メッセージリスト
+        limit (int, optional): 1メッセージの上限文字数. Defaults to MESSAGE_LIMIT.
+
+    Returns:
+        List[Tuple[str, int]]: 送信するメッセージ, 含まれる更新メッセージの件数
+    """
+    packed: List[Tuple[str, int]] = []
+    current = ""
+    count = 0
+    for message in messages:
+        line = _truncate(message, limit)
+        if current and len(current) + 1 + len(line) > limit:
+            packed.append((current, count))
+            current = ""
+            count = 0
+        current = f"{current}\n{line}" if current else line
+        count += 1
+
+    if current:
+        packed.append((current, count))
+    return packed
+
+
+def pack_embeds(
+    messages: List[str],
+    description_limit: int = EMBED_DESCRIPTION_LIMIT,
+    total_limit: int = EMBED_TOTAL_LIMIT,
+    embeds_per_message: int = EMBEDS_PER_MESSAGE,
+) -> List[List[str]]:
+    """複数の更新メッセージをembedの本文にまとめる.
+
+    1メッセージあたりembedは最大10件、本文の合計は6000文字以内に収める。
+
+    Args:
+        messages (List[str]): 更新メッセージリスト
+        description_limit (int, optional): embed1件の本文上限.
+        total_limit (int, optional): 1メッセージ内のembed本文の合計上限.
+        embeds_per_message (int, optional): 1メッセージのembed数上限.
+
+    Returns:
+        List[List[str]]: 送信メッセージごとのembed本文リスト
+    """
+    return [
+        embeds
+        for embeds, _ in pack_embeds_counted(
+            messages, description_limit, total_limit, embeds_per_message
+        )
+    ]
+
+
+def pack_embeds_counted(
+    messages: List[str],
+    description_limit: int = EMBED_DESCRIPTION_LIMIT,
+    total_limit: int = EMBED_TOTAL_LIMIT,
+    embeds_per_message: int = EMBEDS_PER_MESSAGE,
+) -> List[Tuple[List[str], int]]:
+    """pack_embedsと同じようにまとめ、それぞれに含まれる更新メッセージの件数を返す.
+
+    Args:
+        messages (List[str]): 更新メッセージリスト
+        description_limit (int, optional): embed1件の本文上限.
+        total_limit (int, optional): 1メッセージ内のembed本文の合計上限.
+        embeds_per_message (int, optional): 1メッセージのembed数上限.
+
+    Returns:
+        List[Tuple[List[str], int]]: 送信メッセージごとのembed本文リスト, 含まれる更新メッセージの件数
+    """
+    packed: List[Tuple[List[str], int]] = []
+    embeds: List[str] = []
+    current = ""
+    # embedsに確定済みの本文の合計文字数
+    used = 0
+    # 送信メッセージ(embedsとcurrent)に含まれる更新メッセージの件数
+    count = 0
+    for message in messages:
+        line = _truncate(message, description_limit)
+        sep = 1 if current else 0
+
+        # embed1件に収まらなければ次のembedへ
+        if current and len(current) + sep + len(line) > description_limit:
+            embeds.append(current)
+            used = used + len(current)
+            current = ""
+            sep = 0
+            if len(embeds) >= embeds_per_message:
+                packed.append((embeds, count))
+                embeds = []
+                used = 0
+                count = 0
+
+        # メッセージ全体の上限を超えるなら次のメッセージへ
+        if used + len(current) + sep + len(line) > total_limit:
+            if current:
+                embeds.append(current)
+            packed.append((embeds, count))
+            embeds = []
+            used = 0
+            current = ""
+            sep = 0
+            count = 0
+
+        current = current + "\n" * sep + line
+        count += 1
+
+    if current:
+        embeds.append(current)
+    if embeds:
+        packed.append((embeds, count))
+    return packed
@@ -1,30 +1,271 @@
-from abc import ABCMeta, abstractmethod
-from typing import Any, Dict
+from abc import ABCMeta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from narocheckerbot.tracked_work import TrackedWork
 
 
 class NovelConfigration(metaclass=ABCMeta):
     """各設定の基本クラス.
 
+    登録情報は保存用に順序付きのリスト(urls)で保持し、
+    検索用にIDをキーとした索引を併せて管理する。
+    登録情報はTrackedWorkで保持し、config.yamlの形式とは読み込み時と保存時に変換する。
+    保存先が変更分のみ書き込めるよう、前回保存時から変更された登録情報のIDを記録する。
+
     Args:
         metaclass (_type_, optional): _description_. Defaults to ABCMeta.
     """
 
+    # 登録情報のIDを表すキー
+    id_key = ""
+    # 保存時に最終更新日をdatetimeで書き出すか(Falseの場合はISO形式の文字列)
+    lastupdated_as_datetime = True
+
     def __init__(self, urls: Any) -> None:
         """初期化.
 
         Args:
             urls (Any): サイト別設定
         """
-        self.urls = urls["account"]
+        self.urls = self.load(urls["account"] or [])
         self.channel_id = urls["channel"]
+        # gatewayに渡すサイト別設定(省略可)
+        self.options: Dict[str, Any] = dict(urls.get("options", {}))
         pass
 
-    @abstractmethod
-    def add(self, url: Dict[str, Any]):
-        pass
+    @property
+    def urls(self) -> List[TrackedWork]:
+        """登録情報リスト."""
+        return self._urls
+
+    @urls.setter
+    def urls(self, urls: List[TrackedWork]) -> None:
+        self._urls = urls
+        self.reindex()
+        # 読み込んだ登録情報を基準に変更を記録する
+        # (ID → 変更された項目: added, removed, lastupdated, channels)
+        self._changes: Dict[str, Set[str]] = {}
+
+    def _mark(self, id: str, field: str) -> None:
+        """登録情報の変更を記録.
+
+        Args:
+            id (str): ID
+            field (str): 変更された項目
+        """
+        self._changes.setdefault(id, set()).add(field)
+
+    def mark_updated(self, urls: Iterable[TrackedWork]) -> None:
+        """最終更新日を変更した登録情報を記録.
+
+        Args:
+            urls (Iterable[TrackedWork]): 最終更新日を変更した登録情報
+        """
+        for url in urls:
+            self._mark(url.id, "lastupdated")
+
+    def take_changes(self) -> Dict[str, Set[str]]:
+        """前回保存時からの変更を取り出す(記録はクリアする).
+
+        Returns:
+            Dict[str, Set[str]]: IDをキーとした変更された項目
+        """
+        changes, self._changes = self._changes, {}
+        return changes
+
+    def restore_changes(self, changes: Dict[str, Set[str]]) -> None:
+        """保存に失敗した変更を記録に戻す.
+
+        取り出した後に追加・削除された登録情報は、後の変更を優先する。
+
+        Args:
+            changes (Dict[str, Set[str]]): take_changesで取り出した変更
+        """
+        for id, fields in changes.items():
+            newer = self._changes.get(id)
+            if newer is None:
+                self._changes[id] = fields
+            elif not newer & {"added", "removed"}:
+                newer |= fields
+
+    def load(self, accounts: Iterable[Any]) -> List[TrackedWork]:
+        """保存形式の登録情報を変換.
+
+        Args:
+            accounts (Iterable[Any]): config.yaml形式の登録情報
+
+        Returns:
+            List[TrackedWork]: 登録情報リスト
+        """
+        return [TrackedWork.from_account(account, self.id_key) for account in accounts]
+
+    def dump(self) -> List[Dict[str, Any]]:
+        """登録情報を保存形式に変換.
+
+        Returns:
+            List[Dict[str, Any]]: config.yaml形式の登録情報
+        """
+        return [
+            url.to_account(self.id_key, self.lastupdated_as_datetime)
+            for url in self._urls
+        ]
+
+    def key(self, id: str) -> str:
+        """索引のキー.
+
+        Args:
+            id (str): ID
+
+        Returns:
+            str: 索引のキー(大文字小文字を区別しないサイトでは正規化したID)
+        """
+        return str(id)
+
+    def reindex(self) -> None:
+        """索引を作り直す."""
+        self._index: Dict[str, TrackedWork] = {
+            self.key(url.id): url for url in self._urls
+        }
+
+    def get(self, id: str) -> Optional[TrackedWork]:
+        """IDに対応する登録情報を取得.
+
+        Args:
+            id (str): ID
+
+        Returns:
+            Optional[TrackedWork]: 登録情報(見つからなければNone)
+        """
+        return self._index.get(self.key(id))
+
+    def is_exist(self, id: str) -> bool:
+        """リスト登録済みかの確認.
+
+        Args:
+            id (str): ID
+
+        Returns:
+            bool: 登録済みならTrue, そうでなければFalse
+        """
+        return self.key(id) in self._index
+
+    def add(self, url: TrackedWork):
+        """登録情報を追加.
+
+        Args:
+            url (TrackedWork): 追加したいデータ
+        """
+        self._urls.append(url)
+        self._index[self.key(url.id)] = url
+        self._changes[url.id] = {"added"}
+
+    def add_many(self, urls: Iterable[TrackedWork]) -> List[TrackedWork]:
+        """登録情報をまとめて追加(登録済みのIDは追加しない).
+
+        Args:
+            urls (Iterable[TrackedWork]): 追加したいデータ
+
+        Returns:
+            List[TrackedWork]: 追加したデータ
+        """
+        added: List[TrackedWork] = []
+        for url in urls:
+            if not self.is_exist(url.id):
+                self.add(url)
+                added.append(url)
+        return added
+
+    def channels_of(self, url: TrackedWork) -> List[int]:
+        """登録情報の通知先チャンネル.
+
+        Args:
+            url (TrackedWork): 登録情報
+
+        Returns:
+            List[int]: チャンネルIDリスト(channelsが無ければサイトのchannel)
+        """
+        return list(url.channels or [self.channel_id])
+
+    def subscribe(self, url: TrackedWork, channel_id: int) -> bool:
+        """登録情報の通知先にチャンネルを追加.
+
+        Args:
+            url (TrackedWork): 登録情報
+            channel_id (int): チャンネルID
+
+        Returns:
+            bool: 追加した場合はTrue, 通知先に含まれていればFalse
+        """
+        channels = self.channels_of(url)
+        if channel_id in channels:
+            return False
+        url.channels = channels + [channel_id]
+        self._mark(url.id, "channels")
+        return True
+
+    def unsubscribe(self, id: str, channel_id: int) -> bool:
+        """登録情報の通知先からチャンネルを外す.
+
+        通知先が無くなった場合は登録情報ごと削除する。
+
+        Args:
+            id (str): ID
+            channel_id (int): チャンネルID
+
+        Returns:
+            bool: 外した場合はTrue, 通知先に含まれていなければFalse
+        """
+        url = self.get(id)
+        if url is None:
+            return False
+        channels = self.channels_of(url)
+        if channel_id not in channels:
+            return False
+        channels.remove(channel_id)
+        if channels:
+            url.channels = channels
+            self._mark(url.id, "channels")
+        else:
+            self.delete(id)
+        return True
 
-    @abstractmethod
     def delete(self, id: str) -> bool:
-        pass
+        """指定したIDに対応する登録情報を削除する。
+
+        Args:
+            id (str): ID
+
+        Returns:
+            bool: 削除を実行した場合はTrue, 見つからなければFalse
+        """
+        return len(self.delete_many([id])) > 0
+
+    def delete_many(self, ids: Iterable[str]) -> List[str]:
+        """指定したIDに対応する登録情報をまとめて削除する。
+
+        リストの走査は件数に関わらず1回で済ませる。
+
+        Args:
+            ids (Iterable[str]): IDリスト
+
+        Returns:
+            List[str]: 削除した登録情報のIDリスト(登録時の表記)
+        """
+        keys = {self.key(id) for id in ids} & self._index.keys()
+        if not keys:
+            return []
+
+        removed: List[str] = []
+        kept: List[TrackedWork] = []
+        for url in self._urls:
+            if self.key(url.id) in keys:
+                removed.append(url.id)
+                self._changes[url.id] = {"removed"}
+            else:
+                kept.append(url)
+        for key in keys:
+            del self._index[key]
+        self._urls[:] = kept
+        return removed
 
     pass
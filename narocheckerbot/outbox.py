@@ -0,0 +1,212 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logging import getLogger
+from typing import Any, Callable, List, NamedTuple, TypeVar
+
+T = TypeVar("T")
+
+
+class OutboxItem(NamedTuple):
+    """未送信の通知."""
+
+    id: int
+    site: str
+    channel_id: int
+    message: str
+    attempts: int
+
+
+class Outbox:
+    """送信前の通知をSQLiteに保持する送信キュー.
+
+    通知は送信に成功してからackで削除する。送信に失敗したものは
+    待機時間を延ばしながら再送し、上限回数を超えたら破棄する。
+    イベントループ上からは、書き込み(fsync)で止まらないよう *_async を使う。
+    """
+
+    def __init__(self, path: str, max_attempts: int = 10) -> None:
+        """初期化.
+
+        Args:
+            path (str): データベースファイルのパス
+            max_attempts (int, optional): 破棄するまでの送信試行回数. Defaults to 10.
+        """
+        self._logger = getLogger("narocheckerlog.outbox")
+        self.max_attempts = max_attempts
+
+        # データベースへのアクセスはイベントループ外の専用スレッドで順番に行う
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                site TEXT NOT NULL,
+                channel_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0,
+                UNIQUE (channel_id, message)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def enqueue(self, site: str, channel_id: int, messages: List[str]) -> int:
+        """通知を追加.
+
+        送信待ちの同一通知は重複して登録しない。
+
+        Args:
+            site (str): サポートサイト
+            channel_id (int): 送付先チャンネルID
+            messages (List[str]): 更新メッセージリスト
+
+        Returns:
+            int: 追加した件数
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO outbox (site, channel_id, message, created_at)"
+                + " VALUES (?, ?, ?, ?)",
+                [(site, channel_id, message, now) for message in messages],
+            )
+        return cursor.rowcount
+
+    def pending(self, limit: int = 500) -> List[OutboxItem]:
+        """送信可能な通知を登録順に取得.
+
+        Args:
+            limit (int, optional): 取得件数の上限. Defaults to 500.
+
+        Returns:
+            List[OutboxItem]: 未送信の通知
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, site, channel_id, message, attempts FROM outbox"
+                + " WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+        return [OutboxItem(*row) for row in rows]
+
+    def count(self) -> int:
+        """未送信の通知の件数(再送待ちを含む).
+
+        Returns:
+            int: 件数
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def ack(self, items: List[OutboxItem]) -> None:
+        """送信済みの通知を削除.
+
+        Args:
+            items (List[OutboxItem]): 送信済みの通知
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(item.id,) for item in items]
+            )
+
+    def retry_later(self, items: List[OutboxItem]) -> None:
+        """送信に失敗した通知を再送待ちにする.
+
+        Args:
+            items (List[OutboxItem]): 送信に失敗した通知
+        """
+        now = time.time()
+        dropped = [item for item in items if item.attempts + 1 >= self.max_attempts]
+        for item in dropped:
+            self._logger.error(f"Drop notification: {item.channel_id} {item.message}")
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt = ?"
+                + " WHERE id = ?",
+                [
+                    (now + min(3600, 30 * 2**item.attempts), item.id)
+                    for item in items
+                    if item not in dropped
+                ],
+            )
+            self._conn.executemany(
+                "DELETE FROM outbox WHERE id = ?", [(item.id,) for item in dropped]
+            )
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        """専用スレッドで実行する.
+
+        Args:
+            func (Callable[..., T]): 実行する処理
+            *args (Any): 処理の引数
+
+        Returns:
+            T: 処理の戻り値
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    async def enqueue_async(
+        self, site: str, channel_id: int, messages: List[str]
+    ) -> int:
+        """通知を追加(イベントループを止めない).
+
+        Args:
+            site (str): サポートサイト
+            channel_id (int): 送付先チャンネルID
+            messages (List[str]): 更新メッセージリスト
+
+        Returns:
+            int: 追加した件数
+        """
+        return await self._run(self.enqueue, site, channel_id, messages)
+
+    async def pending_async(self, limit: int = 500) -> List[OutboxItem]:
+        """送信可能な通知を登録順に取得(イベントループを止めない).
+
+        Args:
+            limit (int, optional): 取得件数の上限. Defaults to 500.
+
+        Returns:
+            List[OutboxItem]: 未送信の通知
+        """
+        return await self._run(self.pending, limit)
+
+    async def count_async(self) -> int:
+        """未送信の通知の件数(イベントループを止めない).
+
+        Returns:
+            int: 件数
+        """
+        return await self._run(self.count)
+
+    async def ack_async(self, items: List[OutboxItem]) -> None:
+        """送信済みの通知を削除(イベントループを止めない).
+
+        Args:
+            items (List[OutboxItem]): 送信済みの通知
+        """
+        await self._run(self.ack, items)
+
+    async def retry_later_async(self, items: List[OutboxItem]) -> None:
+        """送信に失敗した通知を再送待ちにする(イベントループを止めない).
+
+        Args:
+            items (List[OutboxItem]): 送信に失敗した通知
+        """
+        await self._run(self.retry_later, items)
+
+    def close(self) -> None:
+        """データベースを閉じる(実行中の書き込みは完了を待つ)."""
+        self._executor.shutdown()
+        self._conn.close()
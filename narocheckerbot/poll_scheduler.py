@@ -0,0 +1,111 @@
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from narocheckerbot.tracked_work import TrackedWork
+
+
+def slot_of(id: str, slots: int) -> int:
+    """IDを割り当てるスロットを決める.
+
+    プロセスを再起動しても同じスロットになるよう、hash()ではなくCRC32を使う。
+
+    Args:
+        id (str): ID
+        slots (int): スロット数
+
+    Returns:
+        int: スロット番号(0始まり)
+    """
+    return zlib.crc32(id.encode("utf-8")) % slots
+
+
+class PollScheduler:
+    """登録作品ごとのチェック間隔を管理する.
+
+    adaptiveモードでは、最後に更新されてからの経過時間に係数を掛けたものを
+    チェック間隔とする。頻繁に更新される作品ほど短い間隔でチェックし、
+    長期間更新のない作品は上限(ceiling)まで間隔を延ばす。
+    fixedモード(既定)では毎回すべての作品をチェックする。
+    """
+
+    def __init__(self) -> None:
+        """初期化."""
+        self.mode = "fixed"
+        # チェック間隔の下限・上限(秒)
+        self.floor = 3600.0
+        self.ceiling = 7 * 86400.0
+        # 最終更新からの経過時間に掛ける係数
+        self.factor = 0.05
+
+        # 作品ごとの前回チェック時刻(UNIX時間, 取得に成功したもののみ)
+        self._last_checked: Dict[str, float] = {}
+
+    def configure(self, options: Dict[str, Any]) -> None:
+        """サイト別設定を反映.
+
+        Args:
+            options (Dict[str, Any]): config.yamlのoptions
+        """
+        self.mode = str(options.get("poll", self.mode))
+        self.floor = float(options.get("poll_floor", self.floor))
+        self.ceiling = float(options.get("poll_ceiling", self.ceiling))
+        self.factor = float(options.get("poll_factor", self.factor))
+
+    def interval(self, lastupdated: float, now: float) -> float:
+        """作品のチェック間隔を算出.
+
+        Args:
+            lastupdated (float): 最終更新日(UNIX時間)
+            now (float): 現在時刻(UNIX時間)
+
+        Returns:
+            float: チェック間隔(秒)
+        """
+        age = max(0.0, now - lastupdated)
+        return min(self.ceiling, max(self.floor, age * self.factor))
+
+    def select(
+        self,
+        urls: List[TrackedWork],
+        now: float,
+        slot: Optional[Tuple[int, int]] = None,
+    ) -> List[TrackedWork]:
+        """今回チェックする作品を選ぶ.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+            now (float): 現在時刻(UNIX時間)
+            slot (Optional[Tuple[int, int]], optional): 今回のスロット番号とスロット数.
+                指定した場合はそのスロットに割り当てられた作品のみ対象とする.
+
+        Returns:
+            List[TrackedWork]: チェック対象の登録情報リスト
+        """
+        if slot is not None and slot[1] > 1:
+            urls = [url for url in urls if slot_of(url.id, slot[1]) == slot[0]]
+
+        if self.mode != "adaptive":
+            return urls
+
+        selected: List[TrackedWork] = []
+        for url in urls:
+            last_checked = self._last_checked.get(url.id)
+            interval = self.interval(url.lastupdated, now)
+            # ループの揺らぎで1周期取りこぼさないよう5%の余裕を持たせる
+            if last_checked is None or now - last_checked >= interval * 0.95:
+                selected.append(url)
+        return selected
+
+    def checked(self, ids: Iterable[str], now: float) -> None:
+        """取得に成功した作品のチェック時刻を記録する.
+
+        取得に失敗した作品は記録しないため、次回も選ばれる。
+
+        Args:
+            ids (Iterable[str]): 取得に成功した作品のID
+            now (float): チェック対象を選んだ時刻(UNIX時間)
+        """
+        if self.mode != "adaptive":
+            return
+        for id in ids:
+            self._last_checked[id] = now
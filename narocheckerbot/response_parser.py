@@ -0,0 +1,73 @@
+import gzip
+import json
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Callable, List, Union
+
+from ruamel.yaml import YAML
+
+try:
+    import orjson
+
+    _json_loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    # orjsonが無ければ標準ライブラリを使う
+    _json_loads = json.loads
+
+# gzipデータの先頭バイト
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def decompress(body: bytes) -> bytes:
+    """gzip圧縮されていれば展開する.
+
+    Args:
+        body (bytes): レスポンスボディ
+
+    Returns:
+        bytes: 展開後のデータ
+    """
+    if body[:2] == GZIP_MAGIC:
+        return gzip.decompress(body)
+    return body
+
+
+def parse_json(body: bytes) -> List[Any]:
+    """JSON形式(out=json)のレスポンスを解析.
+
+    Args:
+        body (bytes): レスポンスボディ(gzip圧縮可)
+
+    Returns:
+        List[Any]: 解析結果
+    """
+    return _json_loads(decompress(body))
+
+
+def parse_yaml(body: bytes) -> List[Any]:
+    """YAML形式のレスポンスを解析.
+
+    Args:
+        body (bytes): レスポンスボディ(gzip圧縮可)
+
+    Returns:
+        List[Any]: 解析結果
+    """
+    yaml = YAML()
+    return yaml.load(BytesIO(decompress(body)))
+
+
+def parse_lastup(value: Union[datetime, str]) -> datetime:
+    """最終更新日をdatetimeに揃える.
+
+    JSONでは文字列、YAMLではdatetimeとして返ってくる。
+
+    Args:
+        value (Union[datetime, str]): general_lastup
+
+    Returns:
+        datetime: 最終更新日
+    """
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,261 @@
+import asyncio
+import random
+import time
+from logging import getLogger
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type, TypeVar
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from narocheckerbot.metrics import metrics
+
+T = TypeVar("T")
+
+# 再試行の対象とする例外
+RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    OSError,
+    TypeError,
+    ValueError,
+    IndexError,
+)
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているため、リクエストを送らなかった."""
+
+    pass
+
+
+class NotFoundError(Exception):
+    """リクエスト先が存在しない(429以外の4xx).
+
+    再試行しても結果は変わらないため再試行せず、ブレーカーの失敗にも数えない。
+    """
+
+    pass
+
+
+def raise_for_status(r: Any) -> None:
+    """レスポンスのステータスを確認.
+
+    Args:
+        r (Any): レスポンス(aiohttp.ClientResponse または記録したレスポンス)
+
+    Raises:
+        NotFoundError: ステータスが429以外の4xx
+        aiohttp.ClientResponseError: ステータスが429または5xx
+    """
+    if 400 <= r.status < 500 and r.status != 429:
+        raise NotFoundError(f"{r.status} {r.url}")
+    r.raise_for_status()
+
+
+class CircuitBreaker:
+    """接続先ホスト単位のサーキットブレーカー.
+
+    連続失敗が閾値を超えると open になり、一定時間リクエストを止める。
+    時間経過後は half_open として1件だけ試行し、成功すれば closed に戻す。
+    """
+
+    def __init__(self, host: str, threshold: int, reset_timeout: float) -> None:
+        """初期化.
+
+        Args:
+            host (str): 接続先ホスト
+            threshold (int): open にする連続失敗回数
+            reset_timeout (float): open から half_open に移るまでの時間(秒)
+        """
+        self.logger = getLogger("narocheckerlog.retry")
+        self.host = host
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """リクエストを送ってよいか.
+
+        Returns:
+            bool: 送ってよければTrue
+        """
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self.logger.warning(f"Circuit half_open: {self.host}")
+
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+
+        return True
+
+    def record_success(self) -> None:
+        """成功を記録."""
+        if self.state != "closed":
+            self.logger.warning(f"Circuit closed: {self.host}")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def release(self) -> None:
+        """成否を判定できなかった試行を終える(half_open のまま次の試行を許可する)."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """失敗を記録."""
+        self.failures = self.failures + 1
+        self._probing = False
+        if self.state == "half_open" or (
+            self.state == "closed" and self.failures >= self.threshold
+        ):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self.logger.error(
+                f"Circuit open: {self.host} failures={self.failures} "
+                + f"retry after {self.reset_timeout}s"
+            )
+
+
+class RetryScheduler:
+    """指数バックオフ(ジッタ付き)で再試行を行う.
+
+    待機中は同時実行数の枠(セマフォ)を解放するため、失敗が続く
+    リクエストが他のリクエストを止めることはない。
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 120.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 300.0,
+    ) -> None:
+        """初期化.
+
+        Args:
+            max_retries (int, optional): 最大再試行回数. Defaults to 5.
+            base_delay (float, optional): 初回待機時間の上限(秒). Defaults to 2.0.
+            max_delay (float, optional): 待機時間の上限(秒). Defaults to 120.0.
+            failure_threshold (int, optional): ブレーカーを開く連続失敗回数. Defaults to 5.
+            reset_timeout (float, optional): ブレーカーを開いておく時間(秒). Defaults to 300.0.
+        """
+        self.logger = getLogger("narocheckerlog.retry")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # 起動からの累計再試行回数
+        self.retries = 0
+
+    def get_breaker(self, host: str) -> CircuitBreaker:
+        """ホスト別のサーキットブレーカーを取得.
+
+        Args:
+            host (str): 接続先ホスト
+
+        Returns:
+            CircuitBreaker: サーキットブレーカー
+        """
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(
+                host, self.failure_threshold, self.reset_timeout
+            )
+        return self.breakers[host]
+
+    def backoff(self, attempt: int) -> float:
+        """待機時間を算出(full jitter).
+
+        Args:
+            attempt (int): 再試行回数(1始まり)
+
+        Returns:
+            float: 待機時間(秒)
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def run(
+        self,
+        address: str,
+        sem: asyncio.Semaphore,
+        func: Callable[[], Awaitable[T]],
+        retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS,
+        site: str = "",
+    ) -> T:
+        """同時実行数の枠を確保してfuncを実行し、失敗時は再試行する.
+
+        Args:
+            address (str): リクエスト先URL(ブレーカーの判定に使用)
+            sem (asyncio.Semaphore): 同時実行数を制御するセマフォ
+            func (Callable[[], Awaitable[T]]): リクエスト処理
+            retry_on (Tuple[Type[BaseException], ...], optional): 再試行する例外.
+            site (str, optional): サポートサイト(メトリクスのラベルに使用).
+
+        Raises:
+            CircuitOpenError: ブレーカーが開いている
+            NotFoundError: リクエスト先が存在しない(再試行しない)
+            Exception: 再試行回数を超えた場合は最後の例外
+
+        Returns:
+            T: funcの戻り値
+        """
+        host = urlsplit(address).netloc
+        breaker = self.get_breaker(host)
+        # 全サイトが同じホストのため、サイト別に集計できるようサイトもラベルに含める
+        labels = {"host": host, "site": site}
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                metrics.inc("circuit_open_total", host=host)
+                raise CircuitOpenError(host)
+
+            async with sem:
+                try:
+                    with metrics.timer("request_seconds", **labels):
+                        result = await func()
+                except NotFoundError:
+                    # 接続先は応答しているため、ブレーカーは成功として扱う
+                    breaker.record_success()
+                    raise
+                except retry_on as e:
+                    breaker.record_failure()
+                    metrics.inc("request_errors_total", **labels)
+                    error = e
+                except Exception:
+                    # 再試行しない例外も失敗に数える(half_open の試行中のまま残さない)
+                    breaker.record_failure()
+                    metrics.inc("request_errors_total", **labels)
+                    raise
+                except BaseException:
+                    # キャンセル等は接続先の失敗ではないため、試行中の状態のみ解除する
+                    breaker.release()
+                    raise
+                else:
+                    breaker.record_success()
+                    return result
+
+            attempt = attempt + 1
+            if attempt > self.max_retries:
+                self.logger.error(f"Retry exhausted: {address} {error!r}")
+                raise error
+
+            # 待機中はセマフォを解放しておく
+            delay = self.backoff(attempt)
+            self.retries = self.retries + 1
+            metrics.inc("request_retries_total", **labels)
+            self.logger.warning(
+                f"Retry {attempt}/{self.max_retries}: {address} "
+                + f"wait={delay:.1f}s circuit={breaker.state} {error!r}"
+            )
+            await asyncio.sleep(delay)
@@ -0,0 +1,274 @@
+import json
+import sqlite3
+from abc import ABCMeta, abstractmethod
+from datetime import datetime
+from io import StringIO
+from logging import getLogger
+from typing import Any, Dict, List, Mapping, Set, Tuple
+
+from ruamel.yaml import YAML
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+
+from narocheckerbot.atomic_file import atomic_write
+from narocheckerbot.novel_configration import NovelConfigration
+from narocheckerbot.tracked_work import TrackedWork
+
+
+class StateStore(metaclass=ABCMeta):
+    """登録情報(account)の保存先の基底クラス.
+
+    Args:
+        metaclass (_type_, optional): _description_. Defaults to ABCMeta.
+    """
+
+    # 複数のプロセスから同時に利用できるか
+    shared = False
+
+    @abstractmethod
+    def load_accounts(self, site: str, config: NovelConfigration) -> List[TrackedWork]:
+        """保存されている登録情報を取得.
+
+        Args:
+            site (str): サポートサイト
+            config (NovelConfigration): サイト別の設定(urlsはconfig.yamlに記載されている登録情報)
+
+        Returns:
+            List[TrackedWork]: 登録情報
+        """
+        pass
+
+    @abstractmethod
+    def save(self, yaml_data: Any, sites: Mapping[str, NovelConfigration]) -> None:
+        """登録情報を保存.
+
+        Args:
+            yaml_data (Any): config.yamlの内容
+            sites (Mapping[str, NovelConfigration]): サイト別の設定
+        """
+        pass
+
+    def close(self) -> None:
+        """保存先を閉じる."""
+        pass
+
+
+class YamlStateStore(StateStore):
+    """config.yamlに登録情報を保存する(既定)."""
+
+    def __init__(self, configfile: str) -> None:
+        """初期化.
+
+        Args:
+            configfile (str): config.yamlのパス
+        """
+        self._configfile = configfile
+
+    def load_accounts(self, site: str, config: NovelConfigration) -> List[TrackedWork]:
+        return config.urls
+
+    def save(self, yaml_data: Any, sites: Mapping[str, NovelConfigration]) -> None:
+        # 登録情報は読み込み時にTrackedWorkへ変換しているため、保存時に書き戻す
+        # (全件を書き出すため、変更の記録は使わない)
+        for site, config in sites.items():
+            config.take_changes()
+            accounts = CommentedSeq()
+            for account in config.dump():
+                item = CommentedMap(account)
+                item.fa.set_flow_style()
+                accounts.append(item)
+            yaml_data[site]["account"] = accounts
+
+        stream = StringIO()
+        yaml = YAML()
+        try:
+            yaml.dump(data=yaml_data, stream=stream)
+        finally:
+            # 書き出した登録情報は保持しない(登録情報はconfig.urlsで保持する)
+            for site in sites:
+                yaml_data[site]["account"] = []
+        atomic_write(self._configfile, stream.getvalue())
+
+
+class SqliteStateStore(StateStore):
+    """SQLiteに登録情報を保存する.
+
+    保存時は前回保存時から変更された登録情報のみ書き込む。
+    初回読み込み時にconfig.yamlの登録情報を取り込む。
+    複数のプロセスで共有でき、各プロセスは自身が変更した登録情報の変更した項目のみ書き込む。
+    """
+
+    shared = True
+
+    def __init__(self, path: str) -> None:
+        """初期化.
+
+        Args:
+            path (str): データベースファイルのパス
+        """
+        self._logger = getLogger("narocheckerlog.state")
+        # 書き込みはConfigManagerの書き込み用スレッドから行う
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS account (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    site TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    lastupdated TEXT NOT NULL,
+                    is_datetime INTEGER NOT NULL,
+                    data TEXT NOT NULL DEFAULT '{}',
+                    UNIQUE (site, id)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def _encode_lastupdated(
+        self, config: NovelConfigration, account: TrackedWork
+    ) -> Tuple[str, int]:
+        """最終更新日を保存形式に変換.
+
+        Args:
+            config (NovelConfigration): サイト別の設定
+            account (TrackedWork): 登録情報
+
+        Returns:
+            Tuple[str, int]: 最終更新日, datetimeかどうか
+        """
+        lastupdated = datetime.fromtimestamp(account.lastupdated)
+        if config.lastupdated_as_datetime:
+            return (lastupdated.isoformat(sep=" "), 1)
+        return (lastupdated.isoformat(), 0)
+
+    def _encode_data(self, account: TrackedWork) -> str:
+        """最終更新日以外の項目を保存形式に変換.
+
+        Args:
+            account (TrackedWork): 登録情報
+
+        Returns:
+            str: その他の項目(JSON)
+        """
+        data: Dict[str, Any] = {}
+        if account.channels:
+            data["channels"] = account.channels
+        if account.extra:
+            data.update(account.extra)
+        return json.dumps(data)
+
+    def _encode(
+        self, config: NovelConfigration, account: TrackedWork
+    ) -> Tuple[str, int, str]:
+        """登録情報を保存形式に変換.
+
+        Args:
+            config (NovelConfigration): サイト別の設定
+            account (TrackedWork): 登録情報
+
+        Returns:
+            Tuple[str, int, str]: 最終更新日, datetimeかどうか, その他の項目(JSON)
+        """
+        return (*self._encode_lastupdated(config, account), self._encode_data(account))
+
+    def load_accounts(self, site: str, config: NovelConfigration) -> List[TrackedWork]:
+        id_key = config.id_key
+        migrated = self._conn.execute(
+            "SELECT 1 FROM meta WHERE key = ?", (f"migrated:{site}",)
+        ).fetchone()
+        if migrated is None:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO account"
+                    + " (site, id, lastupdated, is_datetime, data)"
+                    + " VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (site, account.id, *self._encode(config, account))
+                        for account in config.urls
+                    ],
+                )
+                self._conn.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    (f"migrated:{site}", datetime.now().isoformat()),
+                )
+            self._logger.info(
+                f"{site}: config.yamlから{len(config.urls)}件移行しました"
+            )
+
+        loaded: List[TrackedWork] = []
+        for id, lastupdated, data in self._conn.execute(
+            "SELECT id, lastupdated, data FROM account"
+            + " WHERE site = ? ORDER BY seq",
+            (site,),
+        ):
+            account: Dict[str, Any] = json.loads(data)
+            account["lastupdated"] = lastupdated
+            account[id_key] = id
+            loaded.append(TrackedWork.from_account(account, id_key))
+        return loaded
+
+    def save(self, yaml_data: Any, sites: Mapping[str, NovelConfigration]) -> None:
+        # 変更が記録された登録情報のみ変換して書き込む
+        changes = {site: config.take_changes() for site, config in sites.items()}
+        try:
+            with self._conn:
+                for site, config in sites.items():
+                    self._write_changes(site, config, changes[site])
+        except BaseException:
+            for site, config in sites.items():
+                config.restore_changes(changes[site])
+            raise
+
+    def _write_changes(
+        self, site: str, config: NovelConfigration, changes: Dict[str, Set[str]]
+    ) -> None:
+        """変更された登録情報を書き込む.
+
+        Args:
+            site (str): サポートサイト
+            config (NovelConfigration): サイト別の設定
+            changes (Dict[str, Set[str]]): IDをキーとした変更された項目
+        """
+        added: List[Tuple[Any, ...]] = []
+        lastupdated: List[Tuple[Any, ...]] = []
+        data: List[Tuple[Any, ...]] = []
+        removed: List[Tuple[str, str]] = []
+        for id, fields in changes.items():
+            account = config.get(id)
+            if account is None or "removed" in fields:
+                removed.append((site, id))
+            elif "added" in fields:
+                added.append((site, id, *self._encode(config, account)))
+            else:
+                if "lastupdated" in fields:
+                    lastupdated.append(
+                        (*self._encode_lastupdated(config, account), site, id)
+                    )
+                if "channels" in fields:
+                    data.append((self._encode_data(account), site, id))
+
+        self._conn.executemany(
+            "INSERT INTO account (site, id, lastupdated, is_datetime, data)"
+            + " VALUES (?, ?, ?, ?, ?)"
+            + " ON CONFLICT (site, id) DO UPDATE SET"
+            + " lastupdated = excluded.lastupdated,"
+            + " is_datetime = excluded.is_datetime, data = excluded.data",
+            added,
+        )
+        # 変更した列のみ書き込む(他のプロセスが保存した最終更新日を古い値で戻さない)
+        # 読み込み後に他のプロセスが削除したものは復活させない
+        self._conn.executemany(
+            "UPDATE account SET lastupdated = ?, is_datetime = ?"
+            + " WHERE site = ? AND id = ?",
+            lastupdated,
+        )
+        self._conn.executemany(
+            "UPDATE account SET data = ? WHERE site = ? AND id = ?", data
+        )
+        self._conn.executemany("DELETE FROM account WHERE site = ? AND id = ?", removed)
+
+    def close(self) -> None:
+        self._conn.close()
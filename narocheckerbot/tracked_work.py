@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+
+def to_epoch(lastupdated: Union[datetime, str, float]) -> float:
+    """最終更新日をUNIX時間に変換.
+
+    Args:
+        lastupdated (Union[datetime, str, float]): 最終更新日(datetime, ISO形式の文字列, UNIX時間)
+
+    Raises:
+        ValueError: 日時として解釈できない
+
+    Returns:
+        float: UNIX時間
+    """
+    if isinstance(lastupdated, datetime):
+        return lastupdated.timestamp()
+    if isinstance(lastupdated, (int, float)):
+        return float(lastupdated)
+    return datetime.fromisoformat(str(lastupdated)).timestamp()
+
+
+class TrackedWork:
+    """登録作品(実行時の登録情報).
+
+    登録数が多くてもメモリ使用量と毎回の比較の手間を抑えるため、
+    属性を__slots__で固定し、最終更新日はUNIX時間で保持する。
+    config.yaml / state.dbの形式(辞書)との変換は読み込み時と保存時にのみ行う。
+    """
+
+    __slots__ = ("id", "lastupdated", "channels", "extra")
+
+    def __init__(
+        self,
+        id: str,
+        lastupdated: float,
+        channels: Optional[List[int]] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """初期化.
+
+        Args:
+            id (str): ID(ncode, ユーザID)
+            lastupdated (float): 最終更新日(UNIX時間)
+            channels (Optional[List[int]], optional): 通知先チャンネル(省略時はサイトのchannel).
+            extra (Optional[Dict[str, Any]], optional): その他の項目(保存時にそのまま書き戻す).
+        """
+        self.id = id
+        self.lastupdated = lastupdated
+        self.channels = channels
+        self.extra = extra
+
+    @classmethod
+    def from_account(cls, account: Mapping[str, Any], id_key: str) -> "TrackedWork":
+        """保存形式の登録情報から変換.
+
+        Args:
+            account (Mapping[str, Any]): 登録情報
+            id_key (str): IDを表すキー
+
+        Returns:
+            TrackedWork: 登録作品
+        """
+        extra = {
+            key: value
+            for key, value in account.items()
+            if key not in (id_key, "lastupdated", "channels")
+        }
+        channels = account.get("channels")
+        return cls(
+            str(account[id_key]),
+            to_epoch(account["lastupdated"]),
+            [int(channel) for channel in channels] if channels else None,
+            extra or None,
+        )
+
+    def to_account(self, id_key: str, as_datetime: bool) -> Dict[str, Any]:
+        """保存形式の登録情報に変換.
+
+        Args:
+            id_key (str): IDを表すキー
+            as_datetime (bool): 最終更新日をdatetimeで書き出すか(Falseの場合はISO形式の文字列)
+
+        Returns:
+            Dict[str, Any]: 登録情報
+        """
+        lastupdated = datetime.fromtimestamp(self.lastupdated)
+        account: Dict[str, Any] = {
+            "lastupdated": lastupdated if as_datetime else lastupdated.isoformat(),
+            id_key: self.id,
+        }
+        if self.channels:
+            account["channels"] = list(self.channels)
+        if self.extra:
+            account.update(self.extra)
+        return account
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TrackedWork):
+            return NotImplemented
+        return (self.id, self.lastupdated, self.channels, self.extra) == (
+            other.id,
+            other.lastupdated,
+            other.channels,
+            other.extra,
+        )
+
+    def __repr__(self) -> str:
+        return f"TrackedWork({self.id!r}, {self.lastupdated!r}, {self.channels!r})"
@@ -0,0 +1,49 @@
+import re
+from typing import Dict, List
+
+from narocheckerbot.tracked_work import TrackedWork
+
+# ncode(URLに含まれるものも可)
+NCODE_PATTERN = re.compile(r"n\d{4}[a-z]{1,3}", re.IGNORECASE)
+# ユーザID(マイページのURLの末尾でも可)
+USERID_PATTERN = re.compile(r"(\d+)/?$")
+
+
+def parse_ids(site: str, text: str) -> List[str]:
+    """テキストから登録するIDを取り出す.
+
+    空白・改行・カンマ区切りで、ncodeや小説ページのURLを並べたものを想定する。
+    重複は除き、出現順に返す。
+
+    Args:
+        site (str): サポートサイト
+        text (str): IDを並べたテキスト
+
+    Returns:
+        List[str]: IDリスト(ncodeは小文字)
+    """
+    ids: Dict[str, None] = {}
+    for token in re.split(r"[\s,]+", text):
+        if not token:
+            continue
+        if site == "naro_blog":
+            match = USERID_PATTERN.search(token)
+            if match:
+                ids[match.group(1)] = None
+        else:
+            match = NCODE_PATTERN.search(token)
+            if match:
+                ids[match.group(0).lower()] = None
+    return list(ids)
+
+
+def export_ids(urls: List[TrackedWork]) -> str:
+    """登録情報をparse_idsで読み込める形式に変換.
+
+    Args:
+        urls (List[TrackedWork]): 登録情報リスト
+
+    Returns:
+        str: 1行1IDのテキスト
+    """
+    return "".join(f"{url.id}\n" for url in urls)
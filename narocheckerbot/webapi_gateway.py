@@ -1,5 +1,10 @@
 from abc import ABCMeta, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+from narocheckerbot.retry_scheduler import RetryScheduler
+from narocheckerbot.tracked_work import TrackedWork
 
 
 class WebApiGateway(metaclass=ABCMeta):
@@ -10,16 +15,81 @@ class WebApiGateway(metaclass=ABCMeta):
     """
 
     def __init__(self) -> None:
+        # ApiGatewayManagerから共有セッションが設定される
+        self.session: Optional[aiohttp.ClientSession] = None
+        # 再試行とサーキットブレーカー(ApiGatewayManagerから共有のものが設定される)
+        self.scheduler = RetryScheduler()
+        # サポートサイト(メトリクスのラベルに使用)
+        self.site = ""
+
+    def set_session(self, session: Optional[aiohttp.ClientSession]) -> None:
+        """共有セッションを設定.
+
+        Args:
+            session (Optional[aiohttp.ClientSession]): 共有セッション
+        """
+        self.session = session
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """共有セッションを取得.
+
+        Raises:
+            RuntimeError: セッションが未設定またはクローズ済み
+
+        Returns:
+            aiohttp.ClientSession: 共有セッション
+        """
+        if self.session is None or self.session.closed:
+            raise RuntimeError("セッションが開始されていません")
+        return self.session
+
+    async def close(self) -> None:
+        """gateway固有のリソースを解放する(ApiGatewayManagerの終了時に呼ばれる)."""
+        pass
+
+    def configure(self, options: Dict[str, Any]) -> None:
+        """サイト別設定を反映.
+
+        Args:
+            options (Dict[str, Any]): config.yamlのoptions
+        """
         pass
 
     @abstractmethod
-    async def exec(self, urls: Optional[List[Dict[str, Any]]]) -> List[str]:
+    async def exec(self, urls: Optional[List[TrackedWork]]) -> List[str]:
+        pass
+
+    @abstractmethod
+    async def check(
+        self, urls: List[TrackedWork], failed: Optional[Set[str]] = None
+    ) -> List[List[str]]:
+        """登録情報ごとに更新チェック.
+
+        Args:
+            urls (List[TrackedWork]): 登録情報リスト
+            failed (Optional[Set[str]], optional): 取得に失敗したIDを追加する集合.
+
+        Returns:
+            List[List[str]]: urlsと同じ順の、登録情報ごとの更新メッセージリスト
+        """
         pass
 
     @abstractmethod
     def create_query(self, id: Any) -> str:
         pass
 
+    @abstractmethod
+    async def lookup(self, ids: List[str]) -> Dict[str, Tuple[float, str]]:
+        """登録前の確認としてIDの最終更新日とタイトルをまとめて取得.
+
+        Args:
+            ids (List[str]): IDリスト
+
+        Returns:
+            Dict[str, Tuple[float, str]]: 存在したIDをキーとした最終更新日(UNIX時間), タイトル
+        """
+        pass
+
     # @abstractmethod
     # async def request(self, url: Dict[str, Any]) -> Tuple[datetime, str]:
     #     pass
@@ -0,0 +1,313 @@
+"""更新チェックのワーカー.
+
+Discordに接続せずに更新チェックのみを行い、通知は共有の送信キュー(outbox.db)に登録する。
+送付はDiscordに接続しているBotが行う。複数のワーカーを起動すると、
+登録作品をコンシステントハッシュで分担してチェックする。
+
+    python -m narocheckerbot.worker --name worker1
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from logging import DEBUG, Formatter, StreamHandler, getLogger
+from typing import Dict, List, Optional, Set
+
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+from narocheckerbot.cluster import Cluster
+from narocheckerbot.config_manager import ConfigManager
+from narocheckerbot.feed_cache import FeedCache
+from narocheckerbot.metrics import metrics
+from narocheckerbot.outbox import Outbox
+from narocheckerbot.poll_scheduler import PollScheduler
+from narocheckerbot.tracked_work import TrackedWork
+
+
+class Worker:
+    """更新チェックを行い、通知を送信キューに登録する.
+
+    Botのcogもこのクラスで更新チェックを行う。
+    settingsのclusterを有効にした場合、生存しているワーカー間で登録作品を分担する。
+    """
+
+    def __init__(self, name: Optional[str] = None, join: Optional[bool] = None) -> None:
+        """初期化.
+
+        Args:
+            name (Optional[str], optional): ワーカー名(省略時はsettings.cluster.name)
+            join (Optional[bool], optional): 更新チェックを行うか
+                (省略時はsettings.cluster.check, 既定はTrue).
+
+        Raises:
+            RuntimeError: 共有できない保存先でclusterを有効にした
+        """
+        self.logger = getLogger("narocheckerlog.worker")
+        directory = os.path.dirname(os.path.abspath(__file__))
+
+        self.config_manager = ConfigManager()
+        settings = self.config_manager.settings
+        cluster = dict(settings.get("cluster") or {})
+
+        if join is None:
+            join = bool(cluster.get("check", True))
+        self.join = join
+
+        self.cluster: Optional[Cluster] = None
+        if cluster.get("enabled", False) and join:
+            if not self.config_manager.shared_state:
+                raise RuntimeError(
+                    "clusterを使用する場合はsettings.state.backendにsqliteを指定してください"
+                )
+            self.cluster = Cluster(
+                directory + "/cluster.db",
+                name or str(cluster.get("name", "bot")),
+                float(cluster.get("ttl", 180.0)),
+            )
+
+        self.gateway_manager = ApiGatewayManager()
+        # 通信の記録・再生(カセットはconfig.yamlからの相対パス)
+        http = dict(settings.get("http") or {})
+        http["cassette"] = os.path.join(
+            directory, str(http.get("cassette", "cassette.jsonl.gz"))
+        )
+        self.gateway_manager.configure(http)
+        self.poll_schedulers: Dict[str, PollScheduler] = {}
+        for site, config in self.config_manager.support_sites.items():
+            self.gateway_manager.get_gateway(site).configure(config.options)
+            self.poll_schedulers[site] = PollScheduler()
+            self.poll_schedulers[site].configure(config.options)
+
+        # 検証情報のキャッシュはプロセスごとに持つ
+        if (
+            self.cluster is not None
+            and "naro_blog" in self.config_manager.support_sites
+        ):
+            from narocheckerbot.naro_blog_api_gateway import NaroBlogApiGateway
+
+            blog = self.gateway_manager.get_gateway("naro_blog")
+            assert isinstance(blog, NaroBlogApiGateway)
+            blog.feed_cache = FeedCache(
+                directory + f"/feed_cache.{self.cluster.name}.json"
+            )
+
+        # 送信前の通知を保持する送信キュー(Botとワーカーで共有)
+        self.outbox = Outbox(directory + "/outbox.db")
+
+        # チェック間隔をslots個に分割し、登録作品を分散してチェックする
+        self.check_interval = float(settings.get("check_interval", 3600))
+        self.slots = max(1, int(settings.get("slots", 1)))
+        self.slot = 0
+
+        self._heartbeat: Optional[asyncio.Task[None]] = None
+
+    async def open(self) -> None:
+        """HTTPセッションを開始し、分担に参加する."""
+        await self.gateway_manager.open()
+        if self.cluster is not None:
+            self.cluster.heartbeat()
+            self._heartbeat = asyncio.get_running_loop().create_task(
+                self._heartbeat_loop()
+            )
+
+    async def close(self) -> None:
+        """分担から外れ、各リソースを閉じる."""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        await self.gateway_manager.close()
+        self.outbox.close()
+        await self.config_manager.close()
+        if self.cluster is not None:
+            self.cluster.leave()
+            self.cluster.close()
+
+    async def _heartbeat_loop(self) -> None:
+        """生存通知を定期的に書き込む."""
+        assert self.cluster is not None
+        while True:
+            await asyncio.sleep(self.cluster.ttl / 3)
+            try:
+                self.cluster.heartbeat()
+            except Exception:
+                self.logger.exception("生存通知に失敗しました")
+
+    def next_slot(self) -> int:
+        """今回チェックするスロット番号を取得し、次のスロットに進める.
+
+        Returns:
+            int: スロット番号
+        """
+        slot = self.slot
+        self.slot = (self.slot + 1) % self.slots
+        return slot
+
+    def next_delay(self) -> float:
+        """次のチェック開始までの待ち時間.
+
+        更新の反映に最大5分かかるということで、予備で+2分(毎時7分)を起点とする。
+        スロットに分割している場合は次のスロットの開始まで待つ。
+
+        Returns:
+            float: 待ち時間(秒)
+        """
+        dt_now = datetime.now()
+        dt2 = dt_now.replace(minute=7, second=0)
+
+        if dt2 > dt_now:
+            td = dt2 - dt_now
+        else:
+            td = dt2 - dt_now + timedelta(hours=1)
+
+        return td.total_seconds() % (self.check_interval / self.slots)
+
+    async def prepare(self) -> None:
+        """チェック開始前の準備.
+
+        分担している場合は、他のプロセスが保存した最終更新日を読み込み直す。
+        """
+        if self.cluster is None:
+            return
+        await self.config_manager.flush()
+        self.config_manager.reload_accounts()
+        self.cluster.heartbeat()
+
+    def select(
+        self, site: str, slot: Optional[int] = None, now: Optional[float] = None
+    ) -> List[TrackedWork]:
+        """今回チェックする登録情報を選ぶ.
+
+        Args:
+            site (str): サポートサイト
+            slot (Optional[int], optional): チェックするスロット番号.
+            now (Optional[float], optional): 現在時刻(UNIX時間, 省略時は現在時刻).
+
+        Returns:
+            List[TrackedWork]: チェック対象の登録情報リスト
+        """
+        urls = self.config_manager.get_config(site).urls
+        if self.cluster is not None:
+            urls = self.cluster.owned(urls)
+        return self.poll_schedulers[site].select(
+            urls,
+            time.time() if now is None else now,
+            None if slot is None else (slot, self.slots),
+        )
+
+    async def site_update_check(self, site: str, slot: Optional[int] = None) -> None:
+        """サイト別の更新チェック(エラーは呼び出し元で処理する).
+
+        Args:
+            site (str): サポートサイト
+            slot (Optional[int], optional): チェックするスロット番号.
+
+        Raises:
+            KeyError: サイトの設定がない
+        """
+        config = self.config_manager.get_config(site)
+        now = time.time()
+        urls = self.select(site, slot, now)
+        if not urls:
+            self.logger.info(f"{site}: チェック対象がありません")
+            return
+
+        # 購読チャンネルが複数あっても作品ごとの取得は1回で済ませる
+        failed: Set[str] = set()
+        before = [url.lastupdated for url in urls]
+        with metrics.timer("check_seconds", site=site):
+            gateway = self.gateway_manager.get_gateway(site)
+            results = await gateway.check(urls, failed)
+        # 取得に失敗した作品は次回も選ばれるよう、チェック時刻を記録しない
+        self.poll_schedulers[site].checked(
+            (url.id for url in urls if url.id not in failed), now
+        )
+        # 保存時に変更分のみ書き込めるよう、最終更新日が変わった作品を記録する
+        updated = [
+            url
+            for url, lastupdated in zip(urls, before)
+            if url.lastupdated != lastupdated
+        ]
+        config.mark_updated(updated)
+
+        outgoing: Dict[int, List[str]] = {}
+        updates = 0
+        for url, messages in zip(urls, results):
+            messages = [message for message in messages if message]
+            if not messages:
+                continue
+            updates += len(messages)
+            for channel in config.channels_of(url):
+                outgoing.setdefault(channel, []).extend(messages)
+        metrics.inc("checked_works_total", len(urls), site=site)
+        metrics.inc("updates_total", updates, site=site)
+        # 送信キューに登録してから最終更新日を保存する(送付はBotのdeliverで行う)
+        for channel, messages in outgoing.items():
+            await self.outbox.enqueue_async(site, channel, messages)
+        if updated:
+            self.config_manager.request_write()
+
+    async def update_check(self, slot: Optional[int] = None) -> None:
+        """全サイトの更新チェック(ワーカー単体で動かす場合).
+
+        エラーはログに記録し、サイトのチャンネルへの通知を送信キューに登録する。
+
+        Args:
+            slot (Optional[int], optional): チェックするスロット番号.
+        """
+        self.logger.info(f"Check: Start (slot: {slot}/{self.slots})")
+        await self.prepare()
+
+        async def check(site: str) -> None:
+            try:
+                await self.site_update_check(site, slot)
+            except Exception:
+                message = "処理中に問題が発生しました。エラーログを確認してください。"
+                self.logger.exception(f"{site}: {message}")
+                await self.outbox.enqueue_async(
+                    site, self.config_manager.get_config(site).channel_id, [message]
+                )
+
+        with metrics.timer("cycle_seconds"):
+            async with asyncio.TaskGroup() as tg:
+                for site in self.config_manager.support_sites:
+                    tg.create_task(check(site))
+
+        self.logger.info("Check: Finish")
+
+    async def run(self) -> None:
+        """定期的に更新チェックを行う."""
+        await self.open()
+        try:
+            await self.update_check()
+            while True:
+                await asyncio.sleep(self.next_delay())
+                await self.update_check(self.next_slot())
+        finally:
+            await self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--name", required=True, help="ワーカー名(プロセスごとに一意)")
+    args = parser.parse_args()
+
+    logger = getLogger("narocheckerlog")
+    handler = StreamHandler()
+    handler.setFormatter(
+        Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logger.setLevel(DEBUG)
+    logger.addHandler(handler)
+
+    worker = Worker(args.name, join=True)
+    if worker.cluster is None:
+        parser.error("settings.clusterのenabledをtrueにしてください")
+
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
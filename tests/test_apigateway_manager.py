@@ -0,0 +1,50 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+
+
+def test_gateways_are_created_on_demand():
+    manager = ApiGatewayManager()
+    assert manager.support_sites == {}
+
+    async def run():
+        await manager.open()
+        try:
+            gateway = manager.get_gateway("naro")
+            assert gateway.scheduler is manager.scheduler
+            assert gateway.session is manager.session
+            assert manager.get_gateway("naro") is gateway
+        finally:
+            await manager.close()
+
+    asyncio.run(run())
+    assert list(manager.support_sites) == ["naro"]
+
+
+def test_blog_gateway_is_not_imported_until_used():
+    code = (
+        "import sys\n"
+        "from narocheckerbot.apigateway_manager import ApiGatewayManager\n"
+        "ApiGatewayManager().get_gateway('naro')\n"
+        "print('feedparser' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
+
+
+def test_configure_rejects_unknown_mode():
+    manager = ApiGatewayManager()
+    with pytest.raises(ValueError):
+        manager.configure({"mode": "mock"})
+    manager.configure({"mode": "replay", "cassette": "x.jsonl.gz", "speed": 0})
+    assert (manager.mode, manager.cassette, manager.speed) == (
+        "replay",
+        "x.jsonl.gz",
+        0.0,
+    )
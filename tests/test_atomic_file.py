@@ -0,0 +1,44 @@
+import os
+import stat
+
+import pytest
+
+from narocheckerbot.atomic_file import atomic_write
+
+
+def test_atomic_write_replaces_and_keeps_mode(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text("old")
+    os.chmod(path, 0o644)
+    synced = []
+    fsync = os.fsync
+
+    def record(fd):
+        synced.append(fd)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", record)
+    atomic_write(str(path), "新しい内容", encoding="utf-8")
+
+    # 置き換える前に書き込み内容をディスクに反映する
+    assert synced
+
+    assert path.read_text(encoding="utf-8") == "新しい内容"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert os.listdir(tmp_path) == ["config.yaml"]
+
+
+def test_atomic_write_keeps_old_file_on_failure(tmp_path, monkeypatch):
+    path = tmp_path / "config.yaml"
+    path.write_text("old")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write(str(path), "new")
+
+    # 元のファイルが残り、一時ファイルは削除される
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["config.yaml"]
@@ -0,0 +1,22 @@
+import discord
+from discord import app_commands
+
+from bot import command_hash, load_command_hash
+
+
+def test_command_hash_changes_with_commands(tmp_path):
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+
+    @tree.command(name="a", description="a")
+    async def a(interaction: discord.Interaction) -> None:
+        pass
+
+    first = command_hash(tree)
+    assert command_hash(tree) == first
+
+    @tree.command(name="b", description="b")
+    async def b(interaction: discord.Interaction) -> None:
+        pass
+
+    assert command_hash(tree) != first
+    assert load_command_hash(tmp_path / "missing.json") == {}
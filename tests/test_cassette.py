@@ -0,0 +1,156 @@
+import asyncio
+import gzip
+import json
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.bench_gateways import API_PATHS, create_urls
+from benchmarks.fake_syosetu import FakeSyosetu
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+from narocheckerbot.cassette import (
+    CassetteMissError,
+    RecordingSession,
+    ReplaySession,
+    request_key,
+)
+from narocheckerbot.feed_cache import FeedCache
+
+
+async def check_sites(manager, base, tmp_path):
+    results = {}
+    for site in ("naro", "naro18", "naro_blog"):
+        gateway = manager.get_gateway(site)
+        gateway.configure({"api_url": base + API_PATHS[site]})
+        if site == "naro_blog":
+            gateway.feed_cache = FeedCache(str(tmp_path / "feed_cache.json"))
+        results[site] = await gateway.check(create_urls(site, 10))
+    return results
+
+
+def test_replay_reproduces_recorded_cycle(tmp_path):
+    fake = FakeSyosetu(update_ratio=0.5, entries=2)
+    cassette = str(tmp_path / "cassette.jsonl.gz")
+
+    async def record():
+        async with TestServer(fake.create_app()) as server:
+            manager = ApiGatewayManager()
+            manager.configure({"mode": "record", "cassette": cassette})
+            await manager.open()
+            base = str(server.make_url("")).rstrip("/")
+            try:
+                return base, await check_sites(manager, base, tmp_path / "rec")
+            finally:
+                await manager.close()
+
+    async def replay(base):
+        manager = ApiGatewayManager()
+        manager.configure({"mode": "replay", "cassette": cassette, "speed": 0})
+        await manager.open()
+        try:
+            session = manager.session
+            results = await check_sites(manager, base, tmp_path)
+            return results, session.remaining()
+        finally:
+            await manager.close()
+
+    (tmp_path / "rec").mkdir()
+    base, recorded = asyncio.run(record())
+    requests = fake.stats["requests"]
+    replayed, remaining = asyncio.run(replay(base))
+
+    assert any(any(messages) for messages in recorded["naro"])
+    assert any(any(messages) for messages in recorded["naro_blog"])
+    assert replayed == recorded
+    assert remaining == 0
+    # 再生中はサーバに接続しない
+    assert fake.stats["requests"] == requests
+
+
+def test_replay_errors_and_timing(tmp_path):
+    cassette = tmp_path / "cassette.jsonl.gz"
+    with gzip.open(cassette, "wt", encoding="utf-8") as stream:
+        for entry in (
+            {"url": "http://a/x?lastup=1", "error": "timeout", "elapsed": 0.2},
+            {
+                "url": "http://a/x?lastup=2",
+                "status": 503,
+                "headers": [],
+                "body": "",
+                "elapsed": 0.2,
+            },
+        ):
+            stream.write(json.dumps(entry) + "\n")
+
+    async def run():
+        session = ReplaySession(str(cassette), speed=4)
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            async with session.get("http://a/x?lastup=3"):
+                pass
+        async with session.get("http://a/x") as r:
+            with pytest.raises(aiohttp.ClientResponseError):
+                r.raise_for_status()
+        elapsed = time.monotonic() - start
+        with pytest.raises(CassetteMissError):
+            async with session.get("http://a/x"):
+                pass
+        return elapsed
+
+    # 記録した所要時間を再生速度で割って待つ
+    assert 0.1 <= asyncio.run(run()) < 0.3
+
+
+def test_request_key_ignores_volatile_query():
+    assert request_key("http://a/api/?out=json&lastup=1-2&ncode=n1") == request_key(
+        "http://a/api/?out=json&ncode=n1"
+    )
+
+
+def test_recording_survives_crash_and_cancellation(tmp_path):
+    cassette = str(tmp_path / "cassette.jsonl.gz")
+
+    async def ok(request):
+        return web.Response(text="ok")
+
+    async def slow(request):
+        await asyncio.sleep(10)
+        return web.Response(text="late")
+
+    app = web.Application()
+    app.router.add_get("/ok", ok)
+    app.router.add_get("/slow", slow)
+
+    async def record():
+        async with TestServer(app) as server, aiohttp.ClientSession() as client:
+            urls = [str(server.make_url("/ok")), str(server.make_url("/slow"))]
+            session = RecordingSession(client, cassette)
+            async with session.get(urls[0]) as r:
+                assert await r.read() == b"ok"
+            task = asyncio.create_task(session.get(urls[1]).__aenter__())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # 停止した想定でカセットは閉じない
+            return urls
+
+    urls = asyncio.run(record())
+    # 書き込み途中で停止した1件(不完全なgzip)
+    with open(cassette, "ab") as stream:
+        stream.write(gzip.compress(b'{"url": "x"}\n')[:15])
+
+    async def replay():
+        session = ReplaySession(cassette, speed=0)
+        async with session.get(urls[0]) as r:
+            assert await r.read() == b"ok"
+        # キャンセルされたリクエストは接続エラーとして再生する
+        with pytest.raises(aiohttp.ClientConnectionError):
+            async with session.get(urls[1]):
+                pass
+        return session.remaining()
+
+    assert asyncio.run(replay()) == 0
@@ -0,0 +1,36 @@
+from narocheckerbot.cluster import Cluster, HashRing
+from narocheckerbot.tracked_work import TrackedWork
+
+
+def test_hash_ring_moves_only_departed_members_ids():
+    ids = [f"n{i:04d}ab" for i in range(1000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b"])
+
+    owners = {id: before.owner(id) for id in ids}
+    assert set(owners.values()) == {"a", "b", "c"}
+    for id in ids:
+        if owners[id] != "c":
+            assert after.owner(id) == owners[id]
+
+
+def test_cluster_members_split_ownership(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    first = Cluster(path, "bot")
+    second = Cluster(path, "worker1")
+    urls = [TrackedWork(f"n{i:04d}ab", 0.0) for i in range(200)]
+
+    first.heartbeat()
+    # 自分しかいなければすべて担当する
+    assert first.owned(urls) == urls
+
+    second.heartbeat()
+    mine = first.owned(urls)
+    theirs = second.owned(urls)
+    assert mine and theirs
+    assert sorted(u.id for u in mine + theirs) == [u.id for u in urls]
+
+    second.leave()
+    assert first.owned(urls) == urls
+    first.close()
+    second.close()
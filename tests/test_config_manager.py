@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from narocheckerbot.config_manager import ConfigManager
+from narocheckerbot.state_store import YamlStateStore
+
+CONFIG = """\
+settings:
+    write_delay: 0.05
+naro:
+    channel: 1
+    account:
+        - { lastupdated: 2024-01-01 00:00:00, ncode: n1 }
+"""
+
+
+class CountingStore(YamlStateStore):
+    """書き込み回数を数える(fail回目までは失敗させる)."""
+
+    def __init__(self, configfile, fail=0):
+        super().__init__(configfile)
+        self.saves = 0
+        self.fail = fail
+
+    def save(self, yaml_data, sites):
+        self.saves += 1
+        if self.saves <= self.fail:
+            raise OSError("disk full")
+        super().save(yaml_data, sites)
+
+
+def create_manager(tmp_path, fail=0):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    manager = ConfigManager(str(path))
+    manager._store = CountingStore(str(path), fail)
+    return manager
+
+
+def test_requests_are_merged_into_one_write(tmp_path):
+    manager = create_manager(tmp_path)
+
+    async def run():
+        for _ in range(3):
+            manager.request_write()
+        await asyncio.sleep(0.2)
+        await manager.close()
+
+    asyncio.run(run())
+    assert manager._store.saves == 1
+
+
+def test_failed_write_is_retried(tmp_path):
+    manager = create_manager(tmp_path, fail=1)
+
+    async def run():
+        manager.request_write()
+        await asyncio.sleep(0.3)
+        await manager.close()
+
+    asyncio.run(run())
+    assert manager._store.saves == 2
+    assert "n1" in (tmp_path / "config.yaml").read_text()
+
+
+def test_close_writes_pending_changes(tmp_path):
+    manager = create_manager(tmp_path)
+
+    async def run():
+        manager.get_config("naro").delete("n1")
+        manager.request_write()
+        await manager.close()
+
+    asyncio.run(run())
+    assert manager._store.saves == 1
+    assert "n1" not in (tmp_path / "config.yaml").read_text()
+
+
+class SlowStore(CountingStore):
+    """書き込みに時間がかかる(書き込み中の状態を記録する)."""
+
+    def __init__(self, configfile):
+        super().__init__(configfile)
+        self.writing = False
+
+    def save(self, yaml_data, sites):
+        self.writing = True
+        time.sleep(0.1)
+        super().save(yaml_data, sites)
+        self.writing = False
+
+
+def test_flush_waits_for_write_in_flight(tmp_path):
+    manager = create_manager(tmp_path)
+    manager._store = SlowStore(str(tmp_path / "config.yaml"))
+
+    async def run():
+        for cancel in (False, True):
+            manager._dirty = True
+            first = asyncio.create_task(manager.flush())
+            while not manager._store.writing:
+                await asyncio.sleep(0.01)
+            if cancel:
+                # 書き込みを要求したタスクがキャンセルされても完了を待つ
+                first.cancel()
+            await manager.flush()
+            assert not manager._store.writing
+            await asyncio.gather(first, return_exceptions=True)
+        await manager.close()
+
+    asyncio.run(run())
+    assert manager._store.saves == 2
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from narocheckerbot.naro_blog_configuration import NaroBlogConfigration
+from narocheckerbot.naro_configuration import NaroConfigration
+from narocheckerbot.tracked_work import TrackedWork
+
+LASTUP = datetime(2024, 1, 1)
+
+
+def test_index_follows_add_and_delete():
+    config = NaroConfigration(
+        {"account": [{"lastupdated": LASTUP, "ncode": "n1"}], "channel": 0}
+    )
+
+    assert config.is_exist_account(ncode="n1")
+    added = config.add_many(
+        [
+            TrackedWork("n1", LASTUP.timestamp()),
+            TrackedWork("n2", LASTUP.timestamp()),
+            TrackedWork("n3", LASTUP.timestamp()),
+        ]
+    )
+    assert [url.id for url in added] == ["n2", "n3"]
+
+    assert config.delete_many(["n1", "n3", "n9"]) == ["n1", "n3"]
+    assert config.urls == [TrackedWork("n2", LASTUP.timestamp())]
+    assert not config.is_exist_account(ncode="n1")
+    assert not config.delete("n1")
+    assert config.delete("n2")
+    assert config.urls == []
+
+
+def test_index_rebuilt_when_accounts_replaced():
+    config = NaroBlogConfigration({"account": [], "channel": 0})
+
+    config.urls = [TrackedWork("1", LASTUP.timestamp())]
+
+    assert config.is_exist_account(userid="1")
+    assert config.get("1") is config.urls[0]
+
+
+def test_accounts_round_trip_through_dump():
+    naro = NaroConfigration(
+        {
+            "account": [
+                {"lastupdated": LASTUP, "ncode": "n1", "channels": [1, 2], "memo": "x"}
+            ],
+            "channel": 0,
+        }
+    )
+    blog = NaroBlogConfigration(
+        {
+            "account": [{"lastupdated": "2024-01-01T00:00:00", "userid": "1"}],
+            "channel": 0,
+        }
+    )
+
+    assert naro.urls == [TrackedWork("n1", LASTUP.timestamp(), [1, 2], {"memo": "x"})]
+    assert naro.dump() == [
+        {"lastupdated": LASTUP, "ncode": "n1", "channels": [1, 2], "memo": "x"}
+    ]
+    assert blog.urls[0].lastupdated == LASTUP.timestamp()
+    assert blog.dump() == [{"lastupdated": "2024-01-01T00:00:00", "userid": "1"}]
+
+
+def test_subscribe_and_unsubscribe_channels():
+    config = NaroConfigration(
+        {"account": [{"lastupdated": LASTUP, "ncode": "n1"}], "channel": 10}
+    )
+    url = config.get("n1")
+    assert url is not None
+
+    assert config.channels_of(url) == [10]
+    assert config.subscribe(url, 20)
+    assert not config.subscribe(url, 20)
+    assert url.channels == [10, 20]
+
+    assert config.unsubscribe("n1", 10)
+    assert config.channels_of(url) == [20]
+    assert not config.unsubscribe("n1", 10)
+    # 通知先がなくなったら登録情報ごと削除する
+    assert config.unsubscribe("n1", 20)
+    assert not config.is_exist("n1")
+
+
+def test_ncode_index_ignores_case():
+    config = NaroConfigration(
+        {"account": [{"lastupdated": LASTUP, "ncode": "N5040CE"}], "channel": 0}
+    )
+
+    # /importや/subscribeは小文字のncodeで照合する
+    assert config.is_exist("n5040ce")
+    assert config.get("n5040ce") is config.urls[0]
+    assert config.add_many([TrackedWork("n5040ce", LASTUP.timestamp())]) == []
+    config.add(TrackedWork("n1234AB", LASTUP.timestamp()))
+    assert config.is_exist_account(ncode="N1234ab")
+
+    # 削除した登録情報は登録時の表記で記録する(保存先のキーと一致させる)
+    assert config.delete_many(["n5040ce"]) == ["N5040CE"]
+    assert config.take_changes() == {"N5040CE": {"removed"}, "n1234AB": {"added"}}
+    assert [url.id for url in config.urls] == ["n1234AB"]
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from logging import getLogger
+from types import SimpleNamespace
+
+import pytest
+
+from narocheckerbot.naro import NaroChecker
+from narocheckerbot.outbox import Outbox
+
+
+class Sites:
+    def __init__(self, notify):
+        self.options = {"notify": notify}
+
+    def get_config(self, site):
+        return self
+
+
+def create_checker(outbox, notify, succeed):
+    # Discordに接続せずに送付処理のみ確認する
+    checker = NaroChecker.__new__(NaroChecker)
+    checker.logger = getLogger("narocheckerlog.bot")
+    checker.outbox = outbox
+    checker.config_manager = Sites(notify)
+    checker.sent = []
+
+    async def send_message(channel_id, message, embeds=()):
+        if len(checker.sent) >= succeed:
+            return False
+        checker.sent.append(
+            message if message is not None else [e.description for e in embeds]
+        )
+        return True
+
+    checker.send_message = send_message
+    return checker
+
+
+@pytest.mark.parametrize("notify", ["single", "text", "embed"])
+def test_deliver_acks_only_sent_notifications(tmp_path, monkeypatch, notify):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    # text / embedでも2回に分けて送る長さにする
+    messages = [f"{i}" * 1500 for i in range(1, 7)]
+    outbox.enqueue("naro", 1, messages)
+
+    checker = create_checker(outbox, notify, succeed=1)
+    asyncio.run(checker.deliver_pending())
+
+    # 送付できた分だけ削除し、残りは再送待ちにする
+    first = checker.sent[0]
+    sent = len("\n".join(first if notify == "embed" else [first]).split("\n"))
+    assert 0 < sent < len(messages)
+    assert outbox.pending() == []
+    assert outbox.count() == len(messages) - sent
+
+    # 再送では送付できなかった通知のみ送る
+    checker = create_checker(outbox, "single", succeed=len(messages))
+    later = time.time() + 3600
+    monkeypatch.setattr(
+        "narocheckerbot.outbox.time", SimpleNamespace(time=lambda: later)
+    )
+    asyncio.run(checker.deliver_pending())
+    assert checker.sent == messages[sent:]
+    assert outbox.count() == 0
+    outbox.close()
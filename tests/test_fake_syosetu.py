@@ -0,0 +1,104 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+
+from benchmarks.bench_gateways import API_PATHS, create_urls
+from benchmarks.fake_syosetu import FakeSyosetu
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+from narocheckerbot.feed_cache import FeedCache
+
+
+def test_gateways_against_fake_server(tmp_path):
+    fake = FakeSyosetu(update_ratio=0.5, entries=2)
+
+    async def run():
+        async with TestServer(fake.create_app()) as server:
+            manager = ApiGatewayManager()
+            await manager.open()
+            results = {}
+            try:
+                for site in ("naro", "naro_blog"):
+                    gateway = manager.get_gateway(site)
+                    gateway.configure(
+                        {"api_url": str(server.make_url(API_PATHS[site]))}
+                    )
+                    gateway.feed_cache = FeedCache(str(tmp_path / "feed_cache.json"))
+                    results[site] = await gateway.exec(create_urls(site, 20))
+            finally:
+                await manager.close()
+            return results
+
+    results = asyncio.run(run())
+
+    updated = [f"n{i:06d}x" for i in range(20) if fake.lastup(f"n{i:06d}x").day == 2]
+    assert updated
+    assert [message for message in results["naro"] if message] == [
+        f"[更新] テスト小説{ncode} https://ncode.syosetu.com/{ncode}/"
+        for ncode in updated
+    ]
+    assert any("活動報告0" in message for message in results["naro_blog"])
+    assert fake.stats["requests"] == 1 + 20
+
+
+def test_lookup_against_fake_server():
+    fake = FakeSyosetu()
+
+    async def run():
+        async with TestServer(fake.create_app()) as server:
+            manager = ApiGatewayManager()
+            await manager.open()
+            results = {}
+            try:
+                for site, ids in (
+                    ("naro", ["n000001x", "n000002x"]),
+                    ("naro_blog", ["100001"]),
+                ):
+                    gateway = manager.get_gateway(site)
+                    gateway.configure(
+                        {"api_url": str(server.make_url(API_PATHS[site]))}
+                    )
+                    results[site] = await gateway.lookup(ids)
+            finally:
+                await manager.close()
+            return results
+
+    results = asyncio.run(run())
+
+    assert sorted(results["naro"]) == ["n000001x", "n000002x"]
+    assert results["naro"]["n000001x"][1] == "テスト小説n000001x"
+    assert results["naro_blog"]["100001"] == (
+        fake.lastup("100001").timestamp(),
+        "100001の活動報告",
+    )
+
+
+def test_blog_parse_workers_against_fake_server(tmp_path):
+    fake = FakeSyosetu(update_ratio=0.5, entries=3)
+
+    async def run(parse_workers):
+        async with TestServer(fake.create_app()) as server:
+            manager = ApiGatewayManager()
+            await manager.open()
+            try:
+                gateway = manager.get_gateway("naro_blog")
+                gateway.configure(
+                    {
+                        "api_url": str(server.make_url(API_PATHS["naro_blog"])),
+                        "parse_workers": parse_workers,
+                    }
+                )
+                gateway.feed_cache = FeedCache(
+                    str(tmp_path / f"feed_cache{parse_workers}.json")
+                )
+                urls = create_urls("naro_blog", 10)
+                results = await gateway.exec(urls)
+            finally:
+                await manager.close()
+            return results, urls
+
+    threaded, threaded_urls = asyncio.run(run(0))
+    pooled, pooled_urls = asyncio.run(run(1))
+
+    assert any(message for message in pooled)
+    assert pooled == threaded
+    assert pooled_urls == threaded_urls
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from narocheckerbot import feed_cache
+from narocheckerbot.feed_cache import FeedCache
+
+JAN1 = datetime(2024, 1, 1).timestamp()
+JAN2 = datetime(2024, 1, 2, 9).timestamp()
+
+
+def test_validators_follow_lastupdated(tmp_path):
+    path = str(tmp_path / "feed_cache.json")
+    cache = FeedCache(path)
+    cache.set("1", JAN2, '"x"', None, "abc")
+    cache.save()
+
+    reloaded = FeedCache(path)
+
+    assert reloaded.get("1", JAN2) == {
+        "lastupdated": JAN2,
+        "digest": "abc",
+        "etag": '"x"',
+    }
+    # config.yaml側が古いまま(書き込み前に停止した)なら使わない
+    assert reloaded.get("1", JAN1) is None
+    assert reloaded.get("2", JAN2) is None
+
+
+def test_save_async_writes_outside_event_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "feed_cache.json")
+    threads = []
+    write = feed_cache.atomic_write
+
+    def record(*args, **kwargs):
+        threads.append(threading.current_thread())
+        write(*args, **kwargs)
+
+    monkeypatch.setattr(feed_cache, "atomic_write", record)
+    cache = FeedCache(path)
+    cache.set("1", JAN2, None, None, "abc")
+    asyncio.run(cache.save_async())
+    # 変更がなければ書き込まない
+    asyncio.run(cache.save_async())
+
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+    assert FeedCache(path).get("1", JAN2) == {"lastupdated": JAN2, "digest": "abc"}
+
+
+def test_save_async_retries_after_failure(tmp_path, monkeypatch):
+    path = str(tmp_path / "feed_cache.json")
+    write = feed_cache.atomic_write
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    cache = FeedCache(path)
+    cache.set("1", JAN2, None, None, "abc")
+    monkeypatch.setattr(feed_cache, "atomic_write", fail)
+    with pytest.raises(OSError):
+        asyncio.run(cache.save_async())
+
+    # 書き込めなかった変更は次回の保存で書き込む
+    monkeypatch.setattr(feed_cache, "atomic_write", write)
+    asyncio.run(cache.save_async())
+    assert FeedCache(path).get("1", JAN2) is not None
@@ -0,0 +1,76 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from narocheckerbot.json_stream import JsonArrayStream, read_array
+
+DATA = [
+    {"allcount": 2},
+    {"ncode": "N0001A", "title": 'a "{[quoted]}" \\', "general_lastup": "x", "k": 1},
+    {"ncode": "N0002B", "title": "テスト", "general_lastup": "y", "k": [{"z": 1}]},
+]
+
+
+def feed_all(body: bytes, size: int, keys=None):
+    stream = JsonArrayStream(keys)
+    items = []
+    for i in range(0, len(body), size):
+        items.extend(stream.feed(body[i : i + size]))
+    items.extend(stream.close())
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1024])
+def test_stream_matches_json_loads(size):
+    body = json.dumps(DATA, ensure_ascii=False).encode("utf-8")
+    assert feed_all(body, size) == DATA
+    assert feed_all(gzip.compress(body), size) == DATA
+
+
+def test_stream_keeps_only_keys():
+    body = gzip.compress(json.dumps(DATA).encode("utf-8"))
+    items = feed_all(body, 5, ("allcount", "ncode"))
+    assert items == [{"allcount": 2}, {"ncode": "N0001A"}, {"ncode": "N0002B"}]
+
+
+def test_stream_rejects_broken_input():
+    body = json.dumps(DATA).encode("utf-8")
+    with pytest.raises(ValueError):
+        feed_all(body[:-10], 4)
+    with pytest.raises(ValueError):
+        feed_all(b'{"allcount": 0}', 4)
+
+
+def test_read_array_from_async_chunks():
+    body = json.dumps(DATA).encode("utf-8")
+
+    async def chunks():
+        for i in range(0, len(body), 16):
+            yield body[i : i + 16]
+
+    assert asyncio.run(read_array(chunks())) == DATA
+
+
+def test_stream_bounds_decompressed_size():
+    rows = [{"ncode": f"N{i:04d}A", "story": "あ" * 3000} for i in range(100)]
+    body = gzip.compress(json.dumps(rows, ensure_ascii=False).encode("utf-8"))
+    stream = JsonArrayStream(("ncode",))
+    items = stream.feed(body) + stream.close()
+    assert items == [{"ncode": row["ncode"]} for row in rows]
+    assert len(stream._buffer) < 65536
+
+
+@pytest.mark.parametrize("cut", [0, 20])
+def test_corrupt_gzip_raises_value_error(cut):
+    body = bytearray(gzip.compress(json.dumps(DATA).encode("utf-8")))
+    if cut:
+        # 途中で切れたボディ
+        body = body[:cut]
+    else:
+        # 圧縮データの破損(ヘッダ直後を書き換える)
+        body[10:14] = b"\xff\xff\xff\xff"
+    # 再試行の対象(ValueError)として扱えるよう、zlib.errorは変換する
+    with pytest.raises(ValueError):
+        feed_all(bytes(body), 7)
@@ -0,0 +1,25 @@
+from narocheckerbot.metrics import Metrics
+
+
+def test_render_and_summary():
+    metrics = Metrics()
+    metrics.inc("updates_total", 2, site="naro")
+    metrics.inc("updates_total", site="naro")
+    for value in (0.01, 0.2, 0.3, 4.0):
+        metrics.observe("request_seconds", value, host="api.syosetu.com")
+
+    text = metrics.render()
+
+    assert 'narochecker_updates_total{site="naro"} 3' in text
+    assert (
+        'narochecker_request_seconds_bucket{host="api.syosetu.com",le="0.25"} 2' in text
+    )
+    assert (
+        'narochecker_request_seconds_bucket{host="api.syosetu.com",le="+Inf"} 4' in text
+    )
+    assert 'narochecker_request_seconds_count{host="api.syosetu.com"} 4' in text
+
+    histogram = metrics.histograms["request_seconds"][(("host", "api.syosetu.com"),)]
+    assert histogram.quantile(0.5) == 0.25
+    assert histogram.quantile(0.95) == 5.0
+    assert any(line.startswith("updates_total") for line in metrics.summary())
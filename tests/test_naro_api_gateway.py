@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from narocheckerbot.naro18_api_gateway import Naro18ApiGateway
+from narocheckerbot.naro_api_gateway import NaroApiGateway
+from narocheckerbot.response_parser import parse_lastup
+from narocheckerbot.tracked_work import TrackedWork
+
+JAN1 = datetime(2024, 1, 1).timestamp()
+JAN2 = datetime(2024, 1, 2).timestamp()
+
+
+def test_exec_batches_ncodes(monkeypatch):
+    gateway = NaroApiGateway()
+    gateway.batch_size = 2
+    calls: List[List[str]] = []
+
+    async def request_batch(ncodes: List[str]) -> Dict[str, Tuple[float, str]]:
+        calls.append(ncodes)
+        return {
+            "n0001a": (JAN2, "updated"),
+            "n0002b": (JAN1, "same"),
+        }
+
+    monkeypatch.setattr(gateway, "request_batch", request_batch)
+    urls = [
+        TrackedWork("n0001a", JAN1),
+        TrackedWork("N0002B", JAN1),
+        TrackedWork("n0003c", JAN1),
+    ]
+
+    results = asyncio.run(gateway.exec(urls))
+
+    assert calls == [["n0001a", "N0002B"], ["n0003c"]]
+    assert results == [
+        "[更新] updated https://ncode.syosetu.com/n0001a/",
+        "",
+        "Check Failed: n0003c",
+    ]
+    assert urls[0].lastupdated == JAN2
+
+
+def test_check_reports_failed_works(monkeypatch):
+    gateway = NaroApiGateway()
+
+    async def request_batch(ncodes: List[str]) -> Dict[str, Tuple[float, str]]:
+        return {"n0001a": (JAN1, "same")}
+
+    monkeypatch.setattr(gateway, "request_batch", request_batch)
+    urls = [TrackedWork("n0001a", JAN1), TrackedWork("n0003c", JAN1)]
+    failed = set()
+
+    asyncio.run(gateway.check(urls, failed))
+
+    assert failed == {"n0003c"}
+
+
+def test_naro18_query():
+    gateway = Naro18ApiGateway()
+
+    assert gateway.create_query("n0001a-n0002b").startswith(
+        "https://api.syosetu.com/novel18api/api/?ncode=n0001a-n0002b"
+    )
+    assert gateway.create_page("n0001a") == "https://novel18.syosetu.com/n0001a/"
+
+
+def test_parse_json_and_yaml_agree():
+    gateway = NaroApiGateway()
+    json_body = gzip.compress(
+        b'[{"allcount":1},'
+        + b'{"title":"t","ncode":"N0001A","general_lastup":"2024-01-02 03:04:05"}]'
+    )
+    yaml_body = (
+        b"- allcount: 1\n"
+        + b"- title: t\n  ncode: N0001A\n  general_lastup: 2024-01-02 03:04:05\n"
+    )
+
+    json_result = gateway.parse(json_body)
+    gateway.configure({"format": "yaml"})
+    yaml_result = gateway.parse(yaml_body)
+
+    assert gateway.create_format_query() == ""
+    for result in (json_result, yaml_result):
+        assert result[1]["ncode"] == "N0001A"
+        assert parse_lastup(result[1]["general_lastup"]) == datetime(
+            2024, 1, 2, 3, 4, 5
+        )
+
+
+def test_diff_mode_checks_only_updated_works(monkeypatch):
+    gateway = NaroApiGateway()
+    gateway.configure({"check_mode": "diff"})
+    calls: List[str] = []
+
+    async def request_batch(ncodes: List[str]) -> Dict[str, Tuple[float, str]]:
+        calls.append("full")
+        return {ncode: (JAN1, "same") for ncode in ncodes}
+
+    async def request_updated(since: int, until: int):
+        calls.append("diff")
+        return {"n0002b": (JAN2, "updated")}
+
+    monkeypatch.setattr(gateway, "request_batch", request_batch)
+    monkeypatch.setattr(gateway, "request_updated", request_updated)
+    urls = [
+        TrackedWork("n0001a", JAN1),
+        TrackedWork("n0002b", JAN1),
+    ]
+
+    # 初回は前回チェック時刻が無いため全件を問い合わせる
+    assert asyncio.run(gateway.exec(urls)) == ["", ""]
+    assert asyncio.run(gateway.exec(urls)) == [
+        "",
+        "[更新] updated https://ncode.syosetu.com/n0002b/",
+    ]
+    assert calls == ["full", "diff"]
+
+    # 期間内の更新を取得しきれない場合は全件チェックに戻す
+    async def request_overflow(since: int, until: int):
+        calls.append("diff")
+        return None
+
+    monkeypatch.setattr(gateway, "request_updated", request_overflow)
+    asyncio.run(gateway.exec(urls))
+    assert calls == ["full", "diff", "diff", "full"]
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+from narocheckerbot.naro_blog_api_gateway import NaroBlogApiGateway
+
+
+class FakePool:
+    """終了処理を行ったスレッドを記録する."""
+
+    def __init__(self):
+        self.calls = []
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.calls.append((threading.current_thread(), wait, cancel_futures))
+
+
+def test_close_shuts_down_pool_outside_event_loop():
+    gateway = NaroBlogApiGateway()
+    pool = FakePool()
+    gateway._pool = pool
+
+    async def run():
+        await gateway.close()
+        # 2回目は何もしない
+        await gateway.close()
+
+    asyncio.run(run())
+
+    assert len(pool.calls) == 1
+    thread, wait, cancel_futures = pool.calls[0]
+    # プロセスの終了待ちはイベントループのスレッドで行わない
+    assert thread is not threading.main_thread()
+    assert wait and cancel_futures
+    assert gateway._pool is None
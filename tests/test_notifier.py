@@ -0,0 +1,45 @@
+from narocheckerbot.notifier import (
+    pack_embeds,
+    pack_embeds_counted,
+    pack_text,
+    pack_text_counted,
+)
+
+
+def test_pack_text_respects_limit():
+    messages = [
+        f"[更新] title{i} https://ncode.syosetu.com/n{i:04d}aa/" for i in range(120)
+    ]
+
+    packed = pack_text(messages)
+
+    assert all(len(text) <= 2000 for text in packed)
+    assert "\n".join(packed).split("\n") == messages
+    assert len(packed) < len(messages) / 10
+
+
+def test_pack_embeds_respects_limits():
+    messages = ["x" * 1000 for _ in range(30)]
+
+    packed = pack_embeds(messages)
+
+    for embeds in packed:
+        assert len(embeds) <= 10
+        assert all(len(description) <= 4096 for description in embeds)
+        assert sum(len(description) for description in embeds) <= 6000
+    assert sum(len(d.split("\n")) for embeds in packed for d in embeds) == 30
+
+
+def test_pack_truncates_long_line():
+    assert pack_text(["a" * 3000]) == ["a" * 1999 + "…"]
+
+
+def test_counted_packs_cover_all_messages():
+    messages = ["x" * 1000 for _ in range(30)]
+
+    text = pack_text_counted(messages)
+    embeds = pack_embeds_counted(messages)
+
+    assert [count for _, count in text] == [1] * 30
+    assert [packed for packed, _ in embeds] == pack_embeds(messages)
+    assert sum(count for _, count in embeds) == 30
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+from narocheckerbot.outbox import Outbox
+
+
+def test_outbox_acknowledges_after_delivery(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    outbox = Outbox(path, max_attempts=2)
+
+    assert outbox.enqueue("naro", 1, ["a", "b"]) == 2
+    # 送信待ちの同一通知は重複登録しない
+    assert outbox.enqueue("naro", 1, ["a"]) == 0
+    outbox.close()
+
+    # 再起動後も残っている
+    outbox = Outbox(path, max_attempts=2)
+    items = outbox.pending()
+    assert [item.message for item in items] == ["a", "b"]
+
+    outbox.ack(items[:1])
+    outbox.retry_later(items[1:])
+    assert outbox.pending() == []
+    outbox.close()
+
+
+class ThreadRecordingOutbox(Outbox):
+    """書き込みを行ったスレッドを記録する."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def enqueue(self, site, channel_id, messages):
+        self.threads.append(threading.current_thread())
+        return super().enqueue(site, channel_id, messages)
+
+    def ack(self, items):
+        self.threads.append(threading.current_thread())
+        super().ack(items)
+
+
+def test_async_api_writes_outside_event_loop(tmp_path):
+    outbox = ThreadRecordingOutbox(str(tmp_path / "outbox.db"))
+
+    async def run():
+        assert await outbox.enqueue_async("naro", 1, ["a", "b"]) == 2
+        items = await outbox.pending_async()
+        await outbox.ack_async(items[:1])
+        await outbox.retry_later_async(items[1:])
+        return await outbox.count_async()
+
+    assert asyncio.run(run()) == 1
+    # 書き込み(fsync)はイベントループのスレッドで行わない
+    assert len(outbox.threads) == 2
+    assert threading.main_thread() not in outbox.threads
+    outbox.close()
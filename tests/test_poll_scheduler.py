@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from narocheckerbot.poll_scheduler import PollScheduler
+from narocheckerbot.tracked_work import TrackedWork
+
+
+def test_adaptive_polls_active_works_more_often():
+    scheduler = PollScheduler()
+    scheduler.configure({"poll": "adaptive", "poll_floor": 3600, "poll_factor": 0.05})
+    start = datetime(2024, 1, 1)
+    urls = [
+        TrackedWork("active", (start - timedelta(hours=3)).timestamp()),
+        TrackedWork("dormant", (start - timedelta(days=5 * 365)).timestamp()),
+        TrackedWork("blog", (start - timedelta(days=30)).timestamp()),
+    ]
+
+    def checked(hours: int):
+        now = (start + timedelta(hours=hours)).timestamp()
+        ids = [url.id for url in scheduler.select(urls[:2], now)]
+        scheduler.checked(ids, now)
+        return ids
+
+    assert checked(0) == ["active", "dormant"]
+    assert checked(1) == ["active"]
+    assert checked(2) == ["active"]
+    # 5年更新のない作品は上限(1週間)まで間隔を延ばす
+    assert checked(24 * 7) == ["active", "dormant"]
+
+    assert (
+        scheduler.interval(urls[2].lastupdated, start.timestamp()) == 30 * 86400 * 0.05
+    )
+
+
+def test_failed_check_is_selected_again():
+    scheduler = PollScheduler()
+    scheduler.configure({"poll": "adaptive"})
+    start = datetime(2024, 1, 1)
+    urls = [
+        TrackedWork("ok", (start - timedelta(days=5 * 365)).timestamp()),
+        TrackedWork("failed", (start - timedelta(days=5 * 365)).timestamp()),
+    ]
+
+    now = start.timestamp()
+    assert scheduler.select(urls, now) == urls
+    # 取得に失敗した作品はチェック時刻を記録しない
+    scheduler.checked(["ok"], now)
+
+    now = (start + timedelta(hours=1)).timestamp()
+    assert [url.id for url in scheduler.select(urls, now)] == ["failed"]
+
+
+def test_fixed_mode_checks_everything():
+    scheduler = PollScheduler()
+    urls = [TrackedWork("n1", datetime(2000, 1, 1).timestamp())]
+
+    assert scheduler.select(urls, 0) == urls
+    assert scheduler.select(urls, 1) == urls
+
+
+def test_slots_partition_works():
+    scheduler = PollScheduler()
+    urls = [TrackedWork(f"n{i}", datetime(2000, 1, 1).timestamp()) for i in range(40)]
+
+    picked = [scheduler.select(urls, 0, (slot, 4)) for slot in range(4)]
+
+    # すべての作品がいずれか1つのスロットに割り当てられる
+    assert sorted(url.id for slot in picked for url in slot) == sorted(
+        url.id for url in urls
+    )
+    assert all(picked)
+    # 割り当ては毎回同じ
+    assert picked[1] == scheduler.select(urls, 100, (1, 4))
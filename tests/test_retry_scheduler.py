@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from narocheckerbot.apigateway_manager import ApiGatewayManager
+from narocheckerbot.feed_cache import FeedCache
+from narocheckerbot.metrics import metrics
+from narocheckerbot.retry_scheduler import CircuitOpenError, RetryScheduler
+from narocheckerbot.tracked_work import TrackedWork
+
+
+def test_retry_releases_semaphore_while_waiting():
+    scheduler = RetryScheduler(max_retries=3, base_delay=0.05, max_delay=0.05)
+    sem = asyncio.Semaphore(1)
+    order = []
+
+    async def flaky() -> str:
+        order.append("flaky")
+        if order.count("flaky") < 3:
+            raise TypeError("empty response")
+        return "ok"
+
+    async def other() -> str:
+        order.append("other")
+        return "other"
+
+    async def main():
+        task = asyncio.create_task(
+            scheduler.run("https://api.syosetu.com/a", sem, flaky)
+        )
+        await asyncio.sleep(0)
+        # 再試行待ちの間に別のリクエストが枠を使える
+        assert await scheduler.run("https://api.syosetu.com/b", sem, other) == "other"
+        return await task
+
+    assert asyncio.run(main()) == "ok"
+    assert order[:2] == ["flaky", "other"]
+    assert scheduler.retries == 2
+    assert scheduler.get_breaker("api.syosetu.com").state == "closed"
+
+
+def test_circuit_opens_after_failures():
+    scheduler = RetryScheduler(
+        max_retries=10, base_delay=0, max_delay=0, failure_threshold=2
+    )
+    sem = asyncio.Semaphore(1)
+
+    async def down() -> None:
+        raise OSError("connection refused")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(scheduler.run("https://api.syosetu.com/", sem, down))
+    assert scheduler.get_breaker("api.syosetu.com").state == "open"
+
+
+def test_request_metrics_are_labelled_by_site():
+    scheduler = RetryScheduler(max_retries=1, base_delay=0, max_delay=0)
+    sem = asyncio.Semaphore(1)
+    calls = []
+
+    async def flaky() -> str:
+        calls.append(1)
+        if len(calls) == 1:
+            raise TypeError("empty response")
+        return "ok"
+
+    # 全サイトが同じホストでも、サイト別に集計する
+    asyncio.run(scheduler.run("https://api.syosetu.com/x", sem, flaky, site="naro18"))
+    key = (("host", "api.syosetu.com"), ("site", "naro18"))
+    assert metrics.counters["request_errors_total"][key] >= 1
+    assert metrics.counters["request_retries_total"][key] >= 1
+    assert key in metrics.histograms["request_seconds"]
+
+
+def test_not_found_is_not_retried_nor_counted(tmp_path):
+    requests = []
+
+    async def not_found(request: web.Request) -> web.Response:
+        requests.append(request.match_info["userid"])
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get("/writerblog/{userid}.Atom", not_found)
+
+    async def run():
+        async with TestServer(app) as server:
+            manager = ApiGatewayManager()
+            await manager.open()
+            try:
+                gateway = manager.get_gateway("naro_blog")
+                gateway.configure({"api_url": str(server.make_url("/writerblog/"))})
+                gateway.feed_cache = FeedCache(str(tmp_path / "feed_cache.json"))
+                ids = [str(i) for i in range(6)]
+                found = await gateway.lookup(ids)
+                failed = set()
+                await gateway.check([TrackedWork("9", 0.0)], failed)
+                breaker = gateway.scheduler.get_breaker(server.make_url("/").authority)
+                return found, failed, breaker.state
+            finally:
+                await manager.close()
+
+    found, failed, state = asyncio.run(run())
+
+    # 存在しないIDは再試行せず、同じホストの他のサイトのチェックを止めない
+    assert found == {}
+    assert failed == {"9"}
+    assert sorted(requests) == ["0", "1", "2", "3", "4", "5", "9"]
+    assert state == "closed"
+
+
+def test_half_open_probe_error_does_not_stick():
+    scheduler = RetryScheduler(
+        max_retries=0, base_delay=0, max_delay=0, failure_threshold=1, reset_timeout=0
+    )
+    sem = asyncio.Semaphore(1)
+    breaker = scheduler.get_breaker("api.syosetu.com")
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    async def broken() -> str:
+        raise KeyError("unexpected")
+
+    async def cancelled() -> str:
+        raise asyncio.CancelledError()
+
+    async def ok() -> str:
+        return "ok"
+
+    address = "https://api.syosetu.com/"
+    # 再試行しない例外でも試行を終え、次の試行を許可する
+    with pytest.raises(KeyError):
+        asyncio.run(scheduler.run(address, sem, broken))
+    assert breaker.state == "open"
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(scheduler.run(address, sem, cancelled))
+    assert breaker.state == "half_open"
+    for _ in range(3):
+        assert asyncio.run(scheduler.run(address, sem, ok)) == "ok"
+    assert breaker.state == "closed"
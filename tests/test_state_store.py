@@ -0,0 +1,179 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from ruamel.yaml import YAML
+
+from narocheckerbot.naro_blog_configuration import NaroBlogConfigration
+from narocheckerbot.naro_configuration import NaroConfigration
+from narocheckerbot.state_store import SqliteStateStore, YamlStateStore
+from narocheckerbot.tracked_work import TrackedWork
+
+
+def test_sqlite_store_migrates_and_upserts(tmp_path):
+    path = str(tmp_path / "state.db")
+    naro = NaroConfigration(
+        {
+            "account": [{"lastupdated": datetime(2020, 6, 19, 12, 24), "ncode": "n1"}],
+            "channel": 0,
+        }
+    )
+    blog = NaroBlogConfigration(
+        {
+            "account": [{"lastupdated": "2024-01-01T00:00:00", "userid": "1"}],
+            "channel": 0,
+        }
+    )
+
+    store = SqliteStateStore(path)
+    naro.urls = store.load_accounts("naro", naro)
+    blog.urls = store.load_accounts("naro_blog", blog)
+    naro.urls[0].lastupdated = datetime(2024, 1, 2, 3, 4, 5).timestamp()
+    naro.mark_updated(naro.urls[:1])
+    naro.add(TrackedWork("n2", datetime(2024, 1, 1).timestamp(), [5]))
+    blog.delete("1")
+    store.save(None, {"naro": naro, "naro_blog": blog})
+    store.close()
+
+    # 移行済みのためconfig.yaml側の登録情報は読み込まない
+    store = SqliteStateStore(path)
+    naro.urls = []
+    blog.urls = [TrackedWork("9", 0.0)]
+    assert store.load_accounts("naro", naro) == [
+        TrackedWork("n1", datetime(2024, 1, 2, 3, 4, 5).timestamp()),
+        TrackedWork("n2", datetime(2024, 1, 1).timestamp(), [5]),
+    ]
+    assert store.load_accounts("naro_blog", blog) == []
+    store.close()
+
+
+def test_sqlite_store_shared_between_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    accounts = [
+        {"lastupdated": datetime(2024, 1, 1), "ncode": "n1"},
+        {"lastupdated": datetime(2024, 1, 1), "ncode": "n2"},
+    ]
+    bot = NaroConfigration({"account": accounts, "channel": 0})
+    worker = NaroConfigration({"account": accounts, "channel": 0})
+    bot_store = SqliteStateStore(path)
+    worker_store = SqliteStateStore(path)
+    bot.urls = bot_store.load_accounts("naro", bot)
+    worker.urls = worker_store.load_accounts("naro", worker)
+
+    # 各プロセスは自身が変更した登録情報のみ書き込む
+    bot.delete("n1")
+    bot_store.save(None, {"naro": bot})
+    worker.urls[0].lastupdated = datetime(2024, 1, 2).timestamp()
+    worker.urls[1].lastupdated = datetime(2024, 1, 3).timestamp()
+    worker.mark_updated(worker.urls)
+    worker_store.save(None, {"naro": worker})
+
+    assert bot_store.load_accounts("naro", bot) == [
+        TrackedWork("n2", datetime(2024, 1, 3).timestamp())
+    ]
+    bot_store.close()
+    worker_store.close()
+
+
+def test_sqlite_store_keeps_lastupdated_saved_by_other_process(tmp_path):
+    path = str(tmp_path / "state.db")
+    accounts = [{"lastupdated": datetime(2024, 1, 1), "ncode": "n1"}]
+    bot = NaroConfigration({"account": accounts, "channel": 0})
+    worker = NaroConfigration({"account": accounts, "channel": 0})
+    bot_store = SqliteStateStore(path)
+    worker_store = SqliteStateStore(path)
+    bot.urls = bot_store.load_accounts("naro", bot)
+    worker.urls = worker_store.load_accounts("naro", worker)
+
+    # ワーカーが更新を保存した後に、古い最終更新日を持つBotが通知先を追加する
+    worker.urls[0].lastupdated = datetime(2024, 1, 5).timestamp()
+    worker.mark_updated(worker.urls)
+    worker_store.save(None, {"naro": worker})
+    assert bot.subscribe(bot.urls[0], 5)
+    bot_store.save(None, {"naro": bot})
+
+    assert worker_store.load_accounts("naro", worker) == [
+        TrackedWork("n1", datetime(2024, 1, 5).timestamp(), [0, 5])
+    ]
+    bot_store.close()
+    worker_store.close()
+
+
+def test_sqlite_store_encodes_only_changed_accounts(tmp_path, monkeypatch):
+    accounts = [
+        {"lastupdated": datetime(2024, 1, 1), "ncode": f"n{i}"} for i in range(1000)
+    ]
+    naro = NaroConfigration({"account": accounts, "channel": 0})
+    store = SqliteStateStore(str(tmp_path / "state.db"))
+    naro.urls = store.load_accounts("naro", naro)
+
+    encoded = []
+    encode = store._encode_lastupdated
+
+    def record(config, account):
+        encoded.append(account.id)
+        return encode(config, account)
+
+    monkeypatch.setattr(store, "_encode_lastupdated", record)
+    naro.urls[10].lastupdated = datetime(2024, 1, 2).timestamp()
+    naro.mark_updated(naro.urls[10:11])
+    store.save(None, {"naro": naro})
+    # 変更がなければ何も書き込まない
+    store.save(None, {"naro": naro})
+
+    assert encoded == ["n10"]
+    assert store.load_accounts("naro", naro)[10] == TrackedWork(
+        "n10", datetime(2024, 1, 2).timestamp()
+    )
+    store.close()
+
+
+def test_sqlite_store_keeps_changes_when_save_fails(tmp_path):
+    naro = NaroConfigration(
+        {
+            "account": [{"lastupdated": datetime(2024, 1, 1), "ncode": "n1"}],
+            "channel": 0,
+        }
+    )
+    store = SqliteStateStore(str(tmp_path / "state.db"))
+    naro.urls = store.load_accounts("naro", naro)
+    naro.urls[0].lastupdated = datetime(2024, 1, 2).timestamp()
+    naro.mark_updated(naro.urls)
+    store.close()
+
+    # 書き込みに失敗した変更は次回の保存で書き込む
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.save(None, {"naro": naro})
+    store = SqliteStateStore(str(tmp_path / "state.db"))
+    store.save(None, {"naro": naro})
+    assert store.load_accounts("naro", naro) == [
+        TrackedWork("n1", datetime(2024, 1, 2).timestamp())
+    ]
+    store.close()
+
+
+def test_yaml_store_writes_back_tracked_works(tmp_path):
+    path = tmp_path / "config.yaml"
+    yaml_data = {
+        "naro": {"account": [], "channel": 0},
+        "naro_blog": {"account": [], "channel": 0},
+    }
+    naro = NaroConfigration(yaml_data["naro"])
+    naro.add(TrackedWork("n1", datetime(2024, 1, 2, 3, 4, 5).timestamp(), [7]))
+    blog = NaroBlogConfigration(yaml_data["naro_blog"])
+    blog.add(TrackedWork("1", datetime(2024, 1, 1).timestamp()))
+
+    YamlStateStore(str(path)).save(yaml_data, {"naro": naro, "naro_blog": blog})
+
+    with open(path) as stream:
+        saved = YAML().load(stream)
+    assert saved["naro"]["account"] == [
+        {"lastupdated": datetime(2024, 1, 2, 3, 4, 5), "ncode": "n1", "channels": [7]}
+    ]
+    assert saved["naro_blog"]["account"] == [
+        {"lastupdated": "2024-01-01T00:00:00", "userid": "1"}
+    ]
+    assert "{lastupdated: 2024-01-02 03:04:05, ncode: n1" in path.read_text()
+    # 書き出した登録情報は保存後に解放する
+    assert yaml_data["naro"]["account"] == []
+    assert yaml_data["naro_blog"]["account"] == []
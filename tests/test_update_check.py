@@ -0,0 +1,77 @@
+import asyncio
+from logging import getLogger
+from types import SimpleNamespace
+
+from narocheckerbot.naro import NaroChecker
+
+
+class FailingWorker:
+    """サイトごとに失敗・成功を切り替える更新チェック."""
+
+    slots = 1
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.finished = []
+
+    async def prepare(self):
+        pass
+
+    async def site_update_check(self, site, slot=None):
+        if site in self.errors:
+            raise self.errors[site]
+        # 他のサイトの失敗より後に終わるようにする
+        await asyncio.sleep(0.05)
+        self.finished.append(site)
+
+
+class Sites:
+    def __init__(self, channels):
+        self.channels = channels
+
+    def get_config(self, site):
+        return SimpleNamespace(channel_id=self.channels[site])
+
+
+def create_checker(worker, channels):
+    # Discordに接続せずに更新チェックの流れのみ確認する
+    checker = NaroChecker.__new__(NaroChecker)
+    checker.logger = getLogger("narocheckerlog.bot")
+    checker.worker = worker
+    checker.config_manager = Sites(channels)
+    checker.sent = []
+
+    async def send_message(channel_id, message, embeds=()):
+        checker.sent.append((channel_id, message))
+        return True
+
+    checker.send_message = send_message
+    return checker
+
+
+def test_failed_site_does_not_stop_other_sites():
+    worker = FailingWorker(
+        {"naro": RuntimeError("boom"), "naro_blog": AttributeError("entries")}
+    )
+    checker = create_checker(worker, {"naro": 1, "naro18": 2, "naro_blog": 3})
+
+    asyncio.run(checker.naro_update_check())
+
+    # 失敗したサイトがあっても他のサイトのチェックは最後まで行う
+    assert worker.finished == ["naro18"]
+    # 失敗したサイトには従来どおりのエラー通知を送る
+    assert sorted(checker.sent) == [
+        (1, "処理中に問題が発生しました。エラーログを確認してください。"),
+        (3, "要素参照エラーが発生しました。エラーログを確認してください。"),
+    ]
+
+
+def test_missing_site_is_skipped():
+    worker = FailingWorker({})
+    checker = create_checker(worker, {"naro": 1, "naro_blog": 3})
+
+    asyncio.run(checker.naro_update_check())
+
+    # 設定のないサイト(naro18)はチェックしない
+    assert sorted(worker.finished) == ["naro", "naro_blog"]
+    assert checker.sent == []
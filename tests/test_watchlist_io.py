@@ -0,0 +1,21 @@
+from narocheckerbot.tracked_work import TrackedWork
+from narocheckerbot.watchlist_io import export_ids, parse_ids
+
+
+def test_parse_ids():
+    text = (
+        "n5040ce, N1234AB\nhttps://ncode.syosetu.com/n9999zz/ n5040ce\n"
+        + "invalid https://novel18.syosetu.com/n0001a/"
+    )
+
+    assert parse_ids("naro", text) == ["n5040ce", "n1234ab", "n9999zz", "n0001a"]
+    assert parse_ids("naro_blog", "123 https://mypage.syosetu.com/456/ abc") == [
+        "123",
+        "456",
+    ]
+
+
+def test_export_round_trip():
+    urls = [TrackedWork("n5040ce", 0.0), TrackedWork("n1234ab", 0.0)]
+
+    assert parse_ids("naro", export_ids(urls)) == ["n5040ce", "n1234ab"]